@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark against a simulated cluster
+
+bench.sim provides stand-in kubectl, helm, tctl, pgrep and pkill backed by a
+small simulated cluster, with per-command latency and failure injection.
+run_bench puts shims for them first on PATH and runs the deploy (local and
+Enterprise), status, get-tokens and clean flows end to end, each in a fresh
+interpreter with its own state directory and kubeconfig, so no real cluster
+or local state is touched. Reads go through the native API client against
+the simulator's fake API server (`--backend kubectl` forces kubectl
+instead). It reports wall time, the number of subprocesses started (by
+tool), API requests and the time spent sleeping in waits and retry backoff.
+Results are kept in .state/bench.json so each run shows the change since the
+previous one; --max-regression turns a slowdown into a failing exit code
+for CI.
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from deploy.common import (
+    CONFIG_PATH_ENV, STATE_DIR_ENV, TELEPORT_CHART_VERSION, get_project_root, get_state_dir, load_yaml,
+    print_error, print_info, print_step, print_success, print_warning
+)
+
+RESULTS_FILE = "bench.json"
+
+# Seconds each simulated command takes, by tool or "tool subcommand" (see bench.sim)
+DEFAULT_LATENCY = ("kubectl=0.03,kubectl exec=0.1,kubectl apply=0.1,helm=0.05,helm upgrade=0.5,"
+                   "helm uninstall=0.2,helm pull=0.2,helm repo=0.3,tctl=0.05,api=0.01")
+
+# Seconds from a pod's creation until it is ready
+DEFAULT_POD_READY_DELAY = 1.0
+
+SIM_TOOLS = ("kubectl", "helm", "tctl", "pgrep", "pkill")
+
+# How deploy.kubeapi reads the cluster: the native client (against bench.sim's API server) or kubectl
+BACKENDS = ("native", "kubectl")
+
+# Seconds to wait for the fake API server to listen
+API_SERVER_START_TIMEOUT = 10
+
+# Chart versions in the simulated Helm repos
+DASHBOARD_CHART_VERSIONS = ["7.10.0", "7.13.0"]
+
+SIM_PROXY_ADDR = "https://sim.teleport.example:443"
+
+# (scenario, mode, entry point), run in this order against one simulated cluster per mode
+SCENARIOS = [
+    ("deploy-local", "local", "deploy_local"),
+    ("deploy-local-again", "local", "deploy_local"),
+    ("status", "local", "status"),
+    ("get-tokens", "local", "get_tokens"),
+    ("clean-local", "local", "clean"),
+    ("deploy-enterprise", "enterprise", "deploy_enterprise"),
+    ("deploy-enterprise-again", "enterprise", "deploy_enterprise"),
+    ("clean-enterprise", "enterprise", "clean"),
+]
+
+
+def _deploy(mode: str):
+    from deploy.common import read_config
+    from deploy.journal import DeployJournal
+    from deploy.pipeline import DEFAULT_MAX_WORKERS, deploy_enterprise_mode, deploy_local_mode
+    config = read_config()
+    deploy = deploy_local_mode if mode == "local" else deploy_enterprise_mode
+    deploy(config, DEFAULT_MAX_WORKERS, DeployJournal(mode, config))
+
+
+def _status():
+    from utils.status import show_status
+    show_status()
+
+
+def _get_tokens():
+    from utils import get_tokens
+    get_tokens()
+
+
+def _clean():
+    from clean import main as clean_main
+    clean_main()
+
+
+ENTRY_POINTS = {
+    "deploy_local": lambda: _deploy("local"),
+    "deploy_enterprise": lambda: _deploy("enterprise"),
+    "status": _status,
+    "get_tokens": _get_tokens,
+    "clean": _clean,
+}
+
+# Executed in a fresh interpreter with src/ on sys.path and the simulator's environment
+_PROBE = "import sys, bench; bench.measure(sys.argv[1], sys.argv[2])"
+
+
+def measure(entry: str, result_path: str):
+    """Run one entry point with profiling on and write its wall and sleep time (the probe's body)"""
+    import traceback
+    from deploy.profiler import enable_profiling
+    profiler = enable_profiling()
+    start = time.perf_counter()
+    exit_code = 0
+    try:
+        ENTRY_POINTS[entry]()
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    wall = time.perf_counter() - start
+    sleep = sum(span.duration for span in profiler.spans if span.category == "sleep")
+    sys.stdout.flush()
+    with open(result_path, "w") as f:
+        json.dump({"wall": wall, "sleep": sleep, "exit_code": exit_code}, f)
+
+
+def _write_shims(bin_dir: Path):
+    """kubectl, helm, ... executables that run bench.sim"""
+    sim_path = Path(__file__).resolve().parent / "sim.py"
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    for tool in SIM_TOOLS:
+        shim = bin_dir / tool
+        shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{sim_path}" {tool} "$@"\n')
+        shim.chmod(0o755)
+
+
+def _start_api_server(env: Dict[str, str], port_file: Path) -> Tuple[subprocess.Popen, Optional[int]]:
+    """bench.sim's fake API server for a mode's cluster; (process, port or None if it didn't come up)"""
+    sim_path = Path(__file__).resolve().parent / "sim.py"
+    process = subprocess.Popen([sys.executable, str(sim_path), "apiserver", str(port_file)], env=env,
+                               stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + API_SERVER_START_TIMEOUT
+    while time.monotonic() < deadline and process.poll() is None:
+        if port_file.exists():
+            return process, int(port_file.read_text())
+        time.sleep(0.05)
+    return process, None
+
+
+def _prepare_mode(workdir: Path, bin_dir: Path, mode: str, latency: str, failures: str, pod_ready: float,
+                  seed: int, backend: str) -> Tuple[Dict[str, str], Optional[subprocess.Popen]]:
+    """A fresh simulated cluster and machine for one mode; its scenarios' environment and API server process"""
+    from . import sim
+    mode_dir = workdir / mode
+    (mode_dir / "helm-cache").mkdir(parents=True)
+
+    state = sim.empty_state()
+    state["catalog"] = {
+        "teleport": {"teleport-cluster": [TELEPORT_CHART_VERSION], "teleport-kube-agent": [TELEPORT_CHART_VERSION]},
+        "kubernetes-dashboard": {"kubernetes-dashboard": DASHBOARD_CHART_VERSIONS},
+    }
+    with open(mode_dir / "cluster.json", "w") as f:
+        json.dump(state, f)
+
+    yaml = load_yaml()
+    with open(get_project_root() / "config.yaml.example", "r") as f:
+        config = yaml.safe_load(f) or {}
+    config.setdefault("teleport", {})["proxy_addr"] = SIM_PROXY_ADDR if mode == "enterprise" else ""
+    with open(mode_dir / "config.yaml", "w") as f:
+        yaml.safe_dump(config, f, default_flow_style=False)
+
+    env = {k: v for k, v in os.environ.items() if k not in ("TELEPORT_PROXY", "XDG_CACHE_HOME")}
+    env.update({
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        "KUBE_BACKEND": backend,
+        "KUBECONFIG": str(mode_dir / "kubeconfig"),
+        "HELM_REPOSITORY_CACHE": str(mode_dir / "helm-cache"),
+        CONFIG_PATH_ENV: str(mode_dir / "config.yaml"),
+        STATE_DIR_ENV: str(mode_dir / "state"),
+        "SIM_STATE": str(mode_dir / "cluster.json"),
+        "SIM_LOG": str(mode_dir / "calls.log"),
+        "SIM_LATENCY": latency,
+        "SIM_FAILURES": failures,
+        "SIM_POD_READY_DELAY": str(pod_ready),
+        "SIM_SEED": str(seed),
+        # The Teleport charts' default images are distroless
+        "SIM_NO_SHELL": "1",
+        "SIM_API_TOKEN": uuid.uuid4().hex,
+    })
+
+    server, server_url = None, "https://192.168.49.2:8443"
+    if backend == "native":
+        server, port = _start_api_server(env, mode_dir / "apiserver.port")
+        if port is None:
+            server.kill()
+            print_error(f"The simulator's API server did not start within {API_SERVER_START_TIMEOUT}s")
+            sys.exit(1)
+        server_url = f"http://127.0.0.1:{port}"
+    # The native client authenticates with the kubeconfig's token; the fake kubectl ignores it
+    kubeconfig = {
+        "apiVersion": "v1", "kind": "Config", "current-context": sim.CONTEXT,
+        "clusters": [{"name": sim.CONTEXT, "cluster": {"server": server_url}}],
+        "contexts": [{"name": sim.CONTEXT, "context": {"cluster": sim.CONTEXT, "user": sim.CONTEXT}}],
+        "users": [{"name": sim.CONTEXT, "user": {"token": env["SIM_API_TOKEN"]}}],
+    }
+    with open(mode_dir / "kubeconfig", "w") as f:
+        yaml.safe_dump(kubeconfig, f)
+    return env, server
+
+
+def _calls(env: Dict[str, str]) -> List[Dict]:
+    try:
+        with open(env["SIM_LOG"], "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def _run_scenario(src_dir: Path, name: str, entry: str, env: Dict[str, str], log_path: Path) -> Dict:
+    """Run one scenario in a fresh interpreter; its timings plus the subprocesses it started"""
+    before = len(_calls(env))
+    result_path = log_path.with_suffix(".json")
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        process = subprocess.run([sys.executable, "-c", _PROBE, entry, str(result_path)], cwd=src_dir, env=env,
+                                 stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        with open(result_path, "r") as f:
+            sample = json.load(f)
+    except (OSError, ValueError):
+        sample = {"wall": time.perf_counter() - start, "sleep": 0.0, "exit_code": process.returncode or 1}
+
+    # tctl run inside the auth pod (via kubectl exec) is not a local process
+    calls = [c for c in _calls(env)[before:] if not c.get("in_pod")]
+    sample["by_tool"] = {tool: sum(1 for c in calls if c["tool"] == tool) for tool in SIM_TOOLS}
+    sample["subprocesses"] = sum(sample["by_tool"].values())
+    sample["api_requests"] = sum(1 for c in calls if c["tool"] == "api")
+    return sample
+
+
+def _teardown(src_dir: Path, env: Dict[str, str], server: Optional[subprocess.Popen]):
+    """Stop what a run left behind: the port-forward supervisor, any simulated long-running kubectl, the API server"""
+    subprocess.run([sys.executable, "main.py", "port-forward", "stop"], cwd=src_dir, env=env,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with open(env["SIM_STATE"], "r") as f:
+            processes = json.load(f).get("processes", {})
+    except (OSError, ValueError):
+        processes = {}
+    for pid in processes:
+        try:
+            os.kill(int(pid), 15)
+        except (OSError, ValueError):
+            pass
+    if server is not None:
+        server.terminate()
+        server.wait()
+
+
+def _run_once(src_dir: Path, workdir: Path, latency: str, failures: str, pod_ready: float, seed: int,
+              backend: str) -> Dict[str, Dict]:
+    """Run every scenario once against fresh simulated clusters"""
+    bin_dir = workdir / "bin"
+    _write_shims(bin_dir)
+    envs = {}
+    samples = {}
+    try:
+        for name, mode, entry in SCENARIOS:
+            if mode not in envs:
+                envs[mode] = _prepare_mode(workdir, bin_dir, mode, latency, failures, pod_ready, seed, backend)
+            log_path = workdir / mode / f"{name}.log"
+            sample = _run_scenario(src_dir, name, entry, envs[mode][0], log_path)
+            samples[name] = sample
+            status = "ok" if sample["exit_code"] == 0 else f"exit {sample['exit_code']}, see {log_path}"
+            print_info(f"  {name}: {sample['wall']:.2f}s, {sample['subprocesses']} subprocesses ({status})")
+    finally:
+        for env, server in envs.values():
+            _teardown(src_dir, env, server)
+    return samples
+
+
+def _summarize(samples: List[Dict]) -> Dict:
+    """Median timings and counts over runs (worst exit code)"""
+    return {
+        "wall_s": statistics.median(s["wall"] for s in samples),
+        "sleep_s": statistics.median(s["sleep"] for s in samples),
+        "subprocesses": statistics.median(s["subprocesses"] for s in samples),
+        "api_requests": statistics.median(s["api_requests"] for s in samples),
+        "by_tool": {tool: statistics.median(s["by_tool"][tool] for s in samples) for tool in SIM_TOOLS},
+        "exit_code": max(samples, key=lambda s: abs(s["exit_code"]))["exit_code"],
+    }
+
+
+def _regressions(results: Dict[str, Dict], previous: Dict[str, Dict], max_regression: float) -> List[str]:
+    """Scenarios whose wall time or subprocess count grew by more than max_regression percent"""
+    found = []
+    limit = 1 + max_regression / 100
+    for name, r in results.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        if r["wall_s"] > before["wall_s"] * limit:
+            found.append(f"{name}: wall time {before['wall_s']:.2f}s -> {r['wall_s']:.2f}s")
+        if r["subprocesses"] > before["subprocesses"] * limit:
+            found.append(f"{name}: subprocesses {before['subprocesses']:g} -> {r['subprocesses']:g}")
+    return found
+
+
+def run_bench(runs: int = 3, latency: Optional[str] = None, failures: Optional[str] = None,
+              pod_ready: float = DEFAULT_POD_READY_DELAY, seed: int = 0, max_regression: Optional[float] = None,
+              keep: bool = False, backend: str = "native"):
+    """Benchmark the deploy/status/get-tokens/clean flows against the simulator and compare with the previous run"""
+    src_dir = Path(__file__).resolve().parent.parent
+    latency = DEFAULT_LATENCY if latency is None else latency
+    failures = failures or ""
+
+    path = get_state_dir() / RESULTS_FILE
+    try:
+        with open(path, "r") as f:
+            previous_run = json.load(f)
+    except (OSError, ValueError):
+        previous_run = {}
+    # Timings only compare under the same simulated latencies, failures and read backend
+    comparable = all(previous_run.get(k) == v for k, v in
+                     (("latency", latency), ("failures", failures), ("pod_ready", pod_ready), ("backend", backend)))
+    previous = previous_run.get("scenarios", {}) if comparable else {}
+    if previous_run and not comparable:
+        print_warning(f"{path} was recorded with other simulator settings, not comparing with it")
+
+    print_step(f"⏱️  Benchmarking deploy, status, get-tokens and clean against the simulator ({runs} run(s))...")
+    print_info(f"   latency: {latency or 'none'}; failures: {failures or 'none'}; pods ready after {pod_ready:g}s; "
+               f"reads via {'the native API client' if backend == 'native' else 'kubectl'}")
+    collected: Dict[str, List[Dict]] = {}
+    failed = False
+    for run in range(runs):
+        workdir = Path(tempfile.mkdtemp(prefix="k8s-dashboard-bench-"))
+        print_info(f"Run {run + 1}/{runs} ({workdir})")
+        samples = _run_once(src_dir, workdir, latency, failures, pod_ready, seed + run, backend)
+        for name, sample in samples.items():
+            collected.setdefault(name, []).append(sample)
+        run_failed = any(s["exit_code"] != 0 for s in samples.values())
+        failed = failed or run_failed
+        if keep or run_failed:
+            print_info(f"   Logs and simulator state kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {name: _summarize(samples) for name, samples in collected.items()}
+    width = max(len("SCENARIO"), *(len(name) for name in results))
+    print()
+    print(f"  {'SCENARIO':<{width}}  {'WALL':>8}  {'CHANGE':>8}  {'SLEEP':>7}  {'PROCS':>5}  "
+          f"{'KUBECTL':>7}  {'HELM':>4}  {'TCTL':>4}  {'API':>5}  EXIT")
+    for name, r in results.items():
+        before = previous.get(name, {}).get("wall_s")
+        change = f"{r['wall_s'] - before:+.2f}s" if before is not None else "-"
+        print(f"  {name:<{width}}  {r['wall_s']:>7.2f}s  {change:>8}  {r['sleep_s']:>6.2f}s  {r['subprocesses']:>5g}  "
+              f"{r['by_tool']['kubectl']:>7g}  {r['by_tool']['helm']:>4g}  {r['by_tool']['tctl']:>4g}  "
+              f"{r['api_requests']:>5g}  {r['exit_code']}")
+    print()
+
+    if failed:
+        print_error("Some scenarios failed; results not recorded")
+        sys.exit(1)
+    if max_regression is not None:
+        regressions = _regressions(results, previous, max_regression)
+        if regressions:
+            print_error(f"Regressions beyond {max_regression:g}% (results not recorded):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+    with open(path, "w") as f:
+        json.dump({"python": sys.version.split()[0], "runs": runs, "latency": latency, "failures": failures,
+                   "pod_ready": pod_ready, "backend": backend, "scenarios": results}, f, indent=2)
+    print_info(f"📈 Results written to {path} (WALL is the median per scenario, PROCS the kubectl/helm/tctl/"
+               "pgrep/pkill processes started, API the requests to the API server, SLEEP the time spent in "
+               "waits and retry backoff)")
+    print_success("Benchmark complete")
@@ -0,0 +1,1270 @@
+#!/usr/bin/env python3
+"""
+Stand-in kubectl, helm, tctl, pgrep and pkill
+
+Every fake process reads and writes one small simulated cluster (namespaces,
+objects, Helm releases, Teleport users/tokens, running port-forwards) kept
+as JSON in $SIM_STATE under a file lock - the processes share no memory, so
+the "in-memory" cluster lives in that file. Each invocation is appended to
+$SIM_LOG, waits the latency configured for its command in $SIM_LATENCY and
+may fail with a transient error as set in $SIM_FAILURES (both e.g.
+"kubectl=0.05,helm upgrade=1"). Pods become ready $SIM_POD_READY_DELAY
+seconds after they are created. Pods have no shell while $SIM_NO_SHELL is
+set, like the distroless Teleport images.
+
+`python3 sim.py apiserver PORT_FILE` serves the same cluster as a fake
+Kubernetes API server (plain HTTP with keep-alive, bearer token
+$SIM_API_TOKEN): get, list with label/field selectors (and as
+PartialObjectMetadataList) and watch, with latency and failures configured
+under "api" / "api GET".
+
+Invoked by the shims bench.run_bench writes: `python3 sim.py <tool> <args>`.
+Kept free of project imports so each fake starts as fast as Python allows.
+"""
+
+import base64
+import fcntl
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import tarfile
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CONTEXT = "sim"
+
+# plural -> (Kind, apiVersion, aliases, namespaced)
+KINDS = {
+    "pods": ("Pod", "v1", ("pod", "po"), True),
+    "services": ("Service", "v1", ("service", "svc"), True),
+    "endpoints": ("Endpoints", "v1", ("endpoint", "ep"), True),
+    "secrets": ("Secret", "v1", ("secret",), True),
+    "configmaps": ("ConfigMap", "v1", ("configmap", "cm"), True),
+    "serviceaccounts": ("ServiceAccount", "v1", ("serviceaccount", "sa"), True),
+    "statefulsets": ("StatefulSet", "apps/v1", ("statefulset", "sts"), True),
+    "deployments": ("Deployment", "apps/v1", ("deployment", "deploy"), True),
+    "namespaces": ("Namespace", "v1", ("namespace", "ns"), False),
+    "clusterroles": ("ClusterRole", "rbac.authorization.k8s.io/v1", ("clusterrole",), False),
+    "clusterrolebindings": ("ClusterRoleBinding", "rbac.authorization.k8s.io/v1", ("clusterrolebinding",), False),
+}
+_PLURALS = {alias: plural for plural, (kind, _, aliases, _) in KINDS.items()
+            for alias in (plural, kind.lower(), *aliases)}
+
+# What a transient failure looks like from each tool
+TRANSIENT_ERRORS = {
+    "kubectl": "Unable to connect to the server: dial tcp 192.168.49.2:8443: i/o timeout",
+    "helm": 'Error: Kubernetes cluster unreachable: Get "https://192.168.49.2:8443/version": dial tcp: i/o timeout',
+    "tctl": 'ERROR: connection error: desc = "transport: Error while dialing: dial tcp: i/o timeout"',
+}
+
+# Flags that take a value (as a separate argument or after "=")
+_VALUE_FLAGS = {
+    "-n", "--namespace", "-l", "--selector", "-o", "--output", "--field-selector", "-f", "--filename",
+    "-p", "--patch", "--type", "--for", "--timeout", "--context", "-c", "--container", "--tail", "--since",
+    "--version", "--values", "--destination", "-d", "--roles", "--logins", "--set-roles", "--ttl", "--format",
+}
+
+
+class SimError(Exception):
+    """A command failure: message goes to stderr, exit code to the caller"""
+    def __init__(self, message: str, exit_code: int = 1):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def _parse(args, value_flags=_VALUE_FLAGS):
+    """Split CLI args into positionals and {flag: value} (True for boolean flags)"""
+    positional, flags = [], {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("-") and len(arg) > 1:
+            name, eq, value = arg.partition("=")
+            if eq:
+                flags[name] = value
+            elif name in value_flags and i + 1 < len(args):
+                flags[name] = args[i + 1]
+                i += 1
+            else:
+                flags[name] = True
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, flags
+
+
+def _flag(flags, *names, default=None):
+    for name in names:
+        if name in flags:
+            return flags[name]
+    return default
+
+
+def _group(tool, args):
+    """tool plus subcommand, e.g. "helm upgrade" (as deploy.profiler.command_group does)"""
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in ("-n", "--namespace", "--context", "--kubeconfig", "--kube-context"):
+            skip = True
+        elif not arg.startswith("-"):
+            return f"{tool} {arg}"
+    return tool
+
+
+def _spec(env_name):
+    """{"tool" or "tool subcommand": float} from e.g. "kubectl=0.05,helm upgrade=1" """
+    values = {}
+    for item in os.environ.get(env_name, "").split(","):
+        key, _, value = item.partition("=")
+        if key.strip() and value.strip():
+            values[key.strip()] = float(value)
+    return values
+
+
+def _lookup(spec, tool, group):
+    return spec.get(group, spec.get(tool, 0.0))
+
+
+# ---------------------------------------------------------------- state
+
+def _state_path():
+    return os.environ.get("SIM_STATE") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "sim-state.json")
+
+
+def empty_state():
+    return {"rv": 0, "calls": 0, "next_ip": 0, "objects": {}, "releases": {}, "repos": {}, "catalog": {},
+            "teleport": {}, "processes": {}}
+
+
+@contextmanager
+def cluster(write: bool = True):
+    """The cluster state under the state lock; saved on a clean exit when write is set"""
+    path = _state_path()
+    with open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = empty_state()
+        yield state
+        if write:
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+
+
+def _key(plural, namespace, name):
+    return f"{plural}/{namespace if KINDS[plural][3] else ''}/{name}"
+
+
+def _now_iso(epoch=None):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch or time.time()))
+
+
+def _plural(kind):
+    plural = _PLURALS.get(kind.lower())
+    if plural is None:
+        raise SimError(f'error: the server doesn\'t have a resource type "{kind}"')
+    return plural
+
+
+def _store(state, plural, obj, sim=None):
+    """Create or replace an object, keeping its uid; returns "created", "configured" or "unchanged" """
+    kind, api_version, _, namespaced = KINDS[plural]
+    metadata = obj.setdefault("metadata", {})
+    if not namespaced:
+        metadata.pop("namespace", None)
+    key = _key(plural, metadata.get("namespace"), metadata["name"])
+    existing = state["objects"].get(key)
+    obj["kind"], obj["apiVersion"] = kind, api_version
+    if existing:
+        body = {k: v for k, v in obj.items() if k not in ("metadata", "status")}
+        if body == {k: v for k, v in existing.items() if k not in ("metadata", "status", "_sim")} and \
+                metadata.get("labels") == existing["metadata"].get("labels"):
+            return "unchanged"
+        metadata["uid"] = existing["metadata"]["uid"]
+        metadata["creationTimestamp"] = existing["metadata"]["creationTimestamp"]
+        if "status" in existing:
+            obj.setdefault("status", existing["status"])
+        if existing.get("_sim") and sim is None:
+            sim = existing["_sim"]
+    else:
+        metadata["uid"] = str(uuid.uuid4())
+        metadata["creationTimestamp"] = _now_iso()
+    state["rv"] += 1
+    metadata["resourceVersion"] = str(state["rv"])
+    if sim:
+        obj["_sim"] = sim
+    state["objects"][key] = obj
+    return "configured" if existing else "created"
+
+
+def _delete(state, key):
+    """Remove an object; pods owned by a release are replaced, as their controller would"""
+    obj = state["objects"].pop(key, None)
+    if obj is None:
+        return None
+    plural = key.split("/", 1)[0]
+    if plural == "namespaces":
+        name = obj["metadata"]["name"]
+        for other in [k for k in state["objects"] if k.split("/")[1] == name]:
+            state["objects"].pop(other)
+        for release in [r for r in state["releases"] if r.split("/")[0] == name]:
+            state["releases"].pop(release)
+        # The in-cluster auth server's storage goes with its namespace
+        state["teleport"].pop(f"cluster/{name}", None)
+    sim = obj.get("_sim") or {}
+    if plural == "pods" and sim.get("owner") in state["releases"]:
+        replacement = _pod(sim["template"], obj["metadata"]["namespace"], obj["metadata"]["labels"], sim["owner"],
+                           stable=sim.get("stable", False))
+        replacement_sim = {k: sim[k] for k in ("owner", "template", "stable") if k in sim}
+        _assign_addresses(state, "pods", replacement, replacement_sim)
+        _store(state, "pods", replacement, replacement_sim)
+    return obj
+
+
+def _ensure_namespace(state, name):
+    key = _key("namespaces", None, name)
+    if key not in state["objects"]:
+        _store(state, "namespaces", {"metadata": {"name": name, "labels": {"kubernetes.io/metadata.name": name}},
+                                     "status": {"phase": "Active"}})
+
+
+def _select(state, plural, namespace, names=(), selector=None, field_selector=None):
+    """Objects of a kind, by name or by label/field selector (namespace None: all namespaces)"""
+    found = []
+    for key, obj in state["objects"].items():
+        obj_plural, obj_ns, obj_name = key.split("/", 2)
+        if obj_plural != plural or (KINDS[plural][3] and namespace is not None and obj_ns != namespace):
+            continue
+        if names and obj_name not in names:
+            continue
+        if selector and not _labels_match(selector, obj["metadata"].get("labels") or {}):
+            continue
+        if field_selector and not _fields_match(field_selector, obj):
+            continue
+        found.append((key, obj))
+    return found
+
+
+def _split_requirements(selector):
+    parts, depth, current = [], 0, ""
+    for ch in selector:
+        depth += ch == "("
+        depth -= ch == ")"
+        if ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    return [p.strip() for p in parts + [current] if p.strip()]
+
+
+def _labels_match(selector, labels):
+    """Label selector semantics as kubectl has them (=, ==, !=, in, notin, key, !key)"""
+    for requirement in _split_requirements(selector):
+        match = re.match(r"^(\S+)\s+(in|notin)\s+\((.*)\)$", requirement)
+        if match:
+            key, op, values = match.group(1), match.group(2), {v.strip() for v in match.group(3).split(",")}
+            if (op == "in") != (labels.get(key) in values):
+                return False
+        elif "!=" in requirement:
+            key, value = requirement.split("!=", 1)
+            if labels.get(key.strip()) == value.strip():
+                return False
+        elif "=" in requirement:
+            key, value = re.split(r"==?", requirement, 1)
+            if labels.get(key.strip()) != value.strip():
+                return False
+        elif requirement.startswith("!"):
+            if requirement[1:] in labels:
+                return False
+        elif requirement not in labels:
+            return False
+    return True
+
+
+def _fields_match(selector, obj):
+    for requirement in selector.split(","):
+        negate = "!=" in requirement
+        path, value = re.split(r"!=|==?", requirement, 1)
+        current = obj
+        for part in path.strip().split("."):
+            current = (current or {}).get(part) if isinstance(current, dict) else None
+        if (str(current) == value.strip()) == negate:
+            return False
+    return True
+
+
+# ---------------------------------------------------------------- rendering
+
+def _render(state, obj, now):
+    """The object as the API server would return it (pod status and endpoints computed from readiness)"""
+    obj = json.loads(json.dumps(obj))
+    sim = obj.pop("_sim", None) or {}
+    if obj["kind"] == "Pod":
+        ready = now >= sim.get("ready_at", 0)
+        condition = "True" if ready else "False"
+        obj["status"] = {
+            "phase": "Running" if ready else "Pending",
+            "podIP": sim.get("ip"),
+            "conditions": [{"type": "PodScheduled", "status": "True"}, {"type": "Initialized", "status": "True"},
+                           {"type": "ContainersReady", "status": condition}, {"type": "Ready", "status": condition}],
+            "containerStatuses": [{
+                "name": sim.get("container", "main"), "ready": ready, "restartCount": 0, "started": ready,
+                "state": {"running": {"startedAt": _now_iso(sim.get("ready_at"))}} if ready
+                else {"waiting": {"reason": "ContainerCreating"}},
+            }],
+        }
+    elif obj["kind"] == "Endpoints" and "selector" in sim:
+        addresses = []
+        for _, pod in _select(state, "pods", obj["metadata"]["namespace"], selector=sim["selector"]):
+            pod_sim = pod.get("_sim") or {}
+            if now >= pod_sim.get("ready_at", 0):
+                addresses.append({"ip": pod_sim.get("ip"), "targetRef": {"kind": "Pod", "name": pod["metadata"]["name"]}})
+        obj["subsets"] = [{"addresses": addresses, "ports": sim.get("ports", [])}] if addresses else []
+    return obj
+
+
+def _table(plural, objects):
+    if plural == "pods":
+        lines = [f"{'NAME':<48} READY   STATUS"]
+        for obj in objects:
+            ready = obj["status"]["phase"] == "Running"
+            lines.append(f"{obj['metadata']['name']:<48} {'1/1' if ready else '0/1':<7} {obj['status']['phase']}")
+        return "\n".join(lines)
+    if plural == "services":
+        lines = [f"{'NAME':<40} TYPE        CLUSTER-IP"]
+        lines += [f"{o['metadata']['name']:<40} {o['spec'].get('type', 'ClusterIP'):<11} {o['spec'].get('clusterIP', '')}"
+                  for o in objects]
+        return "\n".join(lines)
+    return "\n".join(["NAME"] + [o["metadata"]["name"] for o in objects])
+
+
+# ---------------------------------------------------------------- charts and releases
+
+def chart_archive_bytes(name, version):
+    """The .tgz `helm pull` returns for a chart version (deterministic, so the index digest matches)"""
+    chart_yaml = f"apiVersion: v2\nname: {name}\nversion: {version}\ndescription: simulated chart\n".encode()
+    raw = io.BytesIO()
+    with tarfile.open(fileobj=raw, mode="w") as tar:
+        info = tarfile.TarInfo(f"{name}/Chart.yaml")
+        info.size, info.mtime = len(chart_yaml), 0
+        tar.addfile(info, io.BytesIO(chart_yaml))
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode="wb", mtime=0) as gz:
+        gz.write(raw.getvalue())
+    return compressed.getvalue()
+
+
+def _write_index(repo, url, charts):
+    """<repo>-index.yaml in $HELM_REPOSITORY_CACHE, in helm's layout"""
+    cache = os.environ.get("HELM_REPOSITORY_CACHE")
+    if not cache:
+        return
+    os.makedirs(cache, exist_ok=True)
+    lines = ["apiVersion: v1", "entries:"]
+    for name, versions in sorted(charts.items()):
+        lines.append(f"  {name}:")
+        for version in versions:
+            digest = hashlib.sha256(chart_archive_bytes(name, version)).hexdigest()
+            lines += ["  - apiVersion: v2", f"    created: \"{_now_iso()}\"", f"    digest: {digest}",
+                      f"    name: {name}", "    urls:", f"    - {url}/{name}-{version}.tgz", f"    version: {version}"]
+    lines.append(f"generated: \"{_now_iso()}\"")
+    with open(os.path.join(cache, f"{repo}-index.yaml"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _pod(template, namespace, labels, owner, stable=False):
+    name = template if stable else f"{template}-{uuid.uuid4().hex[:10]}-{uuid.uuid4().hex[:5]}"
+    return {"metadata": {"name": name, "namespace": namespace, "labels": dict(labels),
+                         "annotations": {"meta.helm.sh/release-name": owner.split("/", 1)[1]}},
+            "spec": {"nodeName": "sim-node", "containers": [{"name": "main", "image": "sim"}]}}
+
+
+def _chart_objects(chart, release, namespace, values):
+    """(plural, object, sim) for everything a release of the chart creates"""
+    def labels(name, component=None):
+        result = {"app.kubernetes.io/name": name, "app.kubernetes.io/instance": release,
+                  "app.kubernetes.io/managed-by": "Helm"}
+        if component:
+            result["app.kubernetes.io/component"] = component
+        return result
+
+    pods, services = [], []  # (template, labels, stable) / (name, selector, ports, port names)
+    if chart == "teleport-cluster":
+        for component in ("auth", "proxy"):
+            pods.append((f"{release}-{component}", labels(chart, component), False))
+        services += [(release, f"app.kubernetes.io/instance={release},app.kubernetes.io/component=proxy", [443]),
+                     (f"{release}-auth", f"app.kubernetes.io/instance={release},app.kubernetes.io/component=auth", [3025])]
+    elif chart == "kubernetes-dashboard":
+        for component in ("kong", "api", "web", "auth", "metrics-scraper"):
+            pods.append((f"{release}-{component}", labels(f"{release}-{component}"), False))
+        services += [(f"{release}-kong-proxy", f"app.kubernetes.io/name={release}-kong", [443]),
+                     (f"{release}-api", f"app.kubernetes.io/name={release}-api", [8000]),
+                     (f"{release}-web", f"app.kubernetes.io/name={release}-web", [8000])]
+    elif chart == "teleport-kube-agent":
+        agent_labels = dict(labels(chart), app=release)
+        pods.append((f"{release}-0", agent_labels, True))
+        services.append((release, f"app={release}", [3000]))
+    else:
+        pods.append((release, labels(chart), False))
+
+    objects = []
+    for template, pod_labels, stable in pods:
+        objects.append(("pods", _pod(template, namespace, pod_labels, f"{namespace}/{release}", stable),
+                        {"owner": f"{namespace}/{release}", "template": template, "stable": stable}))
+    for name, selector, ports in services:
+        objects.append(("services", {"metadata": {"name": name, "namespace": namespace, "labels": labels(chart)},
+                                     "spec": {"type": "ClusterIP", "selector": dict(s.split("=") for s in selector.split(",")),
+                                              "ports": [{"port": p, "protocol": "TCP", "targetPort": p} for p in ports]}},
+                        None))
+        objects.append(("endpoints", {"metadata": {"name": name, "namespace": namespace}},
+                        {"selector": selector, "ports": [{"port": p, "protocol": "TCP"} for p in ports]}))
+    objects.append(("configmaps", {"metadata": {"name": release, "namespace": namespace, "labels": labels(chart)},
+                                   "data": {"values.yaml": values}}, None))
+    if chart == "teleport-kube-agent":
+        objects.append(("secrets", {"metadata": {"name": f"{release}-join-token", "namespace": namespace,
+                                                 "labels": labels(chart)}, "type": "Opaque", "data": {}}, None))
+    for _, obj, _ in objects:
+        obj["metadata"].setdefault("annotations", {})["meta.helm.sh/release-name"] = release
+    return objects
+
+
+def _assign_addresses(state, plural, obj, sim):
+    state["next_ip"] += 1
+    n = state["next_ip"]
+    if plural == "services":
+        obj["spec"]["clusterIP"] = f"10.96.{n // 250}.{n % 250 + 1}"
+    if plural == "pods":
+        sim["ip"] = f"10.244.{n // 250}.{n % 250 + 1}"
+        sim["ready_at"] = time.time() + float(os.environ.get("SIM_POD_READY_DELAY", "0") or 0)
+
+
+def _release_secret(namespace, release, revision, status):
+    return {"metadata": {"name": f"sh.helm.release.v1.{release}.v{revision}", "namespace": namespace,
+                         "labels": {"owner": "helm", "name": release, "status": status, "version": str(revision)}},
+            "type": "helm.sh/release.v1", "data": {"release": base64.b64encode(b"sim").decode()}}
+
+
+# ---------------------------------------------------------------- kubectl
+
+def kubectl(args):
+    if args[:1] == ["exec"]:
+        return _kubectl_exec(args[1:])
+    if args[:1] == ["port-forward"]:
+        return _kubectl_port_forward(args[1:])
+    if args[:1] == ["logs"]:
+        positional, flags = _parse(args[1:], _VALUE_FLAGS - {"-f"})
+        return f"{_now_iso()} INFO simulated log line for {positional[-1] if positional else 'pod'}"
+    positional, flags = _parse(args)
+    namespace = _flag(flags, "-n", "--namespace", default="default")
+    verb, rest = (positional[0], positional[1:]) if positional else ("", [])
+
+    if verb == "config":
+        if rest[:1] == ["current-context"]:
+            return CONTEXT
+        context = _flag(flags, "--context", default=CONTEXT)
+        return (f"apiVersion: v1\nkind: Config\ncurrent-context: {context}\nclusters:\n- name: {context}\n"
+                f"  cluster:\n    server: https://192.168.49.2:8443\ncontexts:\n- name: {context}\n"
+                f"  context:\n    cluster: {context}\n    user: {context}\nusers:\n- name: {context}\n  user: {{}}")
+    if verb in ("version", "cluster-info"):
+        return "Kubernetes control plane is running at https://192.168.49.2:8443 (simulated)"
+    if verb == "get":
+        if "--watch" in flags or "-w" in flags:
+            return _kubectl_watch(rest, namespace, flags)
+        return _kubectl_get(rest, namespace, flags)
+    if verb == "apply":
+        return _kubectl_apply(_flag(flags, "-f", "--filename"), namespace)
+    if verb == "delete":
+        return _kubectl_delete(rest, namespace, flags)
+    if verb == "create" and rest[:1] in (["namespace"], ["ns"]):
+        with cluster() as state:
+            if _key("namespaces", None, rest[1]) in state["objects"]:
+                raise SimError(f'Error from server (AlreadyExists): namespaces "{rest[1]}" already exists')
+            _ensure_namespace(state, rest[1])
+        return f"namespace/{rest[1]} created"
+    if verb in ("label", "annotate"):
+        return _kubectl_label(verb, rest, namespace, flags)
+    if verb == "patch":
+        return _kubectl_patch(rest, namespace, flags)
+    if verb == "wait":
+        return _kubectl_wait(rest, namespace, flags)
+    raise SimError(f'error: unknown command "{verb}" for "kubectl" (simulated)')
+
+
+def _targets(rest):
+    """[(plural, [names])] from "kind name..." or "kind/name kind/name" arguments"""
+    if rest and "/" in rest[0]:
+        by_kind = {}
+        for ref in rest:
+            kind, name = ref.split("/", 1)
+            by_kind.setdefault(_plural(kind), []).append(name)
+        return list(by_kind.items())
+    if not rest:
+        raise SimError("error: you must specify the type of resource to get")
+    return [(_plural(kind), rest[1:]) for kind in rest[0].split(",")]
+
+
+def _kubectl_get(rest, namespace, flags):
+    all_namespaces = "-A" in flags or "--all-namespaces" in flags
+    selector = _flag(flags, "-l", "--selector")
+    field_selector = _flag(flags, "--field-selector")
+    ignore = str(_flag(flags, "--ignore-not-found", default="false")).lower() != "false"
+    now = time.time()
+    with cluster(write=False) as state:
+        targets = _targets(rest)
+        items, missing = [], []
+        for plural, names in targets:
+            found = _select(state, plural, None if all_namespaces else namespace, names, selector, field_selector)
+            found_names = {obj["metadata"]["name"] for _, obj in found}
+            missing += [(plural, n) for n in names if n not in found_names]
+            items += [_render(state, obj, now) for _, obj in sorted(found)]
+    if missing and not ignore:
+        plural, name = missing[0]
+        raise SimError(f'Error from server (NotFound): {plural} "{name}" not found')
+    single = len(targets) == 1 and len(targets[0][1]) == 1
+    if _flag(flags, "-o", "--output") == "json":
+        if single:
+            return json.dumps(items[0], indent=4) if items else ""
+        return json.dumps({"apiVersion": "v1", "kind": "List", "items": items, "metadata": {}}, indent=4)
+    if not items:
+        if ignore:
+            return ""
+        raise SimError(f"No resources found in {namespace} namespace.", exit_code=0)
+    return _table(targets[0][0], items)
+
+
+def _kubectl_watch(rest, namespace, flags):
+    """Stream ADDED/MODIFIED/DELETED events until killed (kubectl get -w --output-watch-events -o json)"""
+    (plural, names), = _targets(rest)
+    selector = _flag(flags, "-l", "--selector")
+    field_selector = _flag(flags, "--field-selector")
+    seen = {}
+    while True:
+        now = time.time()
+        with cluster(write=False) as state:
+            current = {key: _render(state, obj, now)
+                       for key, obj in _select(state, plural, namespace, names, selector, field_selector)}
+        events = []
+        for key, obj in current.items():
+            if key not in seen:
+                events.append({"type": "ADDED", "object": obj})
+            elif obj != seen[key]:
+                events.append({"type": "MODIFIED", "object": obj})
+        events += [{"type": "DELETED", "object": obj} for key, obj in seen.items() if key not in current]
+        seen = current
+        try:
+            for event in events:
+                sys.stdout.write(json.dumps(event, indent=4) + "\n")
+            sys.stdout.flush()
+        except BrokenPipeError:
+            return None
+        time.sleep(0.1)
+
+
+def _load_documents(path):
+    import yaml
+    with open(path, "r") as f:
+        return [doc for doc in yaml.safe_load_all(f) if doc]
+
+
+def _kubectl_apply(path, namespace):
+    if not path:
+        raise SimError("error: must specify one of -f and -k")
+    lines = []
+    with cluster() as state:
+        for doc in _load_documents(path):
+            plural = _plural(doc["kind"])
+            metadata = doc.setdefault("metadata", {})
+            if KINDS[plural][3]:
+                metadata.setdefault("namespace", namespace)
+                if _key("namespaces", None, metadata["namespace"]) not in state["objects"]:
+                    raise SimError(f'Error from server (NotFound): namespaces "{metadata["namespace"]}" not found')
+            if doc.get("type") == "kubernetes.io/service-account-token":
+                # The token controller fills these in
+                existing = state["objects"].get(_key(plural, metadata.get("namespace"), metadata["name"])) or {}
+                doc["data"] = existing.get("data") or {
+                    "token": base64.b64encode(f"sim-token-{uuid.uuid4().hex}".encode()).decode(),
+                    "namespace": base64.b64encode(metadata["namespace"].encode()).decode(),
+                }
+            if plural == "namespaces":
+                doc["status"] = {"phase": "Active"}
+            result = _store(state, plural, doc)
+            lines.append(f"{KINDS[plural][0].lower()}/{metadata['name']} {result}")
+    return "\n".join(lines)
+
+
+def _kubectl_delete(rest, namespace, flags):
+    selector = _flag(flags, "-l", "--selector")
+    ignore = str(_flag(flags, "--ignore-not-found", default="false")).lower() != "false"
+    path = _flag(flags, "-f", "--filename")
+    lines, missing = [], []
+    with cluster() as state:
+        if path:
+            targets = []
+            for doc in _load_documents(path):
+                plural = _plural(doc["kind"])
+                targets.append((plural, doc["metadata"].get("namespace", namespace), [doc["metadata"]["name"]]))
+        else:
+            targets = [(plural, namespace, names) for plural, names in _targets(rest)]
+        for plural, target_ns, names in targets:
+            if not names and not selector and "--all" not in flags:
+                raise SimError("error: resource(s) were provided, but no name was specified")
+            found = _select(state, plural, target_ns, names, selector)
+            found_names = {obj["metadata"]["name"] for _, obj in found}
+            missing += [(plural, n) for n in names if n not in found_names]
+            for key, obj in found:
+                if _delete(state, key) is not None:
+                    lines.append(f'{KINDS[plural][0].lower()} "{obj["metadata"]["name"]}" deleted')
+    if missing and not ignore:
+        plural, name = missing[0]
+        print("\n".join(lines))
+        raise SimError(f'Error from server (NotFound): {plural} "{name}" not found')
+    return "\n".join(lines) if lines else ("" if ignore or path else "No resources found")
+
+
+def _kubectl_label(verb, rest, namespace, flags):
+    plural, name = _plural(rest[0]), rest[1]
+    pairs = dict(item.split("=", 1) for item in rest[2:] if "=" in item)
+    with cluster() as state:
+        obj = state["objects"].get(_key(plural, namespace, name))
+        if obj is None:
+            raise SimError(f'Error from server (NotFound): {plural} "{name}" not found')
+        field = "labels" if verb == "label" else "annotations"
+        current = obj["metadata"].setdefault(field, {})
+        conflicts = [k for k, v in pairs.items() if k in current and current[k] != v]
+        if conflicts and "--overwrite" not in flags:
+            raise SimError(f"error: '{conflicts[0]}' already has a value ({current[conflicts[0]]}), "
+                           "and --overwrite is false")
+        current.update(pairs)
+        state["rv"] += 1
+        obj["metadata"]["resourceVersion"] = str(state["rv"])
+    return f"{KINDS[plural][0].lower()}/{name} {'labeled' if verb == 'label' else 'annotated'}"
+
+
+def _kubectl_patch(rest, namespace, flags):
+    plural, name = _plural(rest[0]), rest[1]
+    with cluster() as state:
+        obj = state["objects"].get(_key(plural, namespace, name))
+        if obj is None:
+            raise SimError(f'Error from server (NotFound): {plural} "{name}" not found')
+        patch = json.loads(_flag(flags, "-p", "--patch", default="[]"))
+        if _flag(flags, "--type") != "json":
+            raise SimError("error: the simulator only supports --type=json patches")
+        for op in patch:
+            *parents, last = op["path"].strip("/").split("/")
+            target = obj
+            for part in parents:
+                target = target[int(part)] if isinstance(target, list) else target.setdefault(part, {})
+            if op["op"] == "add" and isinstance(target, list):
+                target.append(op["value"]) if last == "-" else target.insert(int(last), op["value"])
+            elif op["op"] in ("add", "replace"):
+                target[last] = op["value"]
+            elif op["op"] == "remove":
+                target.pop(int(last) if isinstance(target, list) else last)
+        state["rv"] += 1
+        obj["metadata"]["resourceVersion"] = str(state["rv"])
+    return f"{KINDS[plural][0].lower()}/{name} patched"
+
+
+def _kubectl_wait(rest, namespace, flags):
+    condition = _flag(flags, "--for", default="")
+    timeout = _duration(_flag(flags, "--timeout", default="30s"))
+    deadline = time.time() + timeout
+    for ref in rest:
+        plural, name = _targets([ref])[0][0], ref.split("/", 1)[1]
+        while True:
+            with cluster(write=False) as state:
+                obj = state["objects"].get(_key(plural, namespace, name))
+                ready = obj is None if condition == "delete" else (
+                    obj is not None and _render(state, obj, time.time()).get("status", {}).get("phase") == "Running")
+            if ready:
+                break
+            if time.time() > deadline:
+                raise SimError(f"error: timed out waiting for the condition on {ref}")
+            time.sleep(0.1)
+    return "\n".join(f"{ref} condition met" for ref in rest)
+
+
+def _duration(value):
+    match = re.fullmatch(r"(\d+)([smh]?)", str(value))
+    return int(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)] if match else 30
+
+
+def _kubectl_exec(args):
+    command = args[args.index("--") + 1:] if "--" in args else []
+    positional, flags = _parse(args[:args.index("--")] if "--" in args else args)
+    namespace = _flag(flags, "-n", "--namespace", default="default")
+    pod = positional[0] if positional else ""
+    with cluster(write=False) as state:
+        obj = state["objects"].get(_key("pods", namespace, pod))
+        running = obj is not None and time.time() >= (obj.get("_sim") or {}).get("ready_at", 0)
+    if obj is None:
+        raise SimError(f'Error from server (NotFound): pods "{pod}" not found')
+    if not running:
+        raise SimError("error: unable to upgrade connection: container not found (\"main\")")
+    if not command:
+        raise SimError("error: you must specify at least one command for the container")
+    if command[0] == "sh" and os.environ.get("SIM_NO_SHELL"):
+        raise SimError('error: Internal error occurred: exec: "sh": executable file not found in $PATH', 126)
+    # tctl inside the pod talks to this namespace's auth server
+    env = dict(os.environ, SIM_TELEPORT=f"cluster/{namespace}", SIM_IN_POD="1")
+    try:
+        result = subprocess.run(command, input=_read_stdin() if "-i" in flags or "--stdin" in flags else "",
+                                env=env, capture_output=True, text=True)
+    except OSError:
+        raise SimError(f'error: Internal error occurred: exec: "{command[0]}": executable file not found in $PATH', 126)
+    sys.stderr.write(result.stderr)
+    if result.returncode != 0:
+        sys.stdout.write(result.stdout)
+        raise SimError(f"command terminated with exit code {result.returncode}", result.returncode)
+    return result.stdout.rstrip("\n")
+
+
+def _read_stdin():
+    return "" if sys.stdin is None or sys.stdin.isatty() else sys.stdin.read()
+
+
+def _register_process(argv):
+    with cluster() as state:
+        state["processes"][str(os.getpid())] = " ".join(argv)
+
+
+def _unregister_process():
+    with cluster() as state:
+        state["processes"].pop(str(os.getpid()), None)
+
+
+def _kubectl_port_forward(args):
+    positional, flags = _parse(args)
+    namespace = _flag(flags, "-n", "--namespace", default="default")
+    resource, ports = positional[0], positional[1:]
+    kind, name = resource.split("/", 1) if "/" in resource else ("pods", resource)
+    key = _key(_plural(kind), namespace, name)
+    with cluster(write=False) as state:
+        if key not in state["objects"]:
+            raise SimError(f'Error from server (NotFound): {_plural(kind)} "{name}" not found')
+    _register_process(["kubectl", "port-forward", *args])
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for spec in ports:
+            local, _, remote = spec.partition(":")
+            print(f"Forwarding from 127.0.0.1:{local} -> {remote or local}", flush=True)
+            print(f"Forwarding from [::1]:{local} -> {remote or local}", flush=True)
+        while True:
+            time.sleep(0.2)
+            with cluster(write=False) as state:
+                if key not in state["objects"]:
+                    print(f"E0000 portforward.go:413] an error occurred forwarding {ports[0]}: "
+                          "lost connection to pod", flush=True)
+                    return None
+    finally:
+        _unregister_process()
+
+
+# ---------------------------------------------------------------- helm
+
+def helm(args):
+    positional, flags = _parse(args)
+    namespace = _flag(flags, "-n", "--namespace", default="default")
+    verb, rest = (positional[0], positional[1:]) if positional else ("", [])
+    if verb == "version":
+        return "v3.16.2+gsim"
+    if verb == "repo":
+        return _helm_repo(rest, flags)
+    if verb == "search":
+        return _helm_search(rest[1] if len(rest) > 1 else "")
+    if verb == "pull":
+        return _helm_pull(rest[0], _flag(flags, "--version"), _flag(flags, "--destination", "-d", default="."))
+    if verb in ("upgrade", "install", "template"):
+        values = ""
+        if _flag(flags, "--values", "-f"):
+            with open(_flag(flags, "--values", "-f"), "r") as f:
+                values = f.read()
+        if verb == "template":
+            return _helm_template(rest[0], rest[1], namespace, _flag(flags, "--version"), values)
+        return _helm_install(rest[0], rest[1], namespace, _flag(flags, "--version"), values, flags)
+    if verb == "uninstall":
+        return _helm_uninstall(rest[0], namespace)
+    if verb == "status":
+        with cluster(write=False) as state:
+            release = state["releases"].get(f"{namespace}/{rest[0]}")
+        if release is None:
+            raise SimError("Error: release: not found")
+        return (f"NAME: {rest[0]}\nLAST DEPLOYED: {release['deployed']}\nNAMESPACE: {namespace}\n"
+                f"STATUS: deployed\nREVISION: {release['revision']}\nCHART: {release['chart']}-{release['version']}")
+    if verb == "list":
+        with cluster(write=False) as state:
+            rows = [(key, r) for key, r in sorted(state["releases"].items())
+                    if "-A" in flags or "--all-namespaces" in flags or key.split("/")[0] == namespace]
+        return "\n".join(["NAME\tNAMESPACE\tREVISION\tSTATUS\tCHART"] +
+                         [f"{key.split('/')[1]}\t{key.split('/')[0]}\t{r['revision']}\tdeployed\t{r['chart']}-{r['version']}"
+                          for key, r in rows])
+    raise SimError(f'Error: unknown command "{verb}" for "helm" (simulated)')
+
+
+def _helm_repo(rest, flags):
+    action = rest[0] if rest else ""
+    with cluster() as state:
+        if action == "list":
+            if not state["repos"]:
+                raise SimError("Error: no repositories to show")
+            return json.dumps([{"name": name, "url": url} for name, url in sorted(state["repos"].items())])
+        if action == "add":
+            name, url = rest[1], rest[2]
+            if name not in state["catalog"]:
+                raise SimError(f'Error: looks like "{url}" is not a valid chart repository or cannot be reached')
+            state["repos"][name] = url
+            _write_index(name, url, state["catalog"][name])
+            return f'"{name}" has been added to your repositories'
+        if action == "update":
+            names = rest[1:] or list(state["repos"])
+            for name in names:
+                if name not in state["repos"]:
+                    raise SimError(f"Error: no repositories found matching '{name}'. Nothing will be updated")
+                _write_index(name, state["repos"][name], state["catalog"][name])
+            return "Update Complete. ⎈Happy Helming!⎈"
+    raise SimError(f'Error: unknown command "{action}" for "helm repo" (simulated)')
+
+
+def _newest(versions):
+    return max(versions, key=lambda v: [int(p) if p.isdigit() else 0 for p in re.split(r"[.-]", v)])
+
+
+def _helm_search(term):
+    with cluster(write=False) as state:
+        results = []
+        for repo in state["repos"]:
+            for chart, versions in state["catalog"].get(repo, {}).items():
+                ref = f"{repo}/{chart}"
+                if term in ref:
+                    results.append({"name": ref, "version": _newest(versions), "app_version": _newest(versions),
+                                    "description": "simulated chart"})
+    return json.dumps(results)
+
+
+def _resolve_chart(state, ref, version):
+    """(chart name, version) for a repo/chart reference or a pulled .tgz"""
+    if ref.endswith(".tgz"):
+        try:
+            with tarfile.open(ref, "r:gz") as tar:
+                member = next(m for m in tar.getmembers() if m.name.endswith("/Chart.yaml"))
+                chart_yaml = tar.extractfile(member).read().decode()
+        except (OSError, StopIteration, tarfile.TarError):
+            raise SimError(f"Error: path \"{ref}\" not found or is not a chart archive")
+        fields = dict(re.findall(r"^(\w+): (.*)$", chart_yaml, re.M))
+        return fields["name"], fields["version"]
+    repo, _, chart = ref.partition("/")
+    if repo not in state["repos"]:
+        raise SimError(f'Error: repo {repo} not found')
+    versions = state["catalog"].get(repo, {}).get(chart)
+    if not versions:
+        raise SimError(f'Error: chart "{chart}" not found in {repo} index')
+    version = version or _newest(versions)
+    if version not in versions:
+        raise SimError(f'Error: chart "{chart}" matching {version} not found in {repo} index')
+    return chart, version
+
+
+def _helm_pull(ref, version, destination):
+    with cluster(write=False) as state:
+        chart, version = _resolve_chart(state, ref, version)
+    with open(os.path.join(destination, f"{chart}-{version}.tgz"), "wb") as f:
+        f.write(chart_archive_bytes(chart, version))
+    return ""
+
+
+def _helm_template(release, ref, namespace, version, values):
+    with cluster(write=False) as state:
+        chart, version = _resolve_chart(state, ref, version)
+    documents = []
+    for plural, obj, _ in _chart_objects(chart, release, namespace, values):
+        obj["kind"], obj["apiVersion"] = KINDS[plural][0], KINDS[plural][1]
+        documents.append(f"---\n# Source: {chart}/templates/{plural}.yaml\n{json.dumps(obj, indent=2)}")
+    return "\n".join(documents)
+
+
+def _helm_install(release, ref, namespace, version, values, flags):
+    key = f"{namespace}/{release}"
+    with cluster() as state:
+        chart, version = _resolve_chart(state, ref, version)
+        if _key("namespaces", None, namespace) not in state["objects"]:
+            if "--create-namespace" not in flags:
+                raise SimError(f'Error: create: failed to create: namespaces "{namespace}" not found')
+            _ensure_namespace(state, namespace)
+        previous = state["releases"].get(key)
+        revision = previous["revision"] + 1 if previous else 1
+        if previous:
+            old = state["objects"].get(_key("secrets", namespace, f"sh.helm.release.v1.{release}.v{previous['revision']}"))
+            if old:
+                old["metadata"]["labels"]["status"] = "superseded"
+        state["releases"][key] = {"chart": chart, "version": version, "revision": revision, "deployed": _now_iso()}
+        for plural, obj, sim in _chart_objects(chart, release, namespace, values):
+            existing_key = _key(plural, namespace, obj["metadata"]["name"])
+            if plural == "pods":
+                # Rollouts replace pods only when the pod template changed; the simulator keeps them
+                if previous and any((o.get("_sim") or {}).get("owner") == key and
+                                    (o.get("_sim") or {}).get("template") == sim["template"]
+                                    for o in state["objects"].values()):
+                    continue
+                _assign_addresses(state, plural, obj, sim)
+            elif plural == "services":
+                existing = state["objects"].get(existing_key)
+                if existing:
+                    # Helm's three-way merge keeps what others changed (ClusterIP, patched ports, annotations)
+                    obj["spec"]["clusterIP"] = existing["spec"]["clusterIP"]
+                    obj["spec"]["ports"] = existing["spec"]["ports"]
+                    obj["metadata"]["annotations"] = dict(existing["metadata"].get("annotations") or {},
+                                                          **obj["metadata"]["annotations"])
+                else:
+                    _assign_addresses(state, plural, obj, sim)
+            _store(state, plural, obj, sim)
+        _store(state, "secrets", _release_secret(namespace, release, revision, "deployed"))
+        ready_at = max([(o.get("_sim") or {}).get("ready_at", 0) for o in state["objects"].values()
+                        if (o.get("_sim") or {}).get("owner") == key] or [0])
+    if "--wait" in flags:
+        deadline = time.time() + _duration(str(_flag(flags, "--timeout", default="5m")))
+        if ready_at > deadline:
+            raise SimError("Error: UPGRADE FAILED: context deadline exceeded")
+        time.sleep(max(0.0, ready_at - time.time()))
+    action = "has been upgraded" if revision > 1 else "does not exist. Installing it now"
+    return (f'Release "{release}" {action}.\nNAME: {release}\nLAST DEPLOYED: {_now_iso()}\n'
+            f"NAMESPACE: {namespace}\nSTATUS: deployed\nREVISION: {revision}")
+
+
+def _helm_uninstall(release, namespace):
+    key = f"{namespace}/{release}"
+    with cluster() as state:
+        if key not in state["releases"]:
+            raise SimError(f"Error: uninstall: Release not loaded: {release}: release: not found")
+        state["releases"].pop(key)
+        for object_key, obj in list(state["objects"].items()):
+            labels = obj["metadata"].get("labels") or {}
+            owned = (obj["metadata"].get("annotations") or {}).get("meta.helm.sh/release-name") == release
+            release_secret = labels.get("owner") == "helm" and labels.get("name") == release
+            if obj["metadata"].get("namespace") == namespace and (owned or release_secret):
+                state["objects"].pop(object_key)
+    return f'release "{release}" uninstalled'
+
+
+# ---------------------------------------------------------------- tctl
+
+def _teleport(state):
+    scope = os.environ.get("SIM_TELEPORT", "enterprise")
+    return state["teleport"].setdefault(scope, {"roles": {}, "users": {}, "tokens": []})
+
+
+def _invite_url(kind):
+    return f"https://<proxyhost>:3080/web/{kind}/{uuid.uuid4().hex}"
+
+
+def tctl(args):
+    # In tctl -f is the short form of --force, not a file flag (the file is a positional argument)
+    positional, flags = _parse(args, _VALUE_FLAGS - {"-f"})
+    if not os.environ.get("SIM_IN_POD") and os.environ.get("SIM_TCTL_LOGGED_IN", "1") == "0":
+        raise SimError("ERROR: not logged in (run tsh login)")
+    verb, rest = (positional[0], positional[1:]) if positional else ("", [])
+    now = time.time()
+    with cluster() as state:
+        teleport = _teleport(state)
+        teleport["tokens"] = [t for t in teleport["tokens"] if t["expires"] > now]
+        if verb == "status":
+            return f"Cluster      {os.environ.get('TELEPORT_PROXY', 'minikube')}\nVersion      18.6.0\nCA pin       sha256:sim"
+        if verb == "create":
+            source = _tctl_source(args, rest)
+            return "\n".join(_tctl_create(teleport, resource, _flag(flags, "-f", "--force", default=False))
+                             for resource in re.split(r"^---\s*$", source, flags=re.M) if resource.strip())
+        if verb == "get":
+            kind, _, name = rest[0].partition("/")
+            collection = teleport["users"] if kind in ("user", "users") else teleport["roles"]
+            if name not in collection:
+                raise SimError(f'ERROR: {kind.rstrip("s")} "{name}" not found')
+            return f"kind: {kind.rstrip('s')}\nmetadata:\n  name: {name}\nversion: v2"
+        if verb == "users":
+            return _tctl_users(teleport, rest, flags)
+        if verb == "tokens":
+            return _tctl_tokens(teleport, rest, flags, now)
+    raise SimError(f'ERROR: unknown command "{verb}" (simulated)')
+
+
+def _tctl_source(args, rest):
+    """The resource YAML for tctl create: the named file, or stdin when no file is given (as kingpin parses it)"""
+    if sum(arg in ("-f", "--force") for arg in args) > 1:
+        raise SimError("ERROR: flag 'force' cannot be repeated")
+    if not rest:
+        return _read_stdin()
+    try:
+        with open(rest[0]) as f:
+            return f.read()
+    except OSError as e:
+        raise SimError(f"ERROR: open {rest[0]}: {e.strerror.lower()}")
+
+
+def _tctl_create(teleport, resource, force):
+    kind = re.search(r"^kind:\s*(\S+)", resource, re.M)
+    name = re.search(r"^\s+name:\s*(\S+)", resource, re.M)
+    if not kind or not name:
+        raise SimError("ERROR: failed to parse resource")
+    kind, name = kind.group(1), name.group(1)
+    collection = teleport["users"] if kind == "user" else teleport["roles"]
+    existed = name in collection
+    if existed and not force:
+        raise SimError(f'ERROR: {kind} "{name}" already exists')
+    if kind == "user":
+        roles = re.search(r"^  roles:\n((?:  - .*\n)*)", resource, re.M)
+        collection[name] = {"roles": re.findall(r"- (\S+)", roles.group(1)) if roles else []}
+    else:
+        collection[name] = resource
+    return f'{kind} "{name}" has been {"updated" if existed else "created"}'
+
+
+def _tctl_users(teleport, rest, flags):
+    action, name = rest[0], rest[1] if len(rest) > 1 else ""
+    users = teleport["users"]
+    if action == "add":
+        if name in users:
+            raise SimError(f'ERROR: user "{name}" already registered')
+        users[name] = {"roles": str(_flag(flags, "--roles", default="")).split(",")}
+        return (f'User "{name}" has been created but requires a password. Share this URL with the user to complete '
+                f"user setup, link is valid for 1h:\n{_invite_url('invite')}\n\n"
+                "NOTE: Make sure <proxyhost>:3080 points at a Teleport proxy which users can access.")
+    if name not in users:
+        raise SimError(f'ERROR: user "{name}" not found')
+    if action == "update":
+        users[name]["roles"] = str(_flag(flags, "--set-roles", default="")).split(",")
+        return f"User {name} has been updated:\n\tNew roles: {', '.join(users[name]['roles'])}"
+    if action == "reset":
+        return (f'User "{name}" has been reset. Share this URL with the user to complete password reset, '
+                f"link is valid for 8h:\n{_invite_url('reset')}")
+    raise SimError(f'ERROR: unknown command "users {action}" (simulated)')
+
+
+def _tctl_tokens(teleport, rest, flags, now):
+    action = rest[0] if rest else "ls"
+    as_json = _flag(flags, "--format") == "json"
+    expiry = lambda t: time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t["expires"])) + ".123456789Z"
+    if action == "add":
+        roles = [r.strip().capitalize() for r in str(_flag(flags, "--type", default="node")).split(",")]
+        ttl = str(_flag(flags, "--ttl", default="30m"))
+        seconds = _duration(ttl if ttl[-1:] in "smh" else ttl + "s")
+        token = {"name": uuid.uuid4().hex, "roles": roles, "expires": now + seconds}
+        teleport["tokens"].append(token)
+        if as_json:
+            return json.dumps({"token": token["name"], "roles": roles, "expires": expiry(token)})
+        return f"The invite token: {token['name']}\nThis token will expire in {ttl}."
+    if action == "ls":
+        if as_json:
+            return json.dumps([{"kind": "token", "version": "v2",
+                                "metadata": {"name": t["name"], "expires": expiry(t)},
+                                "spec": {"roles": t["roles"], "join_method": "token"}} for t in teleport["tokens"]])
+        return "\n".join(["Token                            Type             Labels Expiry Time (UTC)",
+                          "-------------------------------- ---------------- ------ -----------------"] +
+                         [f"{t['name']} {','.join(t['roles']):<16}        {expiry(t)}" for t in teleport["tokens"]])
+    if action == "rm":
+        name = rest[1]
+        if not any(t["name"] == name for t in teleport["tokens"]):
+            raise SimError(f'ERROR: token "{name}" not found')
+        teleport["tokens"] = [t for t in teleport["tokens"] if t["name"] != name]
+        return f"Token {name} has been deleted"
+    raise SimError(f'ERROR: unknown command "tokens {action}" (simulated)')
+
+
+# ---------------------------------------------------------------- pgrep / pkill
+
+def pgrep(args, kill=False):
+    """Match the simulator's own long-running processes (port-forwards) only, never the host's"""
+    positional, flags = _parse(args, set())
+    pattern = positional[-1] if positional else ""
+    with cluster(write=False) as state:
+        processes = dict(state["processes"])
+    matches = []
+    for pid, command in processes.items():
+        if re.search(pattern, command):
+            try:
+                os.kill(int(pid), signal.SIGTERM if kill else 0)
+                matches.append(pid)
+            except OSError:
+                pass
+    if not matches:
+        raise SimError("", exit_code=1)
+    return "" if kill else "\n".join(matches)
+
+
+# ---------------------------------------------------------------- API server
+
+def _status(code, reason, message):
+    return {"kind": "Status", "apiVersion": "v1", "metadata": {}, "status": "Failure", "message": message,
+            "reason": reason, "code": code}
+
+
+def _api_target(path):
+    """(plural, namespace, name) of a REST path; None if it isn't a resource the simulator has"""
+    match = re.match(r"^/(?:api/(v1)|apis/([^/]+/[^/]+))(?:/namespaces/([^/]+)(?=/))?/([^/]+)(?:/([^/]+))?$", path)
+    if not match or match.group(4) not in KINDS:
+        return None
+    plural = match.group(4)
+    if (match.group(1) or match.group(2)) != KINDS[plural][1]:
+        return None
+    return plural, match.group(3), match.group(5)
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the client's connection pool is exercised
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        watch = query.get("watch") in ("1", "true")
+        fail = _record_call("api", "api WATCH" if watch else "api GET", [url.path + (f"?{url.query}" if url.query else "")])
+        if self.headers.get("Authorization") != f"Bearer {os.environ.get('SIM_API_TOKEN', '')}":
+            return self._send(401, _status(401, "Unauthorized", "Unauthorized"))
+        if fail:
+            return self._send(503, _status(503, "ServiceUnavailable", "the server is currently unable to handle the request"))
+        target = _api_target(url.path)
+        if target is None:
+            return self._send(404, _status(404, "NotFound", "the server could not find the requested resource"))
+        plural, namespace, name = target
+        selector, field_selector = query.get("labelSelector"), query.get("fieldSelector")
+        if watch:
+            return self._watch(plural, namespace, selector, field_selector)
+
+        now = time.time()
+        with cluster(write=False) as state:
+            found = _select(state, plural, namespace, [name] if name else (), selector, field_selector)
+            items = [_render(state, obj, now) for _, obj in sorted(found)]
+            rv = str(state["rv"])
+        if name:
+            if not items:
+                return self._send(404, _status(404, "NotFound", f'{plural} "{name}" not found'))
+            return self._send(200, items[0])
+        if "as=PartialObjectMetadataList" in (self.headers.get("Accept") or ""):
+            return self._send(200, {
+                "kind": "PartialObjectMetadataList", "apiVersion": "meta.k8s.io/v1", "metadata": {"resourceVersion": rv},
+                "items": [{"kind": "PartialObjectMetadata", "apiVersion": "meta.k8s.io/v1", "metadata": item["metadata"]}
+                          for item in items],
+            })
+        # List items carry no kind/apiVersion, as from a real API server
+        for item in items:
+            item.pop("kind", None)
+            item.pop("apiVersion", None)
+        kind, api_version = KINDS[plural][:2]
+        self._send(200, {"kind": f"{kind}List", "apiVersion": api_version, "metadata": {"resourceVersion": rv},
+                         "items": items})
+
+    def _watch(self, plural, namespace, selector, field_selector):
+        """Stream events (ADDED for what exists first) until the client goes away"""
+        # Chunked on the kept-alive connection, as a real API server streams watches
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.close_connection = True
+        seen = {}
+        while True:
+            now = time.time()
+            with cluster(write=False) as state:
+                current = {key: _render(state, obj, now)
+                           for key, obj in _select(state, plural, namespace, (), selector, field_selector)}
+            events = [{"type": "ADDED" if key not in seen else "MODIFIED", "object": obj}
+                      for key, obj in current.items() if seen.get(key) != obj]
+            events += [{"type": "DELETED", "object": obj} for key, obj in seen.items() if key not in current]
+            seen = current
+            try:
+                for event in events:
+                    data = (json.dumps(event) + "\n").encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+            except OSError:
+                return
+            time.sleep(0.1)
+
+
+def apiserver(port_file):
+    """Serve the cluster on a free localhost port, written to port_file once listening, until terminated"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _APIHandler)
+    server.daemon_threads = True
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    tmp = f"{port_file}.tmp"
+    with open(tmp, "w") as f:
+        f.write(str(server.server_address[1]))
+    os.replace(tmp, port_file)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+    return 0
+
+
+TOOLS = {
+    "kubectl": kubectl,
+    "helm": helm,
+    "tctl": tctl,
+    "pgrep": pgrep,
+    "pkill": lambda args: pgrep(args, kill=True),
+}
+
+
+def _record_call(tool, group, args, in_pod=False):
+    """Count and log one invocation, wait its latency; True if it should fail with a transient error"""
+    with cluster() as state:
+        state["calls"] += 1
+        call = state["calls"]
+        log = os.environ.get("SIM_LOG")
+        if log:
+            with open(log, "a") as f:
+                f.write(json.dumps({"t": time.time(), "tool": tool, "group": group, "argv": args,
+                                    "in_pod": in_pod}) + "\n")
+
+    time.sleep(_lookup(_spec("SIM_LATENCY"), tool, group))
+    rate = _lookup(_spec("SIM_FAILURES"), tool, group)
+    return bool(rate) and random.Random(f"{os.environ.get('SIM_SEED', '0')}:{call}").random() < rate
+
+
+def main(argv):
+    tool, args = argv[0], argv[1:]
+    if tool == "apiserver":
+        return apiserver(args[0])
+    if _record_call(tool, _group(tool, args), args, in_pod=bool(os.environ.get("SIM_IN_POD"))):
+        sys.stderr.write(TRANSIENT_ERRORS.get(tool, "error: simulated failure") + "\n")
+        return 1
+
+    try:
+        output = TOOLS[tool](args)
+    except SimError as e:
+        if str(e):
+            sys.stderr.write(str(e) + "\n")
+        return e.exit_code
+    if output:
+        sys.stdout.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -13,15 +13,22 @@ import sys
 from pathlib import Path
 from deploy.common import (
     get_project_root, get_config_value, read_config, run_cmd,
-    print_step, print_success, print_info
+    print_step, print_success, print_info, print_warning
 )
 
+# How long to wait for deleted namespaces to finish terminating (seconds)
+NAMESPACE_DELETE_TIMEOUT = 300
+
 
 def stop_port_forward():
     """Stop Teleport port-forward"""
-    print_step("Step 1/6: Stopping Teleport port-forward...")
+    print_step("Step 1/5: Stopping Teleport port-forward...")
+    
+    from deploy.portforward import stop_supervisor
+    if stop_supervisor():
+        print_success("Stopped the port-forward supervisor and its forwards")
     
-    # Check for PID file
+    # Forwards started by earlier versions (PID file) or by hand
     pid_file = Path("/tmp/teleport-port-forward.pid")
     if pid_file.exists():
         try:
@@ -43,97 +50,132 @@ def stop_port_forward():
     print_success("Port-forward cleanup complete")
 
 
+class TeardownPlan:
+    """
+    Collects kubectl deletes and merges them into as few commands as possible.
+    
+    Named objects in one namespace become a single multi-kind delete; label
+    deletes are grouped per selector (kinds merged), and equality selectors on
+    the same key are folded into one set-based `key in (a,b)` selector.
+    Duplicate entries are dropped.
+    """
+    def __init__(self):
+        self.named = {}      # namespace -> {"kind/name"}
+        self.selected = {}   # (namespace, key) -> {value: {kinds}}
+    
+    def delete_named(self, namespace, kind, name):
+        self.named.setdefault(namespace, set()).add(f"{kind}/{name}")
+    
+    def delete_selected(self, namespace, kind, selector):
+        key, value = selector.split("=", 1)
+        self.selected.setdefault((namespace, key), {}).setdefault(value, set()).add(kind)
+    
+    def commands(self):
+        """Return the merged kubectl delete commands"""
+        cmds = []
+        for namespace, objects in sorted(self.named.items()):
+            cmds.append(["kubectl", "delete", "-n", namespace, *sorted(objects),
+                         "--ignore-not-found=true", "--wait=false"])
+        for (namespace, key), values in sorted(self.selected.items()):
+            # Values that share the same set of kinds can share one selector
+            by_kinds = {}
+            for value, kinds in values.items():
+                by_kinds.setdefault(",".join(sorted(kinds)), []).append(value)
+            for kinds, vals in sorted(by_kinds.items()):
+                selector = f"{key}={vals[0]}" if len(vals) == 1 else f"{key} in ({','.join(sorted(vals))})"
+                cmds.append(["kubectl", "delete", kinds, "-n", namespace, "-l", selector,
+                             "--ignore-not-found=true", "--wait=false"])
+        return cmds
+
+
+def _run_parallel(cmds):
+    """Run independent commands concurrently; returns results in input order"""
+    from deploy.executor import run_cmds
+    return run_cmds(cmds)
+
+
 def uninstall_helm_releases(config):
-    """Uninstall all Helm releases"""
-    print_step("Step 2/6: Uninstalling Helm releases...")
+    """Uninstall all Helm releases (concurrently)"""
+    print_step("Step 2/5: Uninstalling Helm releases...")
     
     k8s_ns = get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard")
     agent_ns = get_config_value(config, "teleport.agent_namespace", "teleport-agent")
     cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
     
-    print_info(f"🗑️  Uninstalling Teleport Agent from namespace: {agent_ns}")
-    run_cmd(["helm", "uninstall", "teleport-agent", "--namespace", agent_ns], check=False)
-    
-    print_info(f"🗑️  Uninstalling Kubernetes Dashboard from namespace: {k8s_ns}")
-    run_cmd(["helm", "uninstall", "kubernetes-dashboard", "--namespace", k8s_ns], check=False)
-    
-    print_info(f"🗑️  Uninstalling Teleport Cluster from namespace: {cluster_ns}")
-    run_cmd(["helm", "uninstall", "teleport-cluster", "--namespace", cluster_ns], check=False)
+    releases = [
+        ("Teleport Agent", "teleport-agent", agent_ns),
+        ("Kubernetes Dashboard", "kubernetes-dashboard", k8s_ns),
+        ("Teleport Cluster", "teleport-cluster", cluster_ns),
+    ]
+    for label, _, namespace in releases:
+        print_info(f"🗑️  Uninstalling {label} from namespace: {namespace}")
+    
+    results = _run_parallel([
+        ["helm", "uninstall", release, "--namespace", namespace]
+        for _, release, namespace in releases
+    ])
+    for (label, _, _), (exit_code, _, _) in zip(releases, results):
+        if exit_code != 0:
+            print_info(f"   {label}: not installed")
     
     print_success("Helm releases uninstalled")
 
 
 def cleanup_agent_resources(config):
     """Clean up remaining Teleport Kube Agent resources"""
-    print_step("Step 3/6: Cleaning up remaining Teleport Kube Agent resources...")
+    print_step("Step 3/5: Cleaning up remaining Teleport Kube Agent resources...")
     
     agent_ns = get_config_value(config, "teleport.agent_namespace", "teleport-agent")
     
-    # Delete pods
-    run_cmd(["kubectl", "delete", "pod", "-n", agent_ns, "-l", "app.kubernetes.io/name=teleport-kube-agent", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "pod", "-n", agent_ns, "-l", "app=teleport-kube-agent", "--ignore-not-found=true"], check=False)
-    
-    # Delete statefulsets
-    run_cmd(["kubectl", "delete", "statefulset", "-n", agent_ns, "teleport-agent", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "statefulset", "-n", agent_ns, "teleport-kube-agent", "--ignore-not-found=true"], check=False)
-    
-    # Delete secrets
-    run_cmd(["kubectl", "delete", "secret", "-n", agent_ns, "-l", "app.kubernetes.io/name=teleport-kube-agent", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "secret", "-n", agent_ns, "teleport-agent-join-token", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "secret", "-n", agent_ns, "teleport-kube-agent-join-token", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "secret", "-n", agent_ns, "teleport-agent-0-state", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "secret", "-n", agent_ns, "teleport-kube-agent-0-state", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "secret", "-n", agent_ns, "-l", "app.kubernetes.io/instance=teleport-agent", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "secret", "-n", agent_ns, "-l", "app.kubernetes.io/instance=teleport-kube-agent", "--ignore-not-found=true"], check=False)
-    
-    # Delete configmaps
-    run_cmd(["kubectl", "delete", "configmap", "-n", agent_ns, "teleport-agent", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "configmap", "-n", agent_ns, "teleport-kube-agent", "--ignore-not-found=true"], check=False)
-    run_cmd(["kubectl", "delete", "configmap", "-n", agent_ns, "-l", "app.kubernetes.io/name=teleport-kube-agent", "--ignore-not-found=true"], check=False)
+    plan = TeardownPlan()
+    for name in ("teleport-agent", "teleport-kube-agent"):
+        plan.delete_named(agent_ns, "statefulset", name)
+        plan.delete_named(agent_ns, "configmap", name)
+        plan.delete_named(agent_ns, "secret", f"{name}-join-token")
+        plan.delete_named(agent_ns, "secret", f"{name}-0-state")
+    for kind in ("pod", "secret", "configmap"):
+        plan.delete_selected(agent_ns, kind, "app.kubernetes.io/name=teleport-kube-agent")
+    plan.delete_selected(agent_ns, "pod", "app=teleport-kube-agent")
+    plan.delete_selected(agent_ns, "secret", "app.kubernetes.io/instance=teleport-agent")
+    plan.delete_selected(agent_ns, "secret", "app.kubernetes.io/instance=teleport-kube-agent")
+    
+    cmds = plan.commands()
+    print_info(f"🗑️  Running {len(cmds)} batched deletes in {agent_ns}")
+    _run_parallel(cmds)
     
     print_success("Teleport Kube Agent resources cleaned up")
 
 
-def remove_teleport_server(config):
-    """Remove Teleport server"""
-    print_step("Step 4/6: Removing Teleport server...")
-    
-    cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
-    run_cmd(["helm", "uninstall", "teleport-cluster", "--namespace", cluster_ns], check=False)
-    
-    print_success("Teleport server removed")
-
-
-def delete_namespaces(config):
-    """Delete all namespaces"""
-    print_step("Step 5/6: Deleting namespaces...")
+def delete_namespaces_and_rbac(config):
+    """Delete all namespaces and RBAC resources, then wait once for them to be gone"""
+    print_step("Step 4/5: Deleting namespaces and RBAC resources...")
     
     k8s_ns = get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard")
     agent_ns = get_config_value(config, "teleport.agent_namespace", "teleport-agent")
     cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
     
-    print_info(f"🗑️  Deleting namespace: {agent_ns}")
-    run_cmd(["kubectl", "delete", "namespace", agent_ns], check=False)
-    
-    print_info(f"🗑️  Deleting namespace: {k8s_ns}")
-    run_cmd(["kubectl", "delete", "namespace", k8s_ns], check=False)
-    
-    print_info(f"🗑️  Deleting namespace: {cluster_ns}")
-    run_cmd(["kubectl", "delete", "namespace", cluster_ns], check=False)
-    
-    print_info("🗑️  Deleting namespace: teleport")
-    run_cmd(["kubectl", "delete", "namespace", "teleport"], check=False)
-    
-    print_success("Namespaces deleted")
-
-
-def remove_rbac_resources():
-    """Remove RBAC resources"""
-    print_step("Step 6/6: Removing RBAC resources...")
+    namespaces = list(dict.fromkeys([agent_ns, k8s_ns, cluster_ns, "teleport"]))
+    print_info(f"🗑️  Deleting namespaces: {', '.join(namespaces)}")
     
     project_root = get_project_root()
-    run_cmd(["kubectl", "delete", "-f", str(project_root / "k8s/rbac.yaml")], check=False)
+    (ns_code, ns_output, _), _ = _run_parallel([
+        ["kubectl", "delete", "namespace", *namespaces, "--ignore-not-found=true", "--wait=false"],
+        ["kubectl", "delete", "-f", str(project_root / "k8s/rbac.yaml"), "--ignore-not-found=true", "--wait=false"],
+    ])
+    
+    # Only wait for namespaces that actually existed
+    deleting = [ns for ns in namespaces if f'namespace "{ns}" deleted' in ns_output]
+    if deleting:
+        print_step("Step 5/5: Waiting for namespaces to terminate...")
+        exit_code, _, _ = run_cmd([
+            "kubectl", "wait", "--for=delete",
+            *[f"namespace/{ns}" for ns in deleting],
+            f"--timeout={NAMESPACE_DELETE_TIMEOUT}s"
+        ], check=False)
+        if exit_code != 0:
+            print_warning(f"Some namespaces are still terminating after {NAMESPACE_DELETE_TIMEOUT}s")
     
+    print_success("Namespaces deleted")
     print_success("RBAC resources removed")
 
 
@@ -153,13 +195,7 @@ def main():
     cleanup_agent_resources(config)
     print()
     
-    remove_teleport_server(config)
-    print()
-    
-    delete_namespaces(config)
-    print()
-    
-    remove_rbac_resources()
+    delete_namespaces_and_rbac(config)
     print()
     
     print("✅ Full cleanup complete!")
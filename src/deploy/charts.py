@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Local chart cache
+
+Each pinned chart version is pulled once into
+.state/charts/<chart>/<version>/<sha256>.tgz. The file is verified against
+the digest in the Helm repo index, and installs use the local archive. A
+warm cache needs neither the repo index nor the network. Pulls take a file
+lock, so concurrent deploys (threads or fleet processes) share one
+download.
+"""
+
+import fcntl
+import hashlib
+import re
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+from .common import (
+    get_config_value, get_state_dir, print_error, print_info, print_success, print_warning, run_cmd,
+    DASHBOARD_CHART_VERSION
+)
+from .helm import ensure_helm_repo, repo_index_path
+
+CHARTS_DIR = "charts"
+
+DASHBOARD_CHART = "kubernetes-dashboard/kubernetes-dashboard"
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_digest(repo: str, name: str, version: str) -> Optional[str]:
+    """sha256 digest of a chart version from the cached repo index, or None"""
+    try:
+        data = repo_index_path(repo).read_bytes()
+    except OSError:
+        return None
+    url = data.find(f"/{name}-{version}.tgz".encode())
+    if url == -1:
+        return None
+    # Index entries are "  - " list items; the digest key comes before urls within an entry
+    entry = data.rfind(b"\n  - ", 0, url)
+    match = re.search(rb"\n\s+digest: ([0-9a-f]{64})", data[max(entry, 0):url])
+    return match.group(1).decode() if match else None
+
+
+def _cached(directory: Path) -> Optional[Path]:
+    """A verified archive in a chart version's cache directory, or None"""
+    for path in sorted(directory.glob("*.tgz")):
+        if _sha256(path) == path.stem:
+            return path
+        print_warning(f"Cached chart {path} doesn't match its digest, discarding it")
+        path.unlink(missing_ok=True)
+    return None
+
+
+def chart_archive(chart: str, version: str, config: Optional[Dict] = None) -> Optional[str]:
+    """
+    Local .tgz for repo/chart at version, pulling and verifying it on first
+    use. Returns None (with a warning) if the pull fails, so helm installs
+    chart --version version from the repo instead.
+    """
+    repo, name = chart.split("/", 1)
+    directory = get_state_dir() / CHARTS_DIR / name / version
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _cached(directory)
+    if path:
+        return str(path)
+
+    with open(directory / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Another deploy may have pulled it while we waited for the lock
+        path = _cached(directory)
+        if path:
+            return str(path)
+
+        ensure_helm_repo(repo, config, name, version)
+        print_info(f"📥 Pulling chart {chart} {version} into the local chart cache...")
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            exit_code, _, stderr = run_cmd(["helm", "pull", chart, "--version", version, "--destination", tmp],
+                                           check=False)
+            pulled = next(iter(Path(tmp).glob("*.tgz")), None)
+            if exit_code != 0 or pulled is None:
+                print_warning(f"helm pull {chart} {version} failed, installing from the repo: {stderr}")
+                return None
+
+            digest = _sha256(pulled)
+            expected = index_digest(repo, name, version)
+            if expected is None:
+                print_warning(f"No digest for {name}-{version} in the {repo} index, caching it as sha256:{digest[:12]}")
+            elif expected != digest:
+                print_error(f"Chart {name}-{version} digest mismatch: index has {expected}, download is {digest}")
+                sys.exit(1)
+            path = directory / f"{digest}.tgz"
+            shutil.move(str(pulled), path)
+
+    print_success(f"Cached chart {name}-{version} (sha256:{digest[:12]})")
+    return str(path)
+
+
+def dashboard_chart_version(config: Dict) -> str:
+    """The dashboard chart version: helm.dashboard_chart_version or the pinned DASHBOARD_CHART_VERSION"""
+    return str(get_config_value(config, "helm.dashboard_chart_version", "") or DASHBOARD_CHART_VERSION)
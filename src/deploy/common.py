@@ -8,14 +8,21 @@ import sys
 import subprocess
 import re
 import time
-import tempfile
 import base64
+import random
+import socket
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import Callable, Optional, Dict, List, Tuple, Union
+from .profiler import profile_span, profiled_sleep, command_group
 
-try:
-    import yaml
-except ImportError:
+def load_yaml():
+    """Import PyYAML on first use, installing it if it is missing"""
+    try:
+        import yaml
+        return yaml
+    except ImportError:
+        pass
     print("⚠️  PyYAML is required but not installed.")
     print("📦 Attempting to install PyYAML...")
     try:
@@ -23,6 +30,7 @@ except ImportError:
                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         print("✅ PyYAML installed successfully!")
         import yaml  # Try importing again
+        return yaml
     except (subprocess.CalledProcessError, ImportError):
         print("❌ Failed to automatically install PyYAML.")
         print("💡 Please install it manually:")
@@ -32,6 +40,22 @@ except ImportError:
         sys.exit(1)
 
 
+# Pinned Teleport Helm chart version (teleport-cluster and teleport-kube-agent)
+TELEPORT_CHART_VERSION = "18.6.0"
+
+# Pinned kubernetes-dashboard Helm chart version (helm.dashboard_chart_version overrides it)
+DASHBOARD_CHART_VERSION = "7.13.0"
+
+# Lifetime of the agent join tokens created by deploy
+JOIN_TOKEN_TTL_HOURS = 24
+
+# An existing join token is reused while it has at least this long left
+JOIN_TOKEN_MIN_TTL_HOURS = 12
+
+# Stands in for the join token where its value mustn't matter (fingerprints, offline renders)
+JOIN_TOKEN_PLACEHOLDER = "<join-token>"
+
+
 class Colors:
     """ANSI color codes for terminal output"""
     HEADER = '\033[95m'
@@ -45,64 +69,96 @@ class Colors:
 
 
 class StepCounter:
-    """Counter for tracking deployment steps"""
+    """Counter for tracking deployment steps (safe to share between deploy tasks)"""
     def __init__(self, total_steps: int):
         self.current = 0
         self.total = total_steps
+        self._lock = threading.Lock()
     
     def next(self, step_name: str) -> str:
         """Get next step message"""
-        self.current += 1
-        return f"Step {self.current}/{self.total}: {step_name}"
+        with self._lock:
+            self.current += 1
+            return f"Step {self.current}/{self.total}: {step_name}"
+
+
+# Output from concurrent deploy tasks is serialized through one lock and
+# prefixed with the task label of the calling thread
+_print_lock = threading.Lock()
+_output = threading.local()
+
+
+def set_output_label(label: Optional[str]):
+    """Set (or clear with None) the prefix for messages printed by the current thread"""
+    _output.label = label
+
+
+def _emit(msg: str, leading_newline: bool = False):
+    """Print a message atomically, prefixing each line with the thread's task label"""
+    label = getattr(_output, "label", None)
+    if label:
+        msg = "\n".join(f"{Colors.HEADER}[{label}]{Colors.ENDC} {line}" for line in msg.split("\n"))
+    if leading_newline:
+        msg = "\n" + msg
+    with _print_lock:
+        print(msg, flush=True)
 
 
 def print_step(msg: str):
     """Print a step message"""
-    print(f"\n{Colors.BOLD}{msg}{Colors.ENDC}")
+    _emit(f"{Colors.BOLD}{msg}{Colors.ENDC}", leading_newline=True)
 
 
 def print_info(msg: str):
     """Print an info message"""
-    print(f"{Colors.OKCYAN}{msg}{Colors.ENDC}")
+    _emit(f"{Colors.OKCYAN}{msg}{Colors.ENDC}")
 
 
 def print_success(msg: str):
     """Print a success message"""
-    print(f"{Colors.OKGREEN}✅ {msg}{Colors.ENDC}")
+    _emit(f"{Colors.OKGREEN}✅ {msg}{Colors.ENDC}")
 
 
 def print_warning(msg: str):
     """Print a warning message"""
-    print(f"{Colors.WARNING}⚠️  {msg}{Colors.ENDC}")
+    _emit(f"{Colors.WARNING}⚠️  {msg}{Colors.ENDC}")
 
 
 def print_error(msg: str):
     """Print an error message"""
-    print(f"{Colors.FAIL}❌ {msg}{Colors.ENDC}")
+    _emit(f"{Colors.FAIL}❌ {msg}{Colors.ENDC}")
+
+
+def print_output(text: str):
+    """Print raw command output (labelled like the other print helpers)"""
+    _emit(text)
 
 
 def run_cmd(cmd: list, check: bool = True, capture_output: bool = False, **kwargs) -> Tuple[int, str, str]:
     """
     Run a shell command and return exit code, stdout, stderr
+    
+    Runs on the async executor (deploy.executor): timeout= overrides the
+    tool's default deadline and retries= the number of retries of
+    transient failures (by default only idempotent commands are retried).
     """
+    from .executor import run
     try:
-        result = subprocess.run(
-            cmd,
-            check=False,
-            capture_output=True,
-            text=True,
-            **kwargs
-        )
-        stdout = result.stdout.strip() if result.stdout else ""
-        stderr = result.stderr.strip() if result.stderr else ""
+        with profile_span(" ".join(cmd[:3]), "cmd", group=command_group(cmd), argv=list(cmd)) as span:
+            exit_code, stdout, stderr, attempts = run(cmd, **kwargs)
+            if span is not None:
+                span.args["exit_code"] = exit_code
+                span.args["attempts"] = attempts
+        stdout = stdout.strip() if stdout else ""
+        stderr = stderr.strip() if stderr else ""
         
-        if check and result.returncode != 0:
+        if check and exit_code != 0:
             print_error(f"Command failed: {' '.join(cmd)}")
             if stderr:
                 print_error(f"Error: {stderr}")
             sys.exit(1)
         
-        return result.returncode, stdout, stderr
+        return exit_code, stdout, stderr
     except Exception as e:
         if check:
             print_error(f"Failed to run command: {e}")
@@ -123,16 +179,41 @@ def get_project_root() -> Path:
     return current
 
 
+# Environment variable pointing at an alternative state directory (used by the benchmark's simulated runs)
+STATE_DIR_ENV = "K8S_DASHBOARD_STATE_DIR"
+
+
+def get_state_dir() -> Path:
+    """Get the local state directory (.state/ under the project root, or $K8S_DASHBOARD_STATE_DIR), creating it if needed"""
+    if os.environ.get(STATE_DIR_ENV):
+        state_dir = Path(os.environ[STATE_DIR_ENV])
+        state_dir.mkdir(parents=True, exist_ok=True)
+        return state_dir
+    state_dir = get_project_root() / ".state"
+    state_dir.mkdir(exist_ok=True)
+    return state_dir
+
+
+# Environment variable pointing at an alternative config file (used for per-cluster fleet runs)
+CONFIG_PATH_ENV = "K8S_DASHBOARD_CONFIG"
+
+
+def get_config_path() -> Path:
+    """Path of config.yaml (or the file named by $K8S_DASHBOARD_CONFIG)"""
+    if os.environ.get(CONFIG_PATH_ENV):
+        return Path(os.environ[CONFIG_PATH_ENV])
+    return get_project_root() / "config.yaml"
+
+
 def read_config() -> Dict:
-    """Read and parse config.yaml"""
-    project_root = get_project_root()
-    config_path = project_root / "config.yaml"
+    """Read and parse config.yaml (or the file named by $K8S_DASHBOARD_CONFIG)"""
+    config_path = get_config_path()
     if not config_path.exists():
         print_error("config.yaml not found. Run 'make config' first.")
         sys.exit(1)
     
     with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
+        config = load_yaml().safe_load(f)
     
     return config
 
@@ -149,36 +230,122 @@ def get_config_value(config: Dict, path: str, default: str = "") -> str:
     return str(value).strip() if value else default
 
 
-def wait_for_pod(namespace: str, label_selector: str, timeout: int = 120) -> Optional[str]:
-    """Wait for a pod to be created and return its name"""
-    print_info(f"⏳ Waiting for pod with selector {label_selector}...")
-    start_time = time.time()
+class Condition:
+    """A named readiness check, polled by wait_until() until it returns True"""
+    def __init__(self, name: str, check: Callable[[], bool]):
+        self.name = name
+        self.check = check
     
-    while time.time() - start_time < timeout:
-        exit_code, output, _ = run_cmd([
-            "kubectl", "-n", namespace, "get", "pods",
-            "-l", label_selector,
-            "-o", "jsonpath={.items[0].metadata.name}"
-        ], check=False)
+    def holds(self) -> bool:
+        """Evaluate the check, treating errors as 'not yet'"""
+        try:
+            return bool(self.check())
+        except Exception:
+            return False
+
+
+def wait_until(conditions: Union[Condition, List[Condition]], timeout: float = 60,
+               initial_delay: float = 0.25, max_delay: float = 5.0) -> bool:
+    """
+    Poll conditions until all of them hold or the deadline passes.
+    
+    Returns as soon as every condition holds. Between polls the delay grows
+    exponentially (x2, capped at max_delay) with jitter so concurrent waiters
+    don't poll in lockstep. Returns False on timeout.
+    """
+    if isinstance(conditions, Condition):
+        conditions = [conditions]
+    pending = list(conditions)
+    names = ", ".join(c.name for c in pending)
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = initial_delay
+    announced = False
+    
+    while True:
+        pending = [c for c in pending if not c.holds()]
+        if not pending:
+            if announced:
+                print_success(f"Ready: {names} ({time.monotonic() - start:.1f}s)")
+            return True
         
-        if exit_code == 0 and output:
-            return output.strip()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print_warning(f"Timed out after {timeout:g}s waiting for: {', '.join(c.name for c in pending)}")
+            return False
         
-        time.sleep(2)
-    
-    return None
+        if not announced:
+            print_info(f"⏳ Waiting for {names}...")
+            announced = True
+        
+        # Equal jitter: sleep between half and the full current delay
+        pause = min(remaining, delay / 2 + random.uniform(0, delay / 2))
+        profiled_sleep(pause, f"wait: {pending[0].name}")
+        delay = min(delay * 2, max_delay)
+
+
+def command_succeeds(name: str, cmd: list) -> Condition:
+    """Condition: cmd exits with status 0"""
+    return Condition(name, lambda: run_cmd(cmd, check=False)[0] == 0)
+
+
+def secret_has_data(namespace: str, secret: str, key: str = "token") -> Condition:
+    """Condition: the secret exists and has a non-empty .data.<key>"""
+    def check():
+        from .kube import kube_get
+        obj = kube_get("secrets", secret, namespace) or {}
+        return bool((obj.get("data") or {}).get(key))
+    return Condition(f"secret {namespace}/{secret} has .data.{key}", check)
+
+
+def service_has_endpoints(namespace: str, service: str) -> Condition:
+    """Condition: the service has at least one ready endpoint address"""
+    def check():
+        from .kube import kube_get
+        obj = kube_get("endpoints", service, namespace) or {}
+        return any(subset.get("addresses") for subset in obj.get("subsets") or [])
+    return Condition(f"service {namespace}/{service} has endpoints", check)
+
+
+def tctl_ready(namespace: str, pod: str) -> Condition:
+    """Condition: `tctl status` succeeds inside the auth pod"""
+    return command_succeeds(
+        f"tctl status in {pod}",
+        ["kubectl", "exec", "-n", namespace, pod, "--", "tctl", "status"]
+    )
+
+
+def port_open(port: int, host: str = "127.0.0.1") -> Condition:
+    """Condition: something accepts TCP connections on host:port"""
+    def check():
+        with socket.create_connection((host, port), timeout=1):
+            return True
+    return Condition(f"{host}:{port} accepting connections", check)
+
+
+def wait_for_pods(targets: list, timeout: int = 120) -> Dict[int, Optional[str]]:
+    """Wait on several pod targets (see deploy.watch.PodTarget) with one watch stream each"""
+    from .watch import watch_pods
+    return watch_pods(targets, timeout=timeout)
+
+
+def wait_for_pod(namespace: str, label_selector: str, timeout: int = 120) -> Optional[str]:
+    """Wait for a pod to be created and return its name"""
+    from .podindex import get_pod_index
+    from .watch import PodTarget
+    # Already there? Then there's no need to open a watch
+    for pod in get_pod_index().find(namespace, [label_selector], refresh=True):
+        if not pod["metadata"].get("deletionTimestamp"):
+            return pod["metadata"]["name"]
+    return wait_for_pods([PodTarget(namespace, label_selector=label_selector)], timeout=timeout)[0]
 
 
 def wait_for_pod_ready(namespace: str, pod_name: str, timeout: int = 120) -> bool:
     """Wait for a pod to be ready"""
-    print_info(f"⏳ Waiting for pod {pod_name} to be ready...")
-    exit_code, _, _ = run_cmd([
-        "kubectl", "wait", "--for=condition=ready",
-        f"pod/{pod_name}", "-n", namespace,
-        f"--timeout={timeout}s"
-    ], check=False)
+    from .watch import PodTarget
+    ready = wait_for_pods([PodTarget(namespace, name=pod_name, state="ready")], timeout=timeout)[0]
     
-    if exit_code == 0:
+    if ready:
         print_success(f"Pod {pod_name} is ready")
         return True
     else:
@@ -192,40 +359,45 @@ def deploy_rbac():
     project_root = get_project_root()
     run_cmd(["kubectl", "apply", "-f", str(project_root / "k8s/namespace.yaml")])
     run_cmd(["kubectl", "apply", "-f", str(project_root / "k8s/rbac.yaml")])
-    print_info("⏳ Waiting for tokens to be generated...")
-    time.sleep(5)
+    # Namespace matches k8s/rbac.yaml
+    wait_until([
+        secret_has_data("kubernetes-dashboard", "dashboard-token"),
+        secret_has_data("kubernetes-dashboard", "dashboard-readonly-token"),
+    ], timeout=30)
     print_success("RBAC resources deployed!")
 
 
+def rbac_deployed() -> bool:
+    """Whether the RBAC resources from a previous deploy are still in place (token secrets populated)"""
+    return all(condition.holds() for condition in (
+        secret_has_data("kubernetes-dashboard", "dashboard-token"),
+        secret_has_data("kubernetes-dashboard", "dashboard-readonly-token"),
+    ))
+
+
 def deploy_dashboard(config: Dict):
     """Deploy Kubernetes Dashboard (common to both modes)"""
     print_info("🔧 Installing Kubernetes Dashboard...")
     
     k8s_ns = get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard")
     
-    # Add helm repo
-    run_cmd(["helm", "repo", "add", "kubernetes-dashboard", "https://kubernetes.github.io/dashboard"], check=False)
-    run_cmd(["helm", "repo", "update"])
+    # Pinned chart version (config override or DASHBOARD_CHART_VERSION), installed from the local chart cache
+    from .charts import DASHBOARD_CHART, chart_archive, dashboard_chart_version
+    from .helm import helm_upgrade
+    version = dashboard_chart_version(config)
     
     # Deploy Dashboard
-    run_cmd([
-        "helm", "upgrade", "--install", "kubernetes-dashboard",
-        "kubernetes-dashboard/kubernetes-dashboard",
-        "--create-namespace",
-        "--namespace", k8s_ns,
-        "--wait", "--timeout=5m"
-    ], check=False)
+    helm_upgrade(
+        "kubernetes-dashboard", DASHBOARD_CHART, k8s_ns, version=version,
+        extra_args=["--create-namespace", "--wait", "--timeout=5m"],
+        source=chart_archive(DASHBOARD_CHART, version, config)
+    )
     
-    print_info("⏳ Waiting for Dashboard service to be ready...")
-    time.sleep(10)
+    wait_until(service_has_endpoints(k8s_ns, "kubernetes-dashboard-kong-proxy"), timeout=60)
     
     # Check for dashboard service
-    exit_code, _, _ = run_cmd([
-        "kubectl", "-n", k8s_ns, "get", "svc",
-        "kubernetes-dashboard-kong-proxy"
-    ], check=False)
-    
-    if exit_code != 0:
+    from .kube import kube_get
+    if kube_get("services", "kubernetes-dashboard-kong-proxy", k8s_ns) is None:
         print_error("kubernetes-dashboard-kong-proxy service not found.")
         sys.exit(1)
     
@@ -233,18 +405,30 @@ def deploy_dashboard(config: Dict):
     return k8s_ns
 
 
-def deploy_agent_common(config: Dict, token: str, proxy_clean: str, cluster_name: str, agent_ns: str, k8s_ns: str, is_local: bool = False):
-    """Deploy Teleport Agent - common parts"""
-    print_info("🔧 Installing Teleport Kube Agent...")
+def dashboard_clusterip(k8s_ns: str) -> Optional[str]:
+    """The ClusterIP of the dashboard Kong proxy service, or None"""
+    from .kube import kube_get
+    service = kube_get("services", "kubernetes-dashboard-kong-proxy", k8s_ns) or {}
+    return (service.get("spec") or {}).get("clusterIP")
+
+
+def get_dashboard_clusterip(k8s_ns: str) -> str:
+    """Get the ClusterIP of the dashboard Kong proxy service (exits if missing)"""
+    cluster_ip = dashboard_clusterip(k8s_ns)
     
-    # Add helm repo
-    run_cmd(["helm", "repo", "add", "teleport", "https://charts.releases.teleport.dev"], check=False)
-    run_cmd(["helm", "repo", "update"])
+    if not cluster_ip:
+        print_error("Failed to get ClusterIP for kubernetes-dashboard-kong-proxy service")
+        sys.exit(1)
     
-    # Create temp values file
+    return cluster_ip
+
+
+def build_agent_values(token: str, proxy_clean: str, cluster_name: str, k8s_ns: str,
+                       is_local: bool = False, cluster_ip: Optional[str] = None) -> str:
+    """Helm values for the Teleport Kube Agent"""
     if is_local:
         # Local mode: use discovery
-        temp_values_content = f"""authToken: {token}
+        return f"""authToken: {token}
 proxyAddr: {proxy_clean}
 kubeClusterName: {cluster_name}
 roles: kube,app,discovery
@@ -264,19 +448,8 @@ kubernetesDiscovery:
     namespaces:
     - {k8s_ns}
 """
-    else:
-        # Enterprise mode: use static app config
-        exit_code, cluster_ip, _ = run_cmd([
-            "kubectl", "-n", k8s_ns, "get", "svc",
-            "kubernetes-dashboard-kong-proxy",
-            "-o", "jsonpath={.spec.clusterIP}"
-        ], check=False)
-        
-        if not cluster_ip:
-            print_error("Failed to get ClusterIP for kubernetes-dashboard-kong-proxy service")
-            sys.exit(1)
-        
-        temp_values_content = f"""authToken: {token}
+    # Enterprise mode: use static app config
+    return f"""authToken: {token}
 proxyAddr: {proxy_clean}
 kubeClusterName: {cluster_name}
 roles: kube,app
@@ -289,27 +462,34 @@ apps:
     labels:
       cluster: {cluster_name}
 """
+
+
+def deploy_agent_common(config: Dict, token: str, proxy_clean: str, cluster_name: str, agent_ns: str, k8s_ns: str,
+                        is_local: bool = False, cluster_ip: Optional[str] = None) -> bool:
+    """Deploy Teleport Agent - common parts; returns False if the release was already up to date"""
+    print_info("🔧 Installing Teleport Kube Agent...")
     
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-        temp_values_file = f.name
-        f.write(temp_values_content)
+    from .charts import chart_archive
+    from .helm import helm_upgrade
     
-    try:
-        exit_code, _, stderr = run_cmd([
-            "helm", "upgrade", "--install", "teleport-agent",
-            "teleport/teleport-kube-agent",
-            "--version", "18.6.0",
-            "--create-namespace",
-            "--namespace", agent_ns,
-            "-f", temp_values_file
-        ], check=False)
-        
-        if exit_code != 0:
-            print_error("Failed to deploy Teleport agent. Check the error above.")
-            print(stderr)
-            sys.exit(1)
-    finally:
-        os.unlink(temp_values_file)
+    if not is_local and not cluster_ip:
+        cluster_ip = get_dashboard_clusterip(k8s_ns)
     
-    print_success("Teleport agent deployed")
-
+    # The join token is only used for the agent's first join, so a fresh token alone isn't a change
+    exit_code, stderr, changed = helm_upgrade(
+        "teleport-agent", "teleport/teleport-kube-agent", agent_ns,
+        build_agent_values(token, proxy_clean, cluster_name, k8s_ns, is_local, cluster_ip),
+        version=TELEPORT_CHART_VERSION,
+        extra_args=["--create-namespace"],
+        fingerprint_values=build_agent_values(JOIN_TOKEN_PLACEHOLDER, proxy_clean, cluster_name, k8s_ns, is_local, cluster_ip),
+        source=chart_archive("teleport/teleport-kube-agent", TELEPORT_CHART_VERSION, config)
+    )
+    
+    if exit_code != 0:
+        print_error("Failed to deploy Teleport agent. Check the error above.")
+        print_output(stderr)
+        sys.exit(1)
+    
+    if changed:
+        print_success("Teleport agent deployed")
+    return changed
@@ -10,14 +10,21 @@ Enterprise mode specific deployment functions
 
 import os
 import sys
-import re
-import time
 import platform
 from typing import Dict
 from .common import (
-    print_step, print_info, print_success, print_warning, print_error,
+    print_step, print_info, print_success, print_warning, print_error, print_output,
     run_cmd, get_config_value, StepCounter
 )
+from .tokens import ENTERPRISE_ROLES, acquire_join_token, enterprise_tctl
+
+
+def clean_proxy_addr(proxy: str) -> str:
+    """host:port of the proxy_addr URL (port 443 when none is given)"""
+    proxy_clean = proxy.replace("https://", "").replace("http://", "")
+    if ":" not in proxy_clean:
+        proxy_clean = f"{proxy_clean}:443"
+    return proxy_clean
 
 
 def install_tctl():
@@ -65,15 +72,10 @@ def setup_tctl(config: Dict, steps: StepCounter) -> str:
         install_tctl()
     
     # Configure tctl
-    proxy_clean = proxy.replace("https://", "").replace("http://", "")
-    if ":" not in proxy_clean:
-        proxy_clean = f"{proxy_clean}:443"
-    
-    os.environ["TELEPORT_PROXY"] = proxy_clean
+    proxy_clean = clean_proxy_addr(proxy)
     
     # Check authentication
-    exit_code, output, _ = run_cmd(["tctl", "status"], check=False)
-    if exit_code != 0:
+    if not tctl_authenticated(proxy_clean):
         print_warning("tctl is not authenticated to Teleport Enterprise cluster")
         print_info("   Please run the following command to authenticate:")
         print_info(f"   tsh login --user=TELEPORT_USER --proxy={proxy_clean} --auth local")
@@ -85,47 +87,37 @@ def setup_tctl(config: Dict, steps: StepCounter) -> str:
     return proxy_clean
 
 
+def tctl_authenticated(proxy_clean: str) -> bool:
+    """Point tctl at the proxy and check that it is logged in"""
+    os.environ["TELEPORT_PROXY"] = proxy_clean
+    exit_code, _, _ = run_cmd(["tctl", "status"], check=False)
+    return exit_code == 0
+
+
+def token_exists_enterprise(token: str) -> bool:
+    """Whether the join token is still known to the Teleport Enterprise cluster"""
+    exit_code, output, _ = run_cmd(["tctl", "tokens", "ls"], check=False)
+    return exit_code == 0 and token in output
+
+
 def generate_token_enterprise(proxy_clean: str, steps: StepCounter) -> str:
-    """Generate Teleport join token (enterprise mode only)"""
-    print_step(steps.next("Generating Teleport join token..."))
-    
-    token = None
-    for attempt in range(2):
-        exit_code, output, _ = run_cmd([
-            "tctl", "tokens", "add",
-            "--type=kube,app",
-            "--ttl=24h"
-        ], check=False)
-        
-        if exit_code != 0:
-            if attempt == 0:
-                print_warning("Token generation failed. Output:")
-                print(output)
-                print_info("⏳ Retrying...")
-                time.sleep(5)
-                continue
-            else:
-                print_error("Token generation failed after retry")
-                print("Full output:")
-                print(output)
-                print_info("   This might be due to authentication. Please ensure:")
-                print_info(f"   1. You are logged in to Teleport: tsh login --user=TELEPORT_USER --proxy={proxy_clean} --auth local")
-                print_warning("      ⚠️  Note: Use an authenticator app (TOTP) for MFA, not passkeys.")
-                print_info("         See: https://github.com/gravitational/teleport/issues/44600")
-                print_info("   2. Or generate token via Teleport Web UI: Settings → Authentication → Tokens")
-                sys.exit(1)
-        
-        # Extract token
-        token_match = re.search(r'[a-f0-9]{32}', output)
-        if token_match:
-            token = token_match.group(0)
-            break
+    """Reuse or generate a Teleport join token (enterprise mode only)"""
+    print_step(steps.next("Getting Teleport join token..."))
     
+    # Transient tctl failures are retried with backoff by the command executor
+    token, output = acquire_join_token(proxy_clean, ENTERPRISE_ROLES, enterprise_tctl)
     if not token:
-        print_error("Failed to extract token")
+        print_error("Token generation failed")
+        print_output("Full output:")
+        print_output(output)
+        print_info("   This might be due to authentication. Please ensure:")
+        print_info(f"   1. You are logged in to Teleport: tsh login --user=TELEPORT_USER --proxy={proxy_clean} --auth local")
+        print_warning("      ⚠️  Note: Use an authenticator app (TOTP) for MFA, not passkeys.")
+        print_info("         See: https://github.com/gravitational/teleport/issues/44600")
+        print_info("   2. Or generate token via Teleport Web UI: Settings → Authentication → Tokens")
         sys.exit(1)
     
-    print_success(f"Generated token: {token}")
+    print_success(f"Join token: {token}")
     return token
 
 
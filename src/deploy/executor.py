@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Async command executor
+
+Every external command (kubectl, helm, tctl, ...) runs on one asyncio event
+loop in a background thread; run_cmd() in common.py is the synchronous
+facade over it, so callers on any thread keep their blocking call. The
+executor gives each call a deadline (per-tool default, stretched to cover
+the command's own --timeout), caps how many commands of one tool run at
+once, classifies failures as transient (API server unreachable, timeouts,
+throttling) or permanent, and retries transient ones with capped
+exponential backoff. Independent commands can be run together with
+run_cmds().
+"""
+
+import asyncio
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from .profiler import command_group, profile_span
+
+# Concurrent commands per tool (others share DEFAULT_CONCURRENCY)
+TOOL_CONCURRENCY = {"kubectl": 8, "helm": 4, "tctl": 4}
+DEFAULT_CONCURRENCY = 8
+
+# Deadline per call (seconds) unless the caller passes timeout=; None means no deadline
+TOOL_TIMEOUTS = {"kubectl": 180, "helm": 600, "tctl": 120}
+
+# Commands that are safe to repeat, retried on transient failures unless retries= says otherwise
+# (not `kubectl wait`: it already waits out its own --timeout)
+IDEMPOTENT_COMMANDS = {
+    "kubectl get", "kubectl describe", "kubectl version", "kubectl config", "kubectl apply",
+    "helm list", "helm status", "helm search", "helm version", "helm get", "helm history",
+    "helm repo", "helm pull", "helm template", "tctl status", "tctl get",
+}
+DEFAULT_RETRIES = 2
+
+# Backoff between attempts: RETRY_BASE_DELAY, doubling, capped at RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 8.0
+
+# Exit code reported when a call hits its deadline (as coreutils timeout does)
+TIMEOUT_EXIT_CODE = 124
+
+# stderr of a failure that is likely to go away on its own
+TRANSIENT_PATTERNS = re.compile(
+    r"connection refused|connection reset|i/o timeout|tls handshake timeout|timed out|deadline exceeded"
+    r"|unexpected eof|broken pipe|no route to host|temporarily unavailable|try again"
+    r"|the server is currently unable to handle the request|serviceunavailable|too many requests"
+    r"|etcdserver: request timed out|error dialing backend|internal error occurred"
+    r"|the object has been modified|unable to upgrade connection",
+    re.IGNORECASE
+)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def is_transient(exit_code: int, stderr: str) -> bool:
+    """Whether a failed command is worth retrying"""
+    return exit_code == TIMEOUT_EXIT_CODE or bool(TRANSIENT_PATTERNS.search(stderr or ""))
+
+
+def _tool(cmd: List[str]) -> str:
+    return os.path.basename(str(cmd[0])) if cmd else ""
+
+
+def _deadline(cmd: List[str], timeout: Optional[float]) -> Optional[float]:
+    """The call's deadline: timeout if given, else the tool default, never shorter than the command's own --timeout"""
+    if timeout is not None:
+        return timeout
+    deadline = TOOL_TIMEOUTS.get(_tool(cmd))
+    for i, arg in enumerate(cmd):
+        value = arg.split("=", 1)[1] if arg.startswith("--timeout=") else (
+            cmd[i + 1] if arg == "--timeout" and i + 1 < len(cmd) else None)
+        match = re.fullmatch(r"(\d+)([smh]?)", value or "")
+        if match and deadline is not None:
+            own = int(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+            deadline = max(deadline, own + 30)
+    return deadline
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """The executor's event loop, started in a daemon thread on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="cmd-executor", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def _semaphore(tool: str) -> asyncio.Semaphore:
+    # Only touched from the loop thread
+    if tool not in _semaphores:
+        _semaphores[tool] = asyncio.Semaphore(TOOL_CONCURRENCY.get(tool, DEFAULT_CONCURRENCY))
+    return _semaphores[tool]
+
+
+async def _attempt(cmd: List[str], deadline: Optional[float], input: Optional[str], **kwargs) -> Tuple[int, str, str]:
+    """Run cmd once; (exit_code, stdout, stderr) with TIMEOUT_EXIT_CODE when the deadline passes"""
+    async with _semaphore(_tool(cmd)):
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **kwargs
+            )
+        except OSError as e:
+            return 127, "", str(e)
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(input.encode() if input is not None else None), deadline)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return TIMEOUT_EXIT_CODE, "", f"{' '.join(cmd[:3])} timed out after {deadline:g}s"
+        except asyncio.CancelledError:
+            # The caller was interrupted; don't leave the command running
+            process.kill()
+            raise
+        return process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+
+
+async def execute(cmd: List[str], timeout: Optional[float] = None, retries: Optional[int] = None,
+                  input: Optional[str] = None, **kwargs) -> Tuple[int, str, str, int]:
+    """Run cmd with its deadline, retrying transient failures; (exit_code, stdout, stderr, attempts)"""
+    if retries is None:
+        retries = DEFAULT_RETRIES if command_group(cmd) in IDEMPOTENT_COMMANDS else 0
+    deadline = _deadline(cmd, timeout)
+    delay = RETRY_BASE_DELAY
+    attempt = 0
+    while True:
+        attempt += 1
+        exit_code, stdout, stderr = await _attempt(cmd, deadline, input, **kwargs)
+        if exit_code == 0 or attempt > retries or not is_transient(exit_code, stderr):
+            return exit_code, stdout, stderr, attempt
+        with profile_span(f"retry backoff {command_group(cmd)}", "sleep", group="sleep", seconds=delay):
+            await asyncio.sleep(delay)
+        delay = min(delay * 2, RETRY_MAX_DELAY)
+
+
+def run(cmd: List[str], **kwargs) -> Tuple[int, str, str, int]:
+    """Run one command on the executor and wait for it (the blocking entry point used by run_cmd)"""
+    future = asyncio.run_coroutine_threadsafe(execute(cmd, **kwargs), _get_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def run_cmds(cmds: List[List[str]], **kwargs) -> List[Tuple[int, str, str]]:
+    """Run independent commands concurrently (within the per-tool limits); results in input order"""
+    async def gather():
+        return await asyncio.gather(*(execute(cmd, **kwargs) for cmd in cmds))
+    if not cmds:
+        return []
+    with profile_span(f"{len(cmds)} commands", "cmd", group=command_group(cmds[0])):
+        future = asyncio.run_coroutine_threadsafe(gather(), _get_loop())
+        try:
+            results = future.result()
+        except BaseException:
+            future.cancel()
+            raise
+    return [(exit_code, stdout.strip(), stderr.strip()) for exit_code, stdout, stderr, _ in results]
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Helm repository index cache
+
+Adds the repos this tool needs once and refreshes only those repos - and
+only when the cached index is older than a TTL or doesn't contain the
+pinned chart version yet. Works offline while the cache is warm.
+
+helm_upgrade() skips no-op upgrades: a fingerprint of chart, version and
+rendered values is kept per release in .state/ and compared before running
+`helm upgrade --install`. helm_template() output is cached by content in
+.state/render-cache.
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from .common import run_cmd, get_config_value, get_state_dir, print_info, print_warning, print_error
+
+HELM_REPOS = {
+    "teleport": "https://charts.releases.teleport.dev",
+    "kubernetes-dashboard": "https://kubernetes.github.io/dashboard",
+}
+
+# Default max age of a repo index before `helm repo update` is run (seconds)
+DEFAULT_REPO_CACHE_TTL = 3600
+
+_lock = threading.Lock()
+_configured_repos: Optional[Dict[str, str]] = None
+_fresh_repos = set()
+
+
+def helm_repository_cache() -> Path:
+    """Directory where helm stores <repo>-index.yaml files"""
+    if os.environ.get("HELM_REPOSITORY_CACHE"):
+        return Path(os.environ["HELM_REPOSITORY_CACHE"])
+    if os.environ.get("XDG_CACHE_HOME"):
+        return Path(os.environ["XDG_CACHE_HOME"]) / "helm" / "repository"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "helm" / "repository"
+    return Path.home() / ".cache" / "helm" / "repository"
+
+
+def repo_index_path(repo: str) -> Path:
+    return helm_repository_cache() / f"{repo}-index.yaml"
+
+
+def index_has_chart(repo: str, chart: str, version: str) -> bool:
+    """Check the cached index for a chart version without parsing the (large) YAML"""
+    path = repo_index_path(repo)
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return data.find(f"{chart}-{version}.tgz".encode()) != -1
+    except (OSError, ValueError):
+        return False
+
+
+def _list_configured_repos() -> Dict[str, str]:
+    """Return {name: url} of repos configured in helm (cached per process)"""
+    global _configured_repos
+    if _configured_repos is None:
+        exit_code, output, _ = run_cmd(["helm", "repo", "list", "-o", "json"], check=False)
+        try:
+            repos = json.loads(output) if exit_code == 0 and output else []
+        except ValueError:
+            repos = []
+        _configured_repos = {r.get("name"): r.get("url") for r in repos}
+    return _configured_repos
+
+
+def ensure_helm_repo(repo: str, config: Optional[Dict] = None, chart: Optional[str] = None,
+                     version: Optional[str] = None):
+    """
+    Make sure `repo` is configured and its index is fresh enough.
+
+    The index is refreshed (for this repo only) when it is older than
+    helm.repo_cache_ttl seconds or lacks chart-version. Subsequent calls in
+    the same process are free.
+    """
+    ttl = DEFAULT_REPO_CACHE_TTL
+    if config:
+        try:
+            ttl = int(get_config_value(config, "helm.repo_cache_ttl", str(DEFAULT_REPO_CACHE_TTL)))
+        except ValueError:
+            pass
+
+    with _lock:
+        has_chart = not chart or not version or index_has_chart(repo, chart, version)
+        if repo in _fresh_repos and has_chart:
+            return
+
+        configured = _list_configured_repos()
+        if repo not in configured:
+            # `helm repo add` downloads the index, so no update is needed afterwards
+            print_info(f"📦 Adding Helm repo {repo}...")
+            exit_code, _, stderr = run_cmd(["helm", "repo", "add", repo, HELM_REPOS[repo]], check=False)
+            if exit_code == 0:
+                configured[repo] = HELM_REPOS[repo]
+                _fresh_repos.add(repo)
+                return
+            print_warning(f"helm repo add {repo} failed: {stderr}")
+
+        index = repo_index_path(repo)
+        age = time.time() - index.stat().st_mtime if index.exists() else None
+        has_chart = not chart or not version or index_has_chart(repo, chart, version)
+        if age is not None and age < ttl and has_chart:
+            print_info(f"📦 Helm repo {repo} index is fresh ({int(age)}s old), skipping update")
+            _fresh_repos.add(repo)
+            return
+
+        print_info(f"📦 Updating Helm repo {repo}...")
+        exit_code, _, stderr = run_cmd(["helm", "repo", "update", repo], check=False)
+        if exit_code != 0:
+            if has_chart and index.exists():
+                print_warning(f"helm repo update {repo} failed, using cached index: {stderr}")
+            else:
+                print_error(f"Command failed: helm repo update {repo}")
+                if stderr:
+                    print_error(f"Error: {stderr}")
+                sys.exit(1)
+        _fresh_repos.add(repo)
+
+
+# Where release fingerprints are kept, keyed by kube context/namespace/release
+FINGERPRINT_FILE = "helm-fingerprints.json"
+
+_force_upgrades = False
+
+
+def set_force_upgrades(force: bool):
+    """Always run helm upgrade, even when the fingerprint says nothing changed"""
+    global _force_upgrades
+    _force_upgrades = force
+
+
+def values_fingerprint(chart: str, version: str, values: str) -> str:
+    """sha256 over the chart reference, chart version and rendered values"""
+    digest = hashlib.sha256()
+    for part in (chart, version, values):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def releases_from_secrets(secrets: List[Dict]) -> Dict[str, Dict]:
+    """Latest revision of each Helm release, read from its sh.helm.release.v1 secret labels"""
+    releases = {}
+    for secret in secrets:
+        labels = secret["metadata"].get("labels") or {}
+        if labels.get("owner") != "helm" or "name" not in labels:
+            continue
+        try:
+            revision = int(labels.get("version", "0"))
+        except ValueError:
+            revision = 0
+        current = releases.get(labels["name"])
+        if current is None or revision > current["revision"]:
+            releases[labels["name"]] = {"name": labels["name"], "status": labels.get("status", "unknown"),
+                                        "revision": revision}
+    return releases
+
+
+def release_state(release: str, namespace: str) -> Optional[Dict]:
+    """Current {name, status, revision} of a release (from Helm's release secrets), or None"""
+    from .kube import kube_list
+    secrets = kube_list("secrets", namespace, label_selector=f"owner=helm,name={release}") or []
+    return releases_from_secrets(secrets).get(release)
+
+
+def release_deployed(release: str, namespace: str) -> bool:
+    """Whether the release's latest revision is in the deployed state"""
+    state = release_state(release, namespace)
+    return state is not None and state["status"] == "deployed"
+
+
+def _fingerprint_key(release: str, namespace: str) -> str:
+    from .kubeapi import current_context
+    return f"{current_context() or 'default'}/{namespace}/{release}"
+
+
+def _load_fingerprints() -> Dict[str, Dict]:
+    path = get_state_dir() / FINGERPRINT_FILE
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_fingerprint(key: str, fingerprint: str, revision: Optional[int]):
+    path = get_state_dir() / FINGERPRINT_FILE
+    # Deploy threads and fleet processes share the file; the lock keeps their read-modify-writes apart
+    with open(path.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        fingerprints = _load_fingerprints()
+        fingerprints[key] = {"fingerprint": fingerprint, "revision": revision, "recorded_at": int(time.time())}
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(fingerprints, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+
+
+@contextmanager
+def _values_file(values: str):
+    """Yield the --values arguments for values written to a temporary file (none for empty values)"""
+    if not values:
+        yield []
+        return
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+        f.write(values)
+    try:
+        yield ["--values", f.name]
+    finally:
+        os.unlink(f.name)
+
+
+def helm_upgrade(release: str, chart: str, namespace: str, values: str = "", version: Optional[str] = None,
+                 extra_args: Optional[List[str]] = None, fingerprint_values: Optional[str] = None,
+                 source: Optional[str] = None) -> Tuple[int, str, bool]:
+    """
+    Run `helm upgrade --install` unless nothing changed.
+
+    The upgrade is skipped when the fingerprint of chart, version and values
+    matches the one recorded after the last successful upgrade and the
+    release is still `deployed` at that same revision (so upgrades made
+    outside this tool are noticed). fingerprint_values replaces values in
+    the fingerprint when some values (e.g. one-time join tokens) shouldn't
+    count as a change. source is what to install from (e.g. a cached
+    .tgz, see deploy.charts) and defaults to chart. Returns (exit_code,
+    stderr, changed).
+    """
+    fingerprint_input = values if fingerprint_values is None else fingerprint_values
+    fingerprint = values_fingerprint(chart, version or "", fingerprint_input)
+    key = _fingerprint_key(release, namespace)
+    if not _force_upgrades and version:
+        recorded = _load_fingerprints().get(key)
+        if recorded and recorded["fingerprint"] == fingerprint:
+            state = release_state(release, namespace)
+            if state and state["status"] == "deployed" and state["revision"] == recorded["revision"]:
+                print_info(f"⏭️  {release} is up to date (chart {version}, revision {state['revision']}), "
+                           "skipping helm upgrade")
+                return 0, "", False
+
+    cmd = ["helm", "upgrade", "--install", release, source or chart, "--namespace", namespace]
+    if version and not source:
+        cmd += ["--version", version]
+    with _values_file(values) as values_args:
+        exit_code, _, stderr = run_cmd(cmd + values_args + list(extra_args or []), check=False)
+
+    if exit_code == 0:
+        state = release_state(release, namespace)
+        _record_fingerprint(key, fingerprint, state["revision"] if state else None)
+    return exit_code, stderr, True
+
+
+# Rendered manifests keyed by a digest of everything that affects `helm template` output
+RENDER_CACHE_DIR = "render-cache"
+
+_helm_version: Optional[str] = None
+
+
+def helm_client_version() -> str:
+    """`helm version --short` (cached per process)"""
+    global _helm_version
+    if _helm_version is None:
+        exit_code, output, _ = run_cmd(["helm", "version", "--short"], check=False)
+        _helm_version = output if exit_code == 0 else "unknown"
+    return _helm_version
+
+
+def helm_template(release: str, chart: str, namespace: str, values: str = "",
+                  version: Optional[str] = None, source: Optional[str] = None) -> Tuple[int, str, str, bool]:
+    """
+    Render a release with `helm template`, served from .state/render-cache
+    when the helm version, chart, chart version, namespace and values are
+    unchanged. source is what to render from (defaults to chart).
+    Returns (exit_code, manifest, stderr, cached).
+    """
+    digest = hashlib.sha256()
+    for part in (helm_client_version(), release, namespace, values_fingerprint(chart, version or "", values)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    path = get_state_dir() / RENDER_CACHE_DIR / f"{digest.hexdigest()}.yaml"
+    if version and path.exists():
+        return 0, path.read_text(), "", True
+
+    cmd = ["helm", "template", release, source or chart, "--namespace", namespace]
+    if version and not source:
+        cmd += ["--version", version]
+    with _values_file(values) as values_args:
+        exit_code, manifest, stderr = run_cmd(cmd + values_args, check=False)
+
+    if exit_code != 0:
+        return exit_code, "", stderr, False
+    manifest += "\n"
+    # Only pinned versions are cached: an unpinned chart can change under the same inputs
+    if version:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(manifest)
+        os.replace(tmp, path)
+    return 0, manifest, stderr, False
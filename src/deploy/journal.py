@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Deploy journal for resumable deploys
+
+Every deploy records each completed task with its inputs and outputs (auth
+pod, invite URL, join token, ClusterIP, ...) in .state/journal/<context>.json.
+`deploy --resume` replays the journal: a task is skipped when its recorded
+inputs match the current ones, its outputs haven't expired and its cheap
+validate check still passes; the first task that fails those checks - and
+everything downstream whose inputs change - runs again.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+from .common import get_state_dir, print_info, print_warning
+
+JOURNAL_DIR = "journal"
+
+# Recorded outputs are not reused when they expire within this many seconds
+EXPIRY_MARGIN = 600
+
+
+def config_fingerprint(config: Dict) -> str:
+    """sha256 over the config (a changed config invalidates the journal)"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class DeployJournal:
+    """Completed deploy tasks and their outputs for one kube context"""
+    def __init__(self, mode: str, config: Dict, resume: bool = False):
+        from .kubeapi import current_context
+        self.context = current_context() or "default"
+        self.path = get_state_dir() / JOURNAL_DIR / (re.sub(r"[^A-Za-z0-9_.-]", "_", self.context) + ".json")
+        self.header = {"mode": mode, "context": self.context, "config": config_fingerprint(config)}
+        self.resume = resume
+        self.tasks: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        if resume:
+            previous = self._load()
+            if previous is None:
+                print_warning(f"No deploy journal for context {self.context}, deploying from scratch")
+                self.resume = False
+            elif any(previous.get(key) != value for key, value in self.header.items()):
+                print_warning("The deploy journal was written for a different mode or config, deploying from scratch")
+                self.resume = False
+            else:
+                self.tasks = previous.get("tasks") or {}
+                print_info(f"📓 Resuming from the deploy journal ({len(self.tasks)} completed task(s) recorded)")
+        self._save()
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        # The journal holds join tokens and invite URLs
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(dict(self.header, tasks=self.tasks), f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def reuse(self, task, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Recorded outputs of task if they can stand in for running it again, else None"""
+        if not self.resume or task.validate is None:
+            return None
+        with self._lock:
+            entry = self.tasks.get(task.name)
+        if entry is None:
+            return None
+        if entry.get("inputs") != inputs:
+            print_info(f"🔁 {task.name}: inputs changed since the journal was written, running it again")
+            return None
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at - EXPIRY_MARGIN < time.time():
+            print_info(f"⏰ {task.name}: recorded outputs expired, running it again")
+            return None
+        outputs = entry.get("outputs") or {}
+        try:
+            valid = task.validate(**inputs, **outputs)
+        except Exception:
+            valid = False
+        if not valid:
+            print_info(f"🔁 {task.name}: recorded outputs no longer valid, running it again")
+            return None
+        completed = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.get("completed_at", 0)))
+        print_info(f"⏭️  {task.name}: reusing result from the deploy journal (completed {completed})")
+        return outputs
+
+    def record(self, task, inputs: Dict[str, Any], outputs: Dict[str, Any]):
+        """Record a completed task (replacing any earlier entry)"""
+        now = time.time()
+        entry = {"inputs": inputs, "outputs": outputs, "completed_at": int(now)}
+        if task.ttl is not None:
+            entry["expires_at"] = int(now + task.ttl)
+        with self._lock:
+            self.tasks[task.name] = entry
+            self._save()
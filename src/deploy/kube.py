@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Kubernetes read helpers
+
+Reads go through the pooled native API client (deploy.kubeapi) when the
+current kubeconfig context supports it, and fall back to `kubectl get -o json`
+otherwise or after a native request fails.
+"""
+
+import http.client
+import json
+from typing import Dict, List, Optional
+from .common import run_cmd
+from .kubeapi import get_kube_client, disable_kube_client, KubeAPIError, WatchStream
+
+
+def _kubectl_get(kind: str, name: Optional[str], namespace: Optional[str], label_selector: Optional[str] = None,
+                 field_selector: Optional[str] = None) -> Optional[Dict]:
+    """Run `kubectl get ... -o json` and decode the result (None on failure)"""
+    cmd = ["kubectl", "get", kind]
+    if name:
+        cmd.append(name)
+    if namespace:
+        cmd += ["-n", namespace]
+    if label_selector:
+        cmd += ["-l", label_selector]
+    if field_selector:
+        cmd += ["--field-selector", field_selector]
+    exit_code, output, _ = run_cmd(cmd + ["-o", "json"], check=False)
+    if exit_code != 0 or not output:
+        return None
+    try:
+        return json.loads(output)
+    except ValueError:
+        return None
+
+
+def kube_get(kind: str, name: str, namespace: Optional[str] = None) -> Optional[Dict]:
+    """Get one object (e.g. kube_get("services", "kubernetes-dashboard", ns)); None if missing"""
+    client = get_kube_client()
+    if client:
+        try:
+            return client.get(kind, name, namespace)
+        except (KubeAPIError, OSError, ValueError, http.client.HTTPException):
+            disable_kube_client()
+    return _kubectl_get(kind, name, namespace)
+
+
+def kube_list(kind: str, namespace: Optional[str] = None, label_selector: Optional[str] = None,
+              field_selector: Optional[str] = None, metadata_only: bool = False) -> Optional[List[Dict]]:
+    """
+    List objects of a kind; None if the listing failed (as opposed to [] for no matches).
+
+    metadata_only lets the native client skip spec, status and data (the
+    kubectl fallback still returns whole objects).
+    """
+    client = get_kube_client()
+    if client:
+        try:
+            return client.list(kind, namespace, label_selector, field_selector, metadata_only)
+        except (KubeAPIError, OSError, ValueError, http.client.HTTPException):
+            disable_kube_client()
+    result = _kubectl_get(kind, None, namespace, label_selector, field_selector)
+    if result is None:
+        return None
+    return result.get("items") or []
+
+
+def kube_watch(kind: str, namespace: Optional[str] = None, label_selector: Optional[str] = None,
+               field_selector: Optional[str] = None) -> Optional[WatchStream]:
+    """Open a native watch stream, or None if callers should use `kubectl get -w` instead"""
+    client = get_kube_client()
+    if not client:
+        return None
+    return client.watch(kind, namespace, label_selector, field_selector)
+
+
+def kube_get_many(kind: str, names: List[str], namespace: Optional[str] = None) -> Dict[str, Dict]:
+    """Get several objects of one kind by name; missing objects are left out"""
+    client = get_kube_client()
+    if client:
+        try:
+            found = {}
+            for name in names:
+                obj = client.get(kind, name, namespace)
+                if obj is not None:
+                    found[name] = obj
+            return found
+        except (KubeAPIError, OSError, ValueError, http.client.HTTPException):
+            disable_kube_client()
+
+    cmd = ["kubectl", "get", kind, *names, "--ignore-not-found=true", "-o", "json"]
+    if namespace:
+        cmd += ["-n", namespace]
+    exit_code, output, _ = run_cmd(cmd, check=False)
+    try:
+        result = json.loads(output) if exit_code == 0 and output else {}
+    except ValueError:
+        result = {}
+    items = result.get("items", [result] if result.get("metadata") else [])
+    return {item["metadata"]["name"]: item for item in items}
+
+
+def kube_list_many(kinds: List[str], namespace: str) -> Optional[Dict[str, List[Dict]]]:
+    """
+    List several kinds in one namespace at once, e.g. {"pods": [...], "services": [...]}.
+
+    The kubectl fallback fetches every kind in a single `kubectl get a,b,c` call.
+    Returns None if the listing failed.
+    """
+    client = get_kube_client()
+    if client:
+        try:
+            return {kind: client.list(kind, namespace) for kind in kinds}
+        except (KubeAPIError, OSError, ValueError, http.client.HTTPException):
+            disable_kube_client()
+
+    result = _kubectl_get(",".join(kinds), None, namespace)
+    if result is None:
+        return None
+    # kubectl returns a flat List; split it back up by each item's Kind
+    by_kind = {kind: [] for kind in kinds}
+    singular = {kind: kind[:-1] if kind.endswith("s") else kind for kind in kinds}
+    singular["endpoints"] = "endpoints"
+    for item in result.get("items") or []:
+        item_kind = str(item.get("kind", "")).lower()
+        for kind in kinds:
+            if item_kind == singular[kind]:
+                by_kind[kind].append(item)
+                break
+    return by_kind
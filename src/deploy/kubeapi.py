@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Native Kubernetes API client with a keep-alive connection pool
+
+Built from the current kubeconfig context so status and lookup reads don't
+pay for a kubectl process spawn, kubeconfig parsing, discovery and a fresh
+TLS handshake each time. Only static credentials are supported (client
+certificates, bearer tokens, basic auth); contexts using exec plugins or
+auth-providers return no client and callers fall back to kubectl.
+
+Backend selection via the KUBE_BACKEND environment variable:
+  auto    - use the native client when the kubeconfig allows it (default)
+  native  - same as auto (kept for explicitness in scripts)
+  kubectl - always shell out to kubectl
+"""
+
+import base64
+import http.client
+import json
+import os
+import queue
+import socket
+import ssl
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlencode, urlparse
+from .profiler import profile_span
+
+# Resource kind -> (API prefix, namespaced)
+RESOURCES = {
+    "pods": ("/api/v1", True),
+    "services": ("/api/v1", True),
+    "endpoints": ("/api/v1", True),
+    "secrets": ("/api/v1", True),
+    "configmaps": ("/api/v1", True),
+    "serviceaccounts": ("/api/v1", True),
+    "namespaces": ("/api/v1", False),
+    "statefulsets": ("/apis/apps/v1", True),
+    "deployments": ("/apis/apps/v1", True),
+    "replicasets": ("/apis/apps/v1", True),
+}
+
+
+# Accept header asking for metadata only (no spec, status or secret data); plain JSON if unsupported
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+
+
+class KubeAPIError(Exception):
+    """Raised when the API server returns an unexpected status"""
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+def resource_path(kind: str, namespace: Optional[str] = None, name: Optional[str] = None) -> str:
+    """Build the REST path for a resource kind, e.g. /api/v1/namespaces/ns/pods/name"""
+    if kind not in RESOURCES:
+        raise ValueError(f"Unsupported resource kind: {kind}")
+    prefix, namespaced = RESOURCES[kind]
+    path = prefix
+    if namespaced and namespace:
+        path += f"/namespaces/{namespace}"
+    path += f"/{kind}"
+    if name:
+        path += f"/{name}"
+    return path
+
+
+def _load_kubeconfig() -> Optional[Dict]:
+    """Load the first kubeconfig file from KUBECONFIG (or ~/.kube/config)"""
+    from .common import load_yaml
+    yaml = load_yaml()
+
+    paths = os.environ.get("KUBECONFIG", "").split(os.pathsep)
+    paths = [p for p in paths if p] or [str(Path.home() / ".kube" / "config")]
+    for path in paths:
+        path = Path(path).expanduser()
+        if path.exists():
+            with open(path, "r") as f:
+                config = yaml.safe_load(f) or {}
+            config["_path"] = path
+            return config
+    return None
+
+
+def current_context() -> Optional[str]:
+    """Name of the current kubeconfig context (without spawning kubectl)"""
+    try:
+        config = _load_kubeconfig()
+    except Exception:
+        return None
+    return (config or {}).get("current-context") or None
+
+
+def _named(items, name: str) -> Dict:
+    """Find an entry by name in a kubeconfig list (clusters, users, contexts)"""
+    for item in items or []:
+        if item.get("name") == name:
+            return item
+    return {}
+
+
+def _write_temp(data: bytes) -> str:
+    """Write credential data to a private temp file (ssl needs file paths)"""
+    fd, path = tempfile.mkstemp(prefix="kubeapi-", suffix=".pem")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+class KubeClient:
+    """Thread-safe API client that reuses keep-alive connections"""
+    def __init__(self, server: str, ssl_context: Optional[ssl.SSLContext] = None,
+                 headers: Optional[Dict[str, str]] = None, pool_size: int = 4, timeout: float = 30):
+        parsed = urlparse(server)
+        self.scheme = parsed.scheme or "https"
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.scheme == "https" else 80)
+        self.base_path = parsed.path.rstrip("/")
+        self.ssl_context = ssl_context
+        self.headers = {"Accept": "application/json", "User-Agent": "k8s-dashboard-manager"}
+        self.headers.update(headers or {})
+        self.timeout = timeout
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=pool_size)
+
+    @classmethod
+    def from_kubeconfig(cls) -> Optional["KubeClient"]:
+        """Build a client for the current context, or None if it can't be used natively"""
+        config = _load_kubeconfig()
+        if not config:
+            return None
+        context = _named(config.get("contexts"), config.get("current-context", "")).get("context") or {}
+        cluster = _named(config.get("clusters"), context.get("cluster", "")).get("cluster") or {}
+        user = _named(config.get("users"), context.get("user", "")).get("user") or {}
+        server = cluster.get("server")
+        if not server or "exec" in user or "auth-provider" in user:
+            return None
+
+        base_dir = config["_path"].parent
+        headers = {}
+        ssl_context = None
+        if server.startswith("https://"):
+            ssl_context = ssl.create_default_context()
+            if cluster.get("insecure-skip-tls-verify"):
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+            elif cluster.get("certificate-authority-data"):
+                ssl_context.load_verify_locations(
+                    cadata=base64.b64decode(cluster["certificate-authority-data"]).decode("utf-8"))
+            elif cluster.get("certificate-authority"):
+                ssl_context.load_verify_locations(cafile=str(base_dir / cluster["certificate-authority"]))
+
+            cert = user.get("client-certificate")
+            key = user.get("client-key")
+            temp_files = []
+            if user.get("client-certificate-data"):
+                cert = _write_temp(base64.b64decode(user["client-certificate-data"]))
+                temp_files.append(cert)
+            elif cert:
+                cert = str(base_dir / cert)
+            if user.get("client-key-data"):
+                key = _write_temp(base64.b64decode(user["client-key-data"]))
+                temp_files.append(key)
+            elif key:
+                key = str(base_dir / key)
+            try:
+                if cert:
+                    ssl_context.load_cert_chain(cert, key)
+            finally:
+                for path in temp_files:
+                    os.unlink(path)
+
+        token = user.get("token")
+        if not token and user.get("tokenFile"):
+            token = (base_dir / user["tokenFile"]).read_text().strip()
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        elif user.get("username"):
+            basic = base64.b64encode(f"{user['username']}:{user.get('password', '')}".encode()).decode()
+            headers["Authorization"] = f"Basic {basic}"
+
+        return cls(server, ssl_context=ssl_context, headers=headers)
+
+    def _connect(self, streaming: bool = False) -> http.client.HTTPConnection:
+        # Watch streams stay open indefinitely; regular requests time out
+        timeout = None if streaming else self.timeout
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, context=self.ssl_context, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn: http.client.HTTPConnection):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method: str, path: str, params: Optional[Dict] = None,
+                accept: Optional[str] = None) -> Optional[Dict]:
+        """Send a request and return the decoded JSON body (None for 404)"""
+        url = self.base_path + path
+        headers = dict(self.headers, Accept=accept) if accept else self.headers
+        if params:
+            url += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+
+        with profile_span(f"{method} {path}", "api", group=f"api {method}", argv=[method, url]) as span:
+            # A pooled connection may have been closed by the server; retry once on a fresh one
+            for attempt in range(2):
+                conn = self._acquire()
+                try:
+                    conn.request(method, url, headers=headers)
+                    response = conn.getresponse()
+                    body = response.read()
+                except (http.client.HTTPException, ConnectionError, OSError):
+                    conn.close()
+                    if attempt == 1:
+                        raise
+                    continue
+                if response.will_close:
+                    conn.close()
+                else:
+                    self._release(conn)
+                break
+            if span is not None:
+                span.args["status"] = response.status
+
+        if response.status == 404:
+            return None
+        if response.status >= 400:
+            raise KubeAPIError(response.status, body.decode("utf-8", "replace")[:200])
+        return json.loads(body) if body else {}
+
+    def get(self, kind: str, name: str, namespace: Optional[str] = None) -> Optional[Dict]:
+        """Get one object, or None if it doesn't exist"""
+        return self.request("GET", resource_path(kind, namespace, name))
+
+    def list(self, kind: str, namespace: Optional[str] = None, label_selector: Optional[str] = None,
+             field_selector: Optional[str] = None, metadata_only: bool = False) -> list:
+        """List objects of a kind (optionally filtered by selectors; metadata_only: items carry metadata only)"""
+        result = self.request("GET", resource_path(kind, namespace), {
+            "labelSelector": label_selector,
+            "fieldSelector": field_selector,
+        }, accept=METADATA_ACCEPT if metadata_only else None)
+        return (result or {}).get("items") or []
+
+    def watch(self, kind: str, namespace: Optional[str] = None, label_selector: Optional[str] = None,
+              field_selector: Optional[str] = None) -> "WatchStream":
+        """Open a watch stream on a dedicated connection (see WatchStream)"""
+        params = {"watch": "1", "labelSelector": label_selector, "fieldSelector": field_selector}
+        url = self.base_path + resource_path(kind, namespace) + "?" + urlencode(
+            {k: v for k, v in params.items() if v is not None})
+        return WatchStream(self._connect(streaming=True), url, self.headers)
+
+
+class WatchStream:
+    """
+    Iterable of watch events ({"type": ..., "object": ...}).
+
+    Starts with ADDED events for existing objects and ends when the server
+    closes the stream. close() may be called from another thread to stop a
+    blocked reader.
+    """
+    def __init__(self, conn: http.client.HTTPConnection, url: str, headers: Dict[str, str]):
+        self._conn = conn
+        self._url = url
+        self._headers = headers
+        self._closed = False
+
+    def __iter__(self) -> Iterator[Dict]:
+        try:
+            self._conn.request("GET", self._url, headers=self._headers)
+            response = self._conn.getresponse()
+            if response.status >= 400:
+                raise KubeAPIError(response.status, response.read().decode("utf-8", "replace")[:200])
+            while not self._closed:
+                line = response.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        except (OSError, http.client.HTTPException, ValueError):
+            if not self._closed:
+                raise
+        finally:
+            self._conn.close()
+
+    def close(self):
+        """Stop the stream, unblocking a reader waiting for the next event"""
+        self._closed = True
+        sock = self._conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+_client: Optional[KubeClient] = None
+_client_loaded = False
+_client_lock = threading.Lock()
+
+
+def get_kube_client() -> Optional[KubeClient]:
+    """Return the shared native client, or None when kubectl should be used"""
+    global _client, _client_loaded
+    with _client_lock:
+        if not _client_loaded:
+            _client_loaded = True
+            if os.environ.get("KUBE_BACKEND", "auto").lower() != "kubectl":
+                try:
+                    _client = KubeClient.from_kubeconfig()
+                except Exception:
+                    _client = None
+        return _client
+
+
+def disable_kube_client():
+    """Fall back to kubectl for the rest of the process (e.g. after connection failures)"""
+    global _client, _client_loaded
+    with _client_lock:
+        _client = None
+        _client_loaded = True
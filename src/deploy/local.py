@@ -3,36 +3,59 @@
 Local mode specific deployment functions
 """
 
-import os
 import sys
-import subprocess
 import re
-import time
-import tempfile
 from typing import Optional, Dict
 from .common import (
-    print_step, print_info, print_success, print_warning, print_error,
-    run_cmd, get_config_value, wait_for_pod, wait_for_pod_ready, StepCounter
+    print_step, print_info, print_success, print_warning, print_error, print_output,
+    run_cmd, get_config_value, wait_for_pod, wait_for_pod_ready, wait_for_pods, StepCounter,
+    wait_until, tctl_ready, TELEPORT_CHART_VERSION
 )
+from .charts import chart_archive
+from .helm import helm_upgrade
+from .tctl import TctlOp, TctlSession
+from .portforward import TELEPORT_FORWARD, TELEPORT_PORT, ensure_forward, forward_status
+from .tokens import LOCAL_ROLES, acquire_join_token, local_target, local_tctl
+from .watch import PodTarget
 
+# Teleport role granting full Kubernetes access to the admin user
+K8S_ADMIN_ROLE = """kind: role
+version: v7
+metadata:
+  name: k8s-admin
+spec:
+  allow:
+    kubernetes_labels:
+      "*": "*"
+    kubernetes_groups:
+    - system:masters
+"""
 
-def deploy_teleport_cluster(config: Dict, steps: StepCounter):
-    """Deploy Teleport cluster (local mode only)"""
-    print_step(steps.next("Deploying Teleport server to Kubernetes..."))
-    print_info("⏳ Note: This step may take up to 5 minutes while the Helm chart deploys and pods become ready...")
-    
-    cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
-    
-    # Add helm repo
-    run_cmd(["helm", "repo", "add", "teleport", "https://charts.releases.teleport.dev"], check=False)
-    run_cmd(["helm", "repo", "update"])
-    
-    # Create namespace
-    run_cmd(["kubectl", "create", "namespace", cluster_ns], check=False)
-    run_cmd(["kubectl", "label", "namespace", cluster_ns, "pod-security.kubernetes.io/enforce=baseline"], check=False)
-    
-    # Create values file
-    values_content = f"""clusterName: minikube
+ADMIN_USER_NAME = "admin"
+
+# The local admin user, upserted together with K8S_ADMIN_ROLE
+ADMIN_USER = f"""kind: user
+version: v2
+metadata:
+  name: {ADMIN_USER_NAME}
+spec:
+  roles:
+  - editor
+  - access
+  - k8s-admin
+  traits:
+    logins:
+    - root
+    - minikube
+"""
+
+# How long the deploy journal trusts an admin setup URL (tctl's invite TTL; reset links last longer)
+INVITE_TTL = 3600
+
+
+def build_teleport_cluster_values(cluster_ns: str) -> str:
+    """Helm values for the in-cluster Teleport (local mode)"""
+    return f"""clusterName: minikube
 proxyListenerMode: multiplex
 acme: false
 publicAddr:
@@ -46,25 +69,29 @@ auth:
     enabled: true
     type: ClusterIP
 """
+
+
+def local_proxy_addr(cluster_ns: str) -> str:
+    """In-cluster address the agent uses to reach the local Teleport proxy"""
+    return f"{cluster_ns}.{cluster_ns}.svc.cluster.local:443"
+
+
+def deploy_teleport_cluster(config: Dict, steps: StepCounter):
+    """Deploy Teleport cluster (local mode only)"""
+    print_step(steps.next("Deploying Teleport server to Kubernetes..."))
+    print_info("⏳ Note: This step may take up to 5 minutes while the Helm chart deploys and pods become ready...")
     
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
-        values_file = f.name
-        f.write(values_content)
+    cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
+    
+    # Create namespace
+    run_cmd(["kubectl", "create", "namespace", cluster_ns], check=False)
+    run_cmd(["kubectl", "label", "namespace", cluster_ns, "pod-security.kubernetes.io/enforce=baseline"], check=False)
     
-    try:
-        run_cmd([
-            "helm", "upgrade", "--install", "teleport-cluster",
-            "teleport/teleport-cluster",
-            "--version", "18.6.0",
-            "--namespace", cluster_ns,
-            "--values", values_file
-        ], check=False)
-    finally:
-        os.unlink(values_file)
+    helm_upgrade("teleport-cluster", "teleport/teleport-cluster", cluster_ns,
+                 build_teleport_cluster_values(cluster_ns), version=TELEPORT_CHART_VERSION,
+                 source=chart_archive("teleport/teleport-cluster", TELEPORT_CHART_VERSION, config))
     
     print_info("⏳ Verifying Teleport cluster pods are running...")
-    time.sleep(5)
-    
     pod = wait_for_pod(cluster_ns, "app.kubernetes.io/name=teleport-cluster,app.kubernetes.io/component=auth", timeout=60)
     if pod:
         print_success(f"Found Teleport auth pod: {pod}")
@@ -76,152 +103,91 @@ auth:
     return cluster_ns, pod
 
 
-def setup_admin_user(config: Dict, cluster_ns: str, pod: Optional[str], steps: StepCounter):
-    """Setup Teleport admin user with Kubernetes access (local mode only)"""
-    print_step(steps.next("Setting up Teleport admin user with Kubernetes access..."))
-    
+def auth_pod_running(cluster_ns: str, pod: str) -> bool:
+    """Whether the Teleport release is deployed and the given auth pod is still running"""
+    from .helm import release_deployed
+    from .kube import kube_get
+    obj = kube_get("pods", pod, cluster_ns) or {}
+    if (obj.get("status") or {}).get("phase") != "Running" or obj["metadata"].get("deletionTimestamp"):
+        return False
+    return release_deployed("teleport-cluster", cluster_ns)
+
+
+def resolve_auth_pod(cluster_ns: str, pod: Optional[str]) -> str:
+    """Return the Teleport auth pod, waiting for it if it wasn't found during install"""
     if not pod:
         pod = wait_for_pod(cluster_ns, "app.kubernetes.io/name=teleport-cluster,app.kubernetes.io/component=auth", timeout=60)
         if not pod:
             print_error("Teleport auth pod not found after waiting")
             sys.exit(1)
+    return pod
+
+
+def setup_admin_user(config: Dict, cluster_ns: str, pod: Optional[str], steps: StepCounter):
+    """Setup Teleport admin user with Kubernetes access (local mode only)"""
+    print_step(steps.next("Setting up Teleport admin user with Kubernetes access..."))
     
-    wait_for_pod_ready(cluster_ns, pod, timeout=120)
-    time.sleep(5)
-    
-    # Create k8s-admin role
-    role_yaml = """kind: role
-version: v7
-metadata:
-  name: k8s-admin
-spec:
-  allow:
-    kubernetes_labels:
-      "*": "*"
-    kubernetes_groups:
-    - system:masters
-"""
-    
-    exit_code, _, _ = run_cmd([
-        "kubectl", "exec", "-n", cluster_ns, pod, "-i", "--",
-        "tctl", "create", "-f", "-"
-    ], input=role_yaml, check=False)
+    pod = resolve_auth_pod(cluster_ns, pod)
     
-    if exit_code != 0:
-        run_cmd([
-            "kubectl", "exec", "-n", cluster_ns, pod, "-i", "--",
-            "tctl", "update", "-f", "-"
-        ], input=role_yaml, check=False)
+    wait_for_pod_ready(cluster_ns, pod, timeout=120)
+    wait_until(tctl_ready(cluster_ns, pod), timeout=60)
     
-    # Check if admin user exists
-    exit_code, output, _ = run_cmd([
-        "kubectl", "exec", "-n", cluster_ns, pod, "--",
-        "tctl", "users", "ls"
-    ], check=False)
+    # One `tctl create --force` upserts the role and the admin user (no shell needed, so this also
+    # works on the distroless auth image); the reset then yields the setup URL for new and existing users
+    results = TctlSession(cluster_ns, pod).run([
+        TctlOp("resources", ["create", "--force"], input=f"{K8S_ADMIN_ROLE}---\n{ADMIN_USER}"),
+        TctlOp("users-reset", ["users", "reset", ADMIN_USER_NAME]),
+    ])
     
-    user_exists = "admin" in output if exit_code == 0 else False
+    if not results["resources"].ok:
+        print_warning("Could not create the k8s-admin role and admin user. Output:")
+        print_output(results["resources"].output)
     
     invite_url = None
-    if not user_exists:
-        print_info("👤 Creating admin user...")
-        exit_code, output, _ = run_cmd([
-            "kubectl", "exec", "-n", cluster_ns, pod, "--",
-            "tctl", "users", "add", "admin",
-            "--roles=editor,access,k8s-admin",
-            "--logins=root,minikube"
-        ], check=False)
-        
-        if output:
-            invite_url = extract_and_fix_invite_url(output)
-            if invite_url:
-                with open("/tmp/teleport-admin-invite-url.txt", "w") as f:
-                    f.write(invite_url)
-            
-            # Fix output display
-            output = fix_invite_url_in_output(output)
-            print(output)
+    created = re.search(rf"user \W?{ADMIN_USER_NAME}\W? has been created", results["resources"].output) is not None
+    user = results["users-reset"]
+    if user.output:
+        invite_url = extract_and_fix_invite_url(user.output)
+        if invite_url:
+            with open("/tmp/teleport-admin-invite-url.txt", "w") as f:
+                f.write(invite_url)
         
+        # Fix output display
+        print_output(fix_invite_url_in_output(user.output))
+    
+    if created:
         print_success("Admin user created")
     else:
-        print_info("👤 Admin user already exists, ensuring roles are correct and resetting...")
-        run_cmd([
-            "kubectl", "exec", "-n", cluster_ns, pod, "--",
-            "tctl", "users", "update", "admin",
-            "--set-roles=editor,access,k8s-admin"
-        ], check=False)
-        
-        exit_code, output, _ = run_cmd([
-            "kubectl", "exec", "-n", cluster_ns, pod, "--",
-            "tctl", "users", "reset", "admin"
-        ], check=False)
-        
-        if output:
-            invite_url = extract_and_fix_invite_url(output)
-            if invite_url:
-                with open("/tmp/teleport-admin-invite-url.txt", "w") as f:
-                    f.write(invite_url)
-            
-            # Fix output display
-            output = fix_invite_url_in_output(output)
-            print(output)
-        
-        print_success("Admin user roles updated and reset")
+        print_success("Admin user updated and reset")
     
     return invite_url
 
 
 def generate_token_local(cluster_ns: str, pod: str, steps: StepCounter) -> str:
-    """Generate Teleport join token (local mode only)"""
-    print_step(steps.next("Generating Teleport join token..."))
+    """Reuse or generate a Teleport join token (local mode only)"""
+    print_step(steps.next("Getting Teleport join token..."))
     wait_for_pod_ready(cluster_ns, pod, timeout=60)
-    time.sleep(3)
-    
-    token = None
-    for attempt in range(2):
-        exit_code, output, _ = run_cmd([
-            "kubectl", "exec", "-n", cluster_ns, pod, "--",
-            "tctl", "tokens", "add",
-            "--type=kube,app,discovery",
-            "--ttl=24h"
-        ], check=False)
-        
-        if exit_code != 0:
-            if attempt == 0:
-                print_warning("Token generation failed. Output:")
-                print(output)
-                print_info("⏳ Waiting a bit longer and retrying...")
-                time.sleep(10)
-                continue
-            else:
-                print_error("Token generation failed after retry. Output:")
-                print(output)
-                sys.exit(1)
-        
-        # Extract token
-        token_match = re.search(r'[a-f0-9]{32}', output)
-        if token_match:
-            token = token_match.group(0)
-            break
-        
-        if attempt == 0:
-            print_warning("Could not extract token from output. Full output:")
-            print(output)
-            print_info("⏳ Retrying token generation...")
-            time.sleep(5)
-        else:
-            print_error("Failed to generate token after retry")
-            print("Full output:")
-            print(output)
-            sys.exit(1)
+    wait_until(tctl_ready(cluster_ns, pod), timeout=60)
     
+    # Transient tctl failures are retried with backoff by the command executor
+    token, output = acquire_join_token(local_target(cluster_ns), LOCAL_ROLES, local_tctl(cluster_ns, pod))
     if not token:
-        print_error("Failed to extract token")
+        print_error("Token generation failed. Output:")
+        print_output(output)
         sys.exit(1)
     
-    print_success(f"Generated token: {token}")
+    print_success(f"Join token: {token}")
     return token
 
 
+def token_exists_local(cluster_ns: str, pod: str, token: str) -> bool:
+    """Whether the join token is still known to the in-cluster auth server"""
+    exit_code, output, _ = run_cmd([
+        "kubectl", "exec", "-n", cluster_ns, pod, "--", "tctl", "tokens", "ls"
+    ], check=False)
+    return exit_code == 0 and token in output
+
+
 def add_dashboard_annotations(k8s_ns: str):
     """Add Teleport annotations to dashboard service (local mode only)"""
     print_info("🔧 Adding Teleport annotations for dashboard service (Local mode)...")
@@ -238,8 +204,8 @@ def add_dashboard_annotations(k8s_ns: str):
     print_success("Added Teleport annotations to dashboard service")
 
 
-def patch_service_and_restart_pods(cluster_ns: str, agent_ns: str):
-    """Patch service and restart pods (local mode only)"""
+def patch_service_and_restart_pods(cluster_ns: str, agent_ns: str, restart: bool = True):
+    """Patch service and restart pods (local mode only); restart=False leaves unchanged agents running"""
     print_info("🔧 Patching teleport-cluster service to add port 8080 (Local mode only)...")
     patch_json = '[{"op": "add", "path": "/spec/ports/-", "value": {"name": "agent-fallback", "port": 8080, "protocol": "TCP", "targetPort": 3080}}]'
     run_cmd([
@@ -247,62 +213,44 @@ def patch_service_and_restart_pods(cluster_ns: str, agent_ns: str):
         "teleport-cluster", "--type=json", f"-p={patch_json}"
     ], check=False)
     
+    if not restart:
+        print_info("⏭️  Teleport agent unchanged, not restarting its pods")
+        return
     print_info("🔄 Restarting teleport-agent pods...")
     run_cmd([
         "kubectl", "delete", "pods", "-n", agent_ns,
         "--all", "--wait=false"
     ], check=False)
-    time.sleep(3)
+    # The replacement agent has reconnected through the patched service once it is ready
+    pod = wait_for_pods([PodTarget(agent_ns, label_selector="app=teleport-agent", state="ready")], timeout=120)[0]
+    if pod:
+        print_success(f"Teleport agent pod {pod} is ready")
 
 
 def start_port_forward(cluster_ns: str):
     """Start port-forward (local mode only)"""
     print_info("🔌 Starting port-forward to localhost:8080...")
     
-    # Check if port-forward is already running
     exit_code, _, _ = run_cmd([
-        "pgrep", "-f", "kubectl port-forward.*teleport.*8080"
+        "kubectl", "get", "svc", "teleport-cluster", "-n", cluster_ns
     ], check=False)
     
     if exit_code == 0:
-        print_success("Port-forward already running")
-    else:
-        # Start port-forward in background
-        exit_code, _, _ = run_cmd([
-            "kubectl", "get", "svc", "teleport-cluster", "-n", cluster_ns
-        ], check=False)
-        
-        if exit_code == 0:
-            process = subprocess.Popen(
-                ["kubectl", "port-forward", "-n", cluster_ns,
-                 "svc/teleport-cluster", "8080:8080"],
-                stdout=open("/tmp/teleport-port-forward.log", "w"),
-                stderr=subprocess.STDOUT
-            )
-            
-            with open("/tmp/teleport-port-forward.pid", "w") as f:
-                f.write(str(process.pid))
-            
-            time.sleep(2)
-            
-            # Check if it's running
-            exit_code, _, _ = run_cmd([
-                "pgrep", "-f", "kubectl port-forward.*teleport.*8080"
-            ], check=False)
-            
-            if exit_code == 0:
-                print_success(f"Port-forward started (PID: {process.pid})")
-                print_info("   Access Teleport at: https://teleport-cluster.teleport-cluster.svc.cluster.local:8080")
-            else:
-                print_warning("Port-forward failed to start. Check logs: cat /tmp/teleport-port-forward.log")
+        # The supervisor reconnects the forward when the Teleport pods restart
+        forward = ensure_forward(TELEPORT_FORWARD, cluster_ns, "svc/teleport-cluster", [f"{TELEPORT_PORT}:{TELEPORT_PORT}"])
+        if forward and forward["state"] == "up":
+            print_success(f"Port-forward active (supervised, kubectl PID: {forward['pid']})")
+            print_info("   Access Teleport at: https://teleport-cluster.teleport-cluster.svc.cluster.local:8080")
         else:
-            print_warning("Teleport service not found. Port-forward will need to be started manually.")
-            print_info("   Run: kubectl port-forward -n teleport-cluster svc/teleport-cluster 8080:8080")
+            print_warning("Port-forward failed to start. Check: python3 src/main.py port-forward status")
+    else:
+        print_warning("Teleport service not found. Port-forward will need to be started manually.")
+        print_info("   Run: python3 src/main.py port-forward start")
 
 
 def extract_and_fix_invite_url(output: str) -> Optional[str]:
-    """Extract and fix invite URL from output"""
-    invite_match = re.search(r'https://[^\s]+/web/invite/[^\s]+', output)
+    """Extract and fix invite (or password reset) URL from output"""
+    invite_match = re.search(r'https://[^\s]+/web/(?:invite|reset)/[^\s]+', output)
     if invite_match:
         invite_url = invite_match.group(0)
         invite_url = invite_url.replace("<proxyhost>", "teleport-cluster.teleport-cluster.svc.cluster.local")
@@ -340,8 +288,6 @@ def fix_invite_url_in_output(output: str) -> str:
 
 def print_summary_local_mode(invite_url: Optional[str], cluster_ns: str):
     """Print deployment summary for local mode"""
-    from .common import run_cmd
-    
     print("\n" + "=" * 60)
     print("\n✅ Full deployment complete!")
     print("\n" + "=" * 60)
@@ -351,12 +297,10 @@ def print_summary_local_mode(invite_url: Optional[str], cluster_ns: str):
     print("  ✅ Admin user created")
     print("  ✅ Join token generated")
     
-    # Check port-forward
-    exit_code, _, _ = run_cmd([
-        "pgrep", "-f", "kubectl port-forward.*teleport.*8080"
-    ], check=False)
-    
-    if exit_code == 0:
+    # One status call to the port-forward supervisor serves the whole summary
+    forward = forward_status(TELEPORT_FORWARD)
+    forward_up = bool(forward) and forward["state"] == "up"
+    if forward_up:
         print("  ✅ Port-forward active (https://teleport-cluster.teleport-cluster.svc.cluster.local:8080)")
     else:
         print("  ⚠️  Port-forward NOT running (required for access)")
@@ -372,22 +316,10 @@ def print_summary_local_mode(invite_url: Optional[str], cluster_ns: str):
         print("📋 Next Steps:")
         print()
         
-        # Check port-forward
-        exit_code, _, _ = run_cmd([
-            "pgrep", "-f", "kubectl port-forward.*teleport.*8080"
-        ], check=False)
-        
-        if exit_code != 0:
+        if not forward_up:
             print("  0️⃣  Start Port-Forward (REQUIRED):")
-            print("     • Run in a separate terminal:")
-            exit_code, _, _ = run_cmd([
-                "kubectl", "get", "svc", "teleport-cluster", "-n", cluster_ns
-            ], check=False)
-            if exit_code == 0:
-                print(f"       kubectl port-forward -n {cluster_ns} svc/teleport-cluster 8080:8080")
-            else:
-                print("       kubectl port-forward -n teleport svc/teleport 8080:8080")
-            print("     • Keep this terminal open while using Teleport")
+            print("     • Run: python3 src/main.py port-forward start")
+            print("     • It keeps running in the background and reconnects when Teleport restarts")
             print()
         
         print("  1️⃣  Accept the Admin Invite:")
@@ -411,21 +343,10 @@ def print_summary_local_mode(invite_url: Optional[str], cluster_ns: str):
     else:
         print("📋 Next Steps:")
         print()
-        exit_code, _, _ = run_cmd([
-            "pgrep", "-f", "kubectl port-forward.*teleport.*8080"
-        ], check=False)
-        
-        if exit_code != 0:
+        if not forward_up:
             print("  0️⃣  Start Port-Forward (REQUIRED):")
-            print("     • Run in a separate terminal:")
-            exit_code, _, _ = run_cmd([
-                "kubectl", "get", "svc", "teleport-cluster", "-n", cluster_ns
-            ], check=False)
-            if exit_code == 0:
-                print(f"       kubectl port-forward -n {cluster_ns} svc/teleport-cluster 8080:8080")
-            else:
-                print("       kubectl port-forward -n teleport svc/teleport 8080:8080")
-            print("     • Keep this terminal open while using Teleport")
+            print("     • Run: python3 src/main.py port-forward start")
+            print("     • It keeps running in the background and reconnects when Teleport restarts")
             print()
         
         print("  1️⃣  Access Teleport Web Console:")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Deployment pipeline
+Orchestrates deployment for both local and enterprise modes
+"""
+
+import sys
+from .common import (
+    read_config, get_config_value, get_state_dir, print_info, print_error, print_step, StepCounter,
+    deploy_rbac, deploy_dashboard, deploy_agent_common, get_dashboard_clusterip, dashboard_clusterip,
+    rbac_deployed, JOIN_TOKEN_MIN_TTL_HOURS
+)
+from .helm import set_force_upgrades, release_deployed
+from .journal import DeployJournal
+from .profiler import enable_profiling
+from .scheduler import Task, run_tasks
+from .local import (
+    deploy_teleport_cluster, resolve_auth_pod, setup_admin_user, generate_token_local,
+    add_dashboard_annotations, patch_service_and_restart_pods,
+    start_port_forward, print_summary_local_mode,
+    auth_pod_running, token_exists_local, local_proxy_addr, INVITE_TTL
+)
+from .enterprise import (
+    setup_tctl, generate_token_enterprise, print_summary_enterprise_mode,
+    tctl_authenticated, token_exists_enterprise
+)
+
+# Independent deploy tasks that may run at the same time
+DEFAULT_MAX_WORKERS = 4
+
+
+def deploy_local_mode(config, max_workers: int = DEFAULT_MAX_WORKERS, journal: DeployJournal = None):
+    """Deploy in local mode"""
+    print_info("🚀 Starting local deployment (RBAC + Teleport + Dashboard + Agent)...")
+    
+    # Local mode has 6 steps. The Teleport branch (cluster -> admin user / token)
+    # and the Dashboard branch don't depend on each other and run concurrently.
+    steps = StepCounter(6)
+    cluster_name = get_config_value(config, "teleport.cluster_name", "minikube")
+    agent_ns = get_config_value(config, "teleport.agent_namespace", "teleport-agent")
+    
+    def rbac():
+        print_step(steps.next("Deploying RBAC resources..."))
+        deploy_rbac()
+    
+    def teleport_cluster():
+        cluster_ns, pod = deploy_teleport_cluster(config, steps)
+        return cluster_ns, resolve_auth_pod(cluster_ns, pod)
+    
+    def admin_user(cluster_ns, auth_pod):
+        return setup_admin_user(config, cluster_ns, auth_pod, steps)
+    
+    def join_token(cluster_ns, auth_pod):
+        return generate_token_local(cluster_ns, auth_pod, steps)
+    
+    def dashboard():
+        print_step(steps.next("Deploying Kubernetes Dashboard..."))
+        k8s_ns = deploy_dashboard(config)
+        add_dashboard_annotations(k8s_ns)
+        return k8s_ns
+    
+    def agent(token, cluster_ns, k8s_ns):
+        print_step(steps.next("Deploying Teleport Agent..."))
+        proxy_clean = local_proxy_addr(cluster_ns)
+        print_info(f"✅ Using token: {token}")
+        print_info(f"✅ Using proxy: {proxy_clean}")
+        print_info(f"✅ Using cluster: {cluster_name}")
+        print_info(f"✅ Using K8S namespace: {k8s_ns}")
+        print_info(f"✅ Using Teleport namespace: {agent_ns}")
+        changed = deploy_agent_common(config, token, proxy_clean, cluster_name, agent_ns, k8s_ns, is_local=True)
+        patch_service_and_restart_pods(cluster_ns, agent_ns, restart=changed)
+    
+    # validate= checks let `deploy --resume` skip tasks whose journal entries still hold
+    values = run_tasks([
+        Task("rbac", rbac, validate=rbac_deployed),
+        Task("teleport-cluster", teleport_cluster, outputs=("cluster_ns", "auth_pod"),
+             validate=lambda cluster_ns, auth_pod: auth_pod_running(cluster_ns, auth_pod)),
+        Task("admin-user", admin_user, inputs=("cluster_ns", "auth_pod"), outputs=("invite_url",),
+             validate=lambda invite_url, **_: bool(invite_url), ttl=INVITE_TTL),
+        Task("join-token", join_token, inputs=("cluster_ns", "auth_pod"), outputs=("token",),
+             validate=lambda cluster_ns, auth_pod, token: token_exists_local(cluster_ns, auth_pod, token),
+             ttl=JOIN_TOKEN_MIN_TTL_HOURS * 3600),
+        Task("dashboard", dashboard, outputs=("k8s_ns",),
+             validate=lambda k8s_ns: release_deployed("kubernetes-dashboard", k8s_ns)),
+        Task("agent", agent, inputs=("token", "cluster_ns", "k8s_ns"),
+             validate=lambda **_: release_deployed("teleport-agent", agent_ns)),
+        Task("port-forward", start_port_forward, inputs=("cluster_ns",), after=("agent",)),
+    ], max_workers=max_workers, journal=journal)
+    
+    # Print summary
+    print_summary_local_mode(values["invite_url"], values["cluster_ns"])
+
+
+def deploy_enterprise_mode(config, max_workers: int = DEFAULT_MAX_WORKERS, journal: DeployJournal = None):
+    """Deploy in enterprise mode"""
+    print_info("🚀 Starting Enterprise deployment (RBAC + Dashboard + Agent)...")
+    
+    proxy = get_config_value(config, "teleport.proxy_addr", "")
+    if not proxy:
+        print_error("proxy_addr is required for Enterprise mode. Please set it in config.yaml")
+        sys.exit(1)
+    
+    # Enterprise mode has 5 steps. tctl setup / token generation runs
+    # concurrently with the Dashboard install.
+    steps = StepCounter(5)
+    cluster_name = get_config_value(config, "teleport.cluster_name", "minikube")
+    agent_ns = get_config_value(config, "teleport.agent_namespace", "teleport-agent")
+    
+    if not agent_ns:
+        agent_ns = "teleport-agent"
+    
+    def rbac():
+        print_step(steps.next("Deploying RBAC resources..."))
+        deploy_rbac()
+    
+    def tctl():
+        return setup_tctl(config, steps)
+    
+    def join_token(proxy_clean):
+        return generate_token_enterprise(proxy_clean, steps)
+    
+    def dashboard():
+        print_step(steps.next("Deploying Kubernetes Dashboard..."))
+        return deploy_dashboard(config)
+    
+    def agent(token, proxy_clean, k8s_ns, cluster_ip):
+        print_step(steps.next("Deploying Teleport Agent..."))
+        print_info(f"✅ Using token: {token}")
+        print_info(f"✅ Using proxy: {proxy_clean}")
+        print_info(f"✅ Using cluster: {cluster_name}")
+        print_info(f"✅ Using K8S namespace: {k8s_ns}")
+        print_info(f"✅ Using Teleport namespace: {agent_ns}")
+        # Enterprise mode uses a static app config pointing at the dashboard ClusterIP
+        deploy_agent_common(config, token, proxy_clean, cluster_name, agent_ns, k8s_ns,
+                            is_local=False, cluster_ip=cluster_ip)
+    
+    # validate= checks let `deploy --resume` skip tasks whose journal entries still hold
+    values = run_tasks([
+        Task("rbac", rbac, validate=rbac_deployed),
+        Task("tctl", tctl, outputs=("proxy_clean",), validate=tctl_authenticated),
+        Task("join-token", join_token, inputs=("proxy_clean",), outputs=("token",),
+             validate=lambda proxy_clean, token: token_exists_enterprise(token),
+             ttl=JOIN_TOKEN_MIN_TTL_HOURS * 3600),
+        Task("dashboard", dashboard, outputs=("k8s_ns",),
+             validate=lambda k8s_ns: release_deployed("kubernetes-dashboard", k8s_ns)),
+        Task("cluster-ip", get_dashboard_clusterip, inputs=("k8s_ns",), outputs=("cluster_ip",),
+             validate=lambda k8s_ns, cluster_ip: dashboard_clusterip(k8s_ns) == cluster_ip),
+        Task("agent", agent, inputs=("token", "proxy_clean", "k8s_ns", "cluster_ip"),
+             validate=lambda **_: release_deployed("teleport-agent", agent_ns)),
+    ], max_workers=max_workers, journal=journal)
+    
+    # Print summary
+    print_summary_enterprise_mode(values["proxy_clean"])
+
+
+def main(profile: bool = False, sequential: bool = False, force_upgrade: bool = False, resume: bool = False,
+         render: str = None):
+    """Main deployment function"""
+    max_workers = 1 if sequential else DEFAULT_MAX_WORKERS
+    set_force_upgrades(force_upgrade)
+    if not profile:
+        _deploy(max_workers, resume, render)
+        return
+    
+    profiler = enable_profiling()
+    try:
+        _deploy(max_workers, resume, render)
+    finally:
+        profiler.print_report()
+        trace_path = get_state_dir() / "deploy-profile.json"
+        profiler.write_chrome_trace(trace_path)
+        print_info(f"📈 Chrome trace written to {trace_path} (open in chrome://tracing or https://ui.perfetto.dev)")
+
+
+def _deploy(max_workers: int, resume: bool = False, render: str = None):
+    """Read config and deploy in local or enterprise mode"""
+    # Read config
+    config = read_config()
+    
+    # Get proxy address
+    proxy = get_config_value(config, "teleport.proxy_addr", "")
+    proxy = proxy.strip()
+    
+    # Validate proxy_addr
+    if proxy and not proxy.startswith("https://"):
+        print_error("Invalid proxy_addr in config.yaml")
+        print_info("   proxy_addr must be either:")
+        print_info('   - Empty string "" for local mode')
+        print_info('   - Start with "https://" for Enterprise mode (e.g., "https://example.teleport.com:443")')
+        print_info(f'   Current value: "{proxy}"')
+        sys.exit(1)
+    
+    if render:
+        from .render import render_bundle
+        render_bundle(config, render)
+        return
+    
+    # Deploy based on mode (recording completed steps so an interrupted run can be resumed)
+    if not proxy or proxy == "":
+        deploy_local_mode(config, max_workers, DeployJournal("local", config, resume))
+    else:
+        deploy_enterprise_mode(config, max_workers, DeployJournal("enterprise", config, resume))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Per-namespace pod index
+
+Lists each namespace's pods once and answers label-selector and name-pattern
+lookups from memory, so trying several selectors (and a name fallback) costs
+one API round-trip instead of one kubectl spawn per attempt. The index lives
+for the rest of the command; callers that need fresh state (e.g. waits) ask
+for a refresh explicitly.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional
+from .kube import kube_list
+
+_REQUIREMENT = re.compile(
+    r"^\s*(?P<neg>!)?\s*(?P<key>[A-Za-z0-9_.\-/]+)\s*"
+    r"(?:(?P<op>==|!=|=|\s+in\s+|\s+notin\s+)\s*(?P<value>\([^)]*\)|[A-Za-z0-9_.\-]*))?\s*$"
+)
+
+
+def _split_selector(selector: str) -> List[str]:
+    """Split on commas that aren't inside an in (...) / notin (...) set"""
+    parts, depth, current = [], 0, []
+    for ch in selector:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return [p for p in parts if p.strip()]
+
+
+def parse_selector(selector: str) -> List[tuple]:
+    """Parse a label selector into (key, op, values) requirements, as kubectl understands it"""
+    requirements = []
+    for part in _split_selector(selector or ""):
+        match = _REQUIREMENT.match(part)
+        if not match:
+            raise ValueError(f"Invalid label selector: {selector}")
+        key, op, value = match.group("key"), (match.group("op") or "").strip(), match.group("value")
+        if match.group("neg"):
+            requirements.append((key, "!", ()))
+        elif not op:
+            requirements.append((key, "exists", ()))
+        elif op in ("in", "notin"):
+            values = tuple(v.strip() for v in value.strip("()").split(",") if v.strip())
+            requirements.append((key, op, values))
+        else:
+            requirements.append((key, "!=" if op == "!=" else "=", (value or "",)))
+    return requirements
+
+
+def selector_matches(selector: str, labels: Dict[str, str]) -> bool:
+    """True if labels satisfy every requirement of the selector"""
+    for key, op, values in parse_selector(selector):
+        present = key in labels
+        if op == "exists" and not present:
+            return False
+        if op == "!" and present:
+            return False
+        if op in ("=", "in") and (not present or labels[key] not in values):
+            return False
+        if op in ("!=", "notin") and present and labels[key] in values:
+            return False
+    return True
+
+
+class PodIndex:
+    """Pods by namespace, listed once and matched in memory"""
+    def __init__(self):
+        self._pods: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def pods(self, namespace: str, refresh: bool = False) -> List[Dict]:
+        """All pods in a namespace ([] if it doesn't exist or the listing failed)"""
+        with self._lock:
+            if refresh or namespace not in self._pods:
+                self._pods[namespace] = kube_list("pods", namespace) or []
+            return self._pods[namespace]
+
+    def seed(self, namespace: str, pods: List[Dict]):
+        """Reuse a pod listing someone else already fetched (e.g. the status snapshot)"""
+        with self._lock:
+            self._pods[namespace] = pods
+
+    def invalidate(self, namespace: Optional[str] = None):
+        with self._lock:
+            if namespace is None:
+                self._pods.clear()
+            else:
+                self._pods.pop(namespace, None)
+
+    def find(self, namespace: str, selectors: Optional[List[str]] = None, pattern: Optional[str] = None,
+             refresh: bool = False) -> List[Dict]:
+        """
+        Pods matching the first selector that matches anything, else whose name contains pattern.
+        """
+        pods = self.pods(namespace, refresh)
+        for selector in selectors or []:
+            matches = [p for p in pods if selector_matches(selector, p["metadata"].get("labels") or {})]
+            if matches:
+                return matches
+        if pattern:
+            return [p for p in pods if pattern in p["metadata"]["name"]]
+        return []
+
+    def first(self, namespace: str, selectors: Optional[List[str]] = None, pattern: Optional[str] = None,
+              refresh: bool = False) -> Optional[str]:
+        """Name of the first matching pod, or None"""
+        matches = self.find(namespace, selectors, pattern, refresh)
+        return matches[0]["metadata"]["name"] if matches else None
+
+
+_index = PodIndex()
+
+
+def get_pod_index() -> PodIndex:
+    """The process-wide pod index (one command per process, so this is per command)"""
+    return _index
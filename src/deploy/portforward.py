@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Supervised port-forwards
+
+A single background supervisor (`port-forward serve`) owns every
+`kubectl port-forward` deploy needs. It restarts a forward with exponential
+backoff when kubectl exits or reports that the tunnel is broken (e.g. after
+the Teleport pods are restarted), and counts connections and reconnect
+latency. Deploy, clean and the deploy summary talk to it over a unix socket
+in .state/ (one JSON request and one JSON reply per connection) instead of
+scanning processes.
+"""
+
+import fcntl
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+from .common import (
+    Condition, get_project_root, get_state_dir, print_info, print_success, print_warning, wait_until
+)
+
+SOCKET_FILE = "port-forward.sock"
+LOG_FILE = "port-forward.log"
+LOCK_FILE = "port-forward.lock"
+
+# Reconnect backoff (seconds); it resets once a forward has stayed up for STABLE_AFTER
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30
+STABLE_AFTER = 60
+
+# kubectl keeps running after these, but the tunnel is dead until it reconnects
+BROKEN_MARKERS = ("lost connection to pod", "container not running", "pod not found",
+                  "unable to do port forwarding", "error: ")
+
+# The Teleport web UI forward deploy sets up in local mode
+TELEPORT_FORWARD = "teleport"
+TELEPORT_PORT = 8080
+
+
+def socket_path() -> str:
+    return str(get_state_dir() / SOCKET_FILE)
+
+
+class Forward:
+    """One supervised `kubectl port-forward` and its counters"""
+    def __init__(self, name: str, namespace: str, resource: str, ports: List[str], kubeconfig: Optional[str] = None):
+        self.name = name
+        self.namespace = namespace
+        self.resource = resource
+        self.ports = ports
+        self.kubeconfig = kubeconfig
+        self.state = "starting"
+        self.pid = None
+        self.restarts = 0
+        self.connections = 0
+        self.up_since = None
+        self.last_error = None
+        self.last_reconnect_ms = None
+        self._process = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._supervise, name=f"forward-{name}", daemon=True)
+
+    def spec(self) -> Dict:
+        return {"namespace": self.namespace, "resource": self.resource, "ports": self.ports, "kubeconfig": self.kubeconfig}
+
+    def snapshot(self) -> Dict:
+        return dict(self.spec(), name=self.name, state=self.state, pid=self.pid, restarts=self.restarts,
+                    connections=self.connections, up_since=self.up_since, last_error=self.last_error,
+                    last_reconnect_ms=self.last_reconnect_ms)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        process = self._process
+        if process and process.poll() is None:
+            process.terminate()
+        self._thread.join(timeout=5)
+
+    def _run_once(self, broken_at: Optional[float]):
+        """Run kubectl until it exits or reports a broken tunnel"""
+        env = dict(os.environ)
+        if self.kubeconfig:
+            env["KUBECONFIG"] = self.kubeconfig
+        self._process = subprocess.Popen(
+            ["kubectl", "port-forward", "-n", self.namespace, self.resource, *self.ports],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, text=True, env=env
+        )
+        self.pid = self._process.pid
+        if self._stop.is_set():
+            self._process.terminate()
+        broken = None
+        for line in self._process.stdout:
+            if line.startswith("Forwarding from") and self.state != "up":
+                self.state = "up"
+                self.up_since = time.time()
+                if broken_at is not None:
+                    self.last_reconnect_ms = round((time.monotonic() - broken_at) * 1000)
+            elif line.startswith("Handling connection"):
+                self.connections += 1
+            elif broken is None and any(marker in line for marker in BROKEN_MARKERS):
+                broken = line.strip()
+                self._process.terminate()
+        self._process.wait()
+        self.last_error = broken or f"kubectl exited with {self._process.returncode}"
+
+    def _supervise(self):
+        backoff = BACKOFF_INITIAL
+        broken_at = None
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self._run_once(broken_at)
+            if self._stop.is_set():
+                break
+            broken_at = time.monotonic()
+            if broken_at - started > STABLE_AFTER:
+                backoff = BACKOFF_INITIAL
+            self.state = "reconnecting"
+            self.up_since = None
+            self.restarts += 1
+            print(f"{time.strftime('%H:%M:%S')} {self.name}: {self.last_error}; reconnecting in {backoff:g}s", flush=True)
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, BACKOFF_MAX)
+        self.state = "stopped"
+
+
+class Supervisor(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Control socket server holding the supervised forwards"""
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        self.forwards: Dict[str, Forward] = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        super().__init__(path, _ControlHandler)
+
+    def handle_request_json(self, request: Dict) -> Dict:
+        command = request.get("command")
+        if command == "status":
+            with self.lock:
+                forwards = [f.snapshot() for f in self.forwards.values()]
+            return {"ok": True, "pid": os.getpid(), "started_at": self.started_at, "forwards": forwards}
+        if command == "add":
+            spec = request["forward"]
+            with self.lock:
+                existing = self.forwards.get(spec["name"])
+                if existing and existing.spec() == {k: spec.get(k) for k in existing.spec()}:
+                    return {"ok": True, "forward": existing.snapshot()}
+                if existing:
+                    existing.stop()
+                forward = Forward(spec["name"], spec["namespace"], spec["resource"], spec["ports"], spec.get("kubeconfig"))
+                self.forwards[forward.name] = forward
+                forward.start()
+            return {"ok": True, "forward": forward.snapshot()}
+        if command == "remove":
+            with self.lock:
+                forward = self.forwards.pop(request.get("name"), None)
+            if forward:
+                forward.stop()
+            return {"ok": forward is not None}
+        if command == "stop":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command {command!r}"}
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            reply = self.server.handle_request_json(json.loads(self.rfile.readline()))
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+def serve():
+    """Run the supervisor in the foreground (started in the background by ensure_forward)"""
+    path = socket_path()
+    # Held for the supervisor's lifetime, so two deploys can't both start one
+    lock = open(get_state_dir() / LOCK_FILE, "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print("Port-forward supervisor already running")
+        return
+    if os.path.exists(path):
+        os.unlink(path)
+    server = Supervisor(path)
+    print(f"{time.strftime('%H:%M:%S')} supervisor {os.getpid()} listening on {path}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        with server.lock:
+            forwards = list(server.forwards.values())
+        for forward in forwards:
+            forward.stop()
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+        print(f"{time.strftime('%H:%M:%S')} supervisor stopped", flush=True)
+
+
+def request(message: Dict, timeout: float = 2) -> Optional[Dict]:
+    """Send one request to the supervisor; None if it isn't running"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path())
+            sock.sendall((json.dumps(message) + "\n").encode())
+            with sock.makefile("r") as f:
+                return json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def _spawn_supervisor() -> bool:
+    """Start the supervisor in its own session and wait for its socket"""
+    log = open(get_state_dir() / LOG_FILE, "a")
+    subprocess.Popen([sys.executable, str(get_project_root() / "src" / "main.py"), "port-forward", "serve"],
+                     stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    log.close()
+    return wait_until(Condition("port-forward supervisor", lambda: request({"command": "status"}) is not None),
+                      timeout=10, initial_delay=0.05)
+
+
+def ensure_forward(name: str, namespace: str, resource: str, ports: List[str], timeout: float = 15) -> Optional[Dict]:
+    """Have the supervisor keep a forward up (starting the supervisor if needed); its status, or None on failure"""
+    if request({"command": "status"}) is None and not _spawn_supervisor():
+        print_warning(f"Port-forward supervisor failed to start. Check logs: {get_state_dir() / LOG_FILE}")
+        return None
+    spec = {"name": name, "namespace": namespace, "resource": resource, "ports": ports,
+            "kubeconfig": os.environ.get("KUBECONFIG")}
+    reply = request({"command": "add", "forward": spec})
+    if not reply or not reply.get("ok"):
+        print_warning(f"Port-forward supervisor rejected {name}: {(reply or {}).get('error')}")
+        return None
+    wait_until(Condition(f"port-forward {name} up", lambda: (forward_status(name) or {}).get("state") == "up"),
+               timeout=timeout, initial_delay=0.1)
+    return forward_status(name)
+
+
+def forward_status(name: str) -> Optional[Dict]:
+    """A supervised forward's state and counters; None if it (or the supervisor) isn't running"""
+    reply = request({"command": "status"})
+    for forward in (reply or {}).get("forwards", []):
+        if forward["name"] == name:
+            return forward
+    return None
+
+
+def stop_supervisor() -> bool:
+    """Stop the supervisor and its forwards; False if it wasn't running"""
+    if request({"command": "stop"}) is None:
+        return False
+    wait_until(Condition("port-forward supervisor to stop", lambda: not os.path.exists(socket_path())), timeout=10)
+    return True
+
+
+def show_forwards():
+    """Print every supervised forward"""
+    reply = request({"command": "status"})
+    if reply is None:
+        print_info("Port-forward supervisor is not running (deploy starts it, or: python3 src/main.py port-forward start)")
+        return
+    print_info(f"🔌 Port-forward supervisor (PID {reply['pid']}, socket {socket_path()})")
+    if not reply["forwards"]:
+        print("  No forwards")
+    for f in reply["forwards"]:
+        latency = f"{f['last_reconnect_ms']}ms" if f["last_reconnect_ms"] is not None else "-"
+        print(f"  {f['name']}: {f['namespace']}/{f['resource']} {' '.join(f['ports'])} - {f['state']} "
+              f"(pid {f['pid']}, {f['connections']} connection(s), {f['restarts']} reconnect(s), "
+              f"last reconnect {latency})")
+        if f["last_error"] and f["state"] != "up":
+            print(f"    last error: {f['last_error']}")
+
+
+def port_forward_command(action: str = "status"):
+    """`port-forward [start|status|stop|serve]`"""
+    from .common import get_config_value, read_config
+    if action == "serve":
+        serve()
+    elif action == "stop":
+        if stop_supervisor():
+            print_success("Port-forward supervisor stopped")
+        else:
+            print_info("Port-forward supervisor is not running")
+    elif action == "start":
+        cluster_ns = get_config_value(read_config(), "teleport.cluster_namespace", "teleport-cluster")
+        forward = ensure_forward(TELEPORT_FORWARD, cluster_ns, "svc/teleport-cluster", [f"{TELEPORT_PORT}:{TELEPORT_PORT}"])
+        if forward and forward["state"] == "up":
+            print_success(f"Port-forward {TELEPORT_FORWARD} up on localhost:{TELEPORT_PORT}")
+        show_forwards()
+    else:
+        show_forwards()
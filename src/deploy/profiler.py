@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Deploy profiler - records timed spans for steps, commands and sleeps
+and exports them as a Chrome trace-event JSON file
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class Span:
+    """A single timed span (step, command or sleep)"""
+    def __init__(self, name: str, category: str, args: Optional[Dict] = None):
+        self.name = name
+        self.category = category
+        self.args = dict(args or {})
+        self.tid = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self) -> float:
+        """Wall time in seconds (up to now if the span is still open)"""
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+
+class Profiler:
+    """Collects spans for one deploy run"""
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        """Store a finished span"""
+        with self._lock:
+            self.spans.append(span)
+
+    def total_time(self) -> float:
+        """Wall time since profiling was enabled"""
+        return time.perf_counter() - self.origin
+
+    def totals_by_group(self) -> Dict[str, float]:
+        """Sum command and sleep time by group (e.g. 'helm', 'kubectl exec', 'sleep')"""
+        totals = {}
+        for span in self.spans:
+            if span.category == "step":
+                continue
+            group = span.args.get("group", span.category)
+            totals[group] = totals.get(group, 0.0) + span.duration
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def top(self, n: int = 15, category: Optional[str] = None) -> List[Span]:
+        """Return the n longest spans, optionally limited to one category"""
+        spans = [s for s in self.spans if category is None or s.category == category]
+        return sorted(spans, key=lambda s: s.duration, reverse=True)[:n]
+
+    def write_chrome_trace(self, path: Path):
+        """Write spans as Chrome trace-event JSON (open in chrome://tracing or Perfetto)"""
+        pid = os.getpid()
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self.origin) * 1_000_000),
+                "dur": round(span.duration * 1_000_000),
+                "pid": pid,
+                "tid": span.tid,
+                "args": span.args,
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, indent=1)
+
+    def print_report(self, top_n: int = 15):
+        """Print per-step, per-group and top-N span tables"""
+        from .common import print_step
+
+        total = self.total_time()
+        print_step(f"⏱️  Deploy profile ({total:.1f}s total)")
+
+        steps = [s for s in self.spans if s.category == "step"]
+        if steps:
+            print("\nSteps:")
+            for span in sorted(steps, key=lambda s: s.start):
+                print(f"  {span.duration:8.2f}s  {span.name}")
+
+        totals = self.totals_by_group()
+        if totals:
+            print("\nTime by command group:")
+            for group, seconds in totals.items():
+                share = (seconds / total * 100) if total else 0.0
+                print(f"  {seconds:8.2f}s  {share:5.1f}%  {group}")
+
+        top = [s for s in self.top(len(self.spans)) if s.category != "step"][:top_n]
+        if top:
+            print(f"\nTop {len(top)} commands and sleeps:")
+            for span in top:
+                detail = span.args.get("argv") or span.name
+                if isinstance(detail, list):
+                    detail = " ".join(detail)
+                if len(detail) > 90:
+                    detail = detail[:87] + "..."
+                exit_code = span.args.get("exit_code")
+                code = f"rc={exit_code}" if exit_code is not None else ""
+                print(f"  {span.duration:8.2f}s  {code:6}  {detail}")
+        print()
+
+
+_profiler: Optional[Profiler] = None
+
+
+def enable_profiling() -> Profiler:
+    """Start recording spans for the rest of the process"""
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    """Return the active profiler, or None if profiling is off"""
+    return _profiler
+
+
+def command_group(cmd: list) -> str:
+    """Group a command by tool and subcommand, e.g. 'helm upgrade' or 'kubectl exec'"""
+    if not cmd:
+        return "cmd"
+    tool = os.path.basename(str(cmd[0]))
+    if tool not in ("kubectl", "helm", "tctl"):
+        return tool
+    args = [str(arg) for arg in cmd[1:]]
+    skip_next = False
+    for arg in args:
+        if skip_next:
+            skip_next = False
+        elif arg in _FLAGS_WITH_VALUE:
+            skip_next = True
+        elif not arg.startswith("-"):
+            return f"{tool} {arg}"
+    return tool
+
+
+# Global flags that take a separate value and may precede the subcommand
+_FLAGS_WITH_VALUE = {"-n", "--namespace", "--context", "--kubeconfig", "--kube-context"}
+
+
+@contextmanager
+def profile_span(name: str, category: str = "step", **args):
+    """Time the enclosed block as a span (no-op when profiling is off)"""
+    if _profiler is None:
+        yield None
+        return
+    span = Span(name, category, args)
+    try:
+        yield span
+    finally:
+        span.end = time.perf_counter()
+        _profiler.record(span)
+
+
+def profiled_sleep(seconds: float, reason: str):
+    """time.sleep() that shows up as its own span in the profile"""
+    with profile_span(reason, "sleep", group="sleep", seconds=seconds):
+        time.sleep(seconds)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Offline render of everything deploy applies
+
+`deploy --render DIR` builds the same Helm values as a real deploy, with
+placeholders for the join token and the dashboard ClusterIP because those
+only exist on a live cluster. It renders the releases with `helm template`
+in parallel and writes them, together with k8s/namespace.yaml and
+k8s/rbac.yaml, as a deterministic bundle. It needs no cluster. Rendered
+releases are cached by content, so unchanged inputs don't run helm at all.
+"""
+
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+from .common import (
+    get_config_value, get_project_root, print_error, print_info, print_success, print_step,
+    build_agent_values, JOIN_TOKEN_PLACEHOLDER, JOIN_TOKEN_MIN_TTL_HOURS, JOIN_TOKEN_TTL_HOURS, TELEPORT_CHART_VERSION
+)
+from .enterprise import clean_proxy_addr
+from .charts import DASHBOARD_CHART, chart_archive, dashboard_chart_version
+from .helm import helm_template
+from .local import build_teleport_cluster_values, local_proxy_addr
+
+CLUSTER_IP_PLACEHOLDER = "<dashboard-cluster-ip>"
+
+BUNDLE_FILE = "bundle.json"
+
+# Static manifests applied before the Helm releases (k8s/ file -> bundle file)
+STATIC_MANIFESTS = [("namespace.yaml", "00-namespace.yaml"), ("rbac.yaml", "01-rbac.yaml")]
+
+
+def render_plan(config: Dict) -> List[Dict]:
+    """The Helm releases deploy would install for this config, with their values"""
+    proxy = get_config_value(config, "teleport.proxy_addr", "")
+    is_local = not proxy
+    cluster_name = get_config_value(config, "teleport.cluster_name", "minikube")
+    cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
+    agent_ns = get_config_value(config, "teleport.agent_namespace", "teleport-agent") or "teleport-agent"
+    k8s_ns = get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard")
+
+    dashboard_version = dashboard_chart_version(config)
+
+    plan = []
+    if is_local:
+        plan.append({"file": "10-teleport-cluster.yaml", "release": "teleport-cluster",
+                     "chart": "teleport/teleport-cluster", "namespace": cluster_ns,
+                     "version": TELEPORT_CHART_VERSION, "values": build_teleport_cluster_values(cluster_ns)})
+    plan.append({"file": "20-kubernetes-dashboard.yaml", "release": "kubernetes-dashboard",
+                 "chart": DASHBOARD_CHART, "namespace": k8s_ns,
+                 "version": dashboard_version, "values": ""})
+    proxy_clean = local_proxy_addr(cluster_ns) if is_local else clean_proxy_addr(proxy)
+    plan.append({"file": "30-teleport-agent.yaml", "release": "teleport-agent",
+                 "chart": "teleport/teleport-kube-agent", "namespace": agent_ns,
+                 "version": TELEPORT_CHART_VERSION,
+                 "values": build_agent_values(JOIN_TOKEN_PLACEHOLDER, proxy_clean, cluster_name, k8s_ns,
+                                              is_local, None if is_local else CLUSTER_IP_PLACEHOLDER)})
+    return plan
+
+
+def imperative_steps(config: Dict) -> List[str]:
+    """What deploy does besides applying the bundle"""
+    if get_config_value(config, "teleport.proxy_addr", ""):
+        return [
+            f"join token with roles kube,app: reused if {JOIN_TOKEN_MIN_TTL_HOURS}h+ left, else tctl tokens add "
+            f"--ttl={JOIN_TOKEN_TTL_HOURS}h (replaces {JOIN_TOKEN_PLACEHOLDER})",
+            f"ClusterIP of kubernetes-dashboard-kong-proxy (replaces {CLUSTER_IP_PLACEHOLDER})",
+        ]
+    cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
+    k8s_ns = get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard")
+    return [
+        "tctl create k8s-admin role; tctl users add/reset admin",
+        f"join token with roles kube,app,discovery: reused if {JOIN_TOKEN_MIN_TTL_HOURS}h+ left, else tctl tokens add "
+        f"--ttl={JOIN_TOKEN_TTL_HOURS}h (replaces {JOIN_TOKEN_PLACEHOLDER})",
+        f"kubectl annotate service -n {k8s_ns} kubernetes-dashboard-kong-proxy teleport.dev/name=dashboard "
+        "teleport.dev/protocol=https teleport.dev/ignore-tls=true",
+        f"kubectl patch service -n {cluster_ns} teleport-cluster (add port 8080 -> 3080 agent-fallback)",
+    ]
+
+
+def _write(path: Path, content: str) -> str:
+    """Write a bundle file and return its sha256"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = content.encode("utf-8")
+    path.write_bytes(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def render_bundle(config: Dict, directory: str):
+    """Render every manifest deploy would apply into directory"""
+    root = Path(directory)
+    start = time.monotonic()
+    print_step(f"🧾 Rendering deploy manifests into {root} (no cluster access)...")
+    plan = render_plan(config)
+
+    with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+        rendered = list(pool.map(
+            lambda item: helm_template(item["release"], item["chart"], item["namespace"], item["values"],
+                                       item["version"], chart_archive(item["chart"], item["version"], config)),
+            plan))
+
+    failed = False
+    for item, (exit_code, _, stderr, cached) in zip(plan, rendered):
+        if exit_code != 0:
+            print_error(f"helm template {item['release']} failed: {stderr}")
+            failed = True
+        else:
+            print_info(f"📄 {item['release']} ({item['chart']} {item['version']}): "
+                       f"{'cached' if cached else 'rendered'}")
+    if failed:
+        sys.exit(1)
+
+    # Drop files of an earlier render (e.g. one in the other mode) before writing this one
+    try:
+        with open(root / BUNDLE_FILE) as f:
+            for entry in json.load(f).get("files", []):
+                (root / entry["path"]).unlink(missing_ok=True)
+    except (OSError, ValueError):
+        pass
+
+    files = []
+    for source, name in STATIC_MANIFESTS:
+        content = (get_project_root() / "k8s" / source).read_text()
+        files.append({"path": name, "source": f"k8s/{source}", "sha256": _write(root / name, content)})
+    for item, (_, manifest, _, _) in zip(plan, rendered):
+        values_name = f"values/{item['release']}.yaml"
+        files.append({"path": values_name, "release": item["release"],
+                      "sha256": _write(root / values_name, item["values"])})
+        files.append({"path": item["file"], "release": item["release"], "chart": item["chart"],
+                      "version": item["version"], "namespace": item["namespace"],
+                      "sha256": _write(root / item["file"], manifest)})
+
+    bundle = {
+        "mode": "enterprise" if get_config_value(config, "teleport.proxy_addr", "") else "local",
+        "placeholders": {"join_token": JOIN_TOKEN_PLACEHOLDER, "dashboard_cluster_ip": CLUSTER_IP_PLACEHOLDER},
+        "files": files,
+        "imperative_steps": imperative_steps(config),
+    }
+    with open(root / BUNDLE_FILE, "w") as f:
+        json.dump(bundle, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    digest = hashlib.sha256("".join(entry["sha256"] for entry in files).encode()).hexdigest()
+    print_success(f"Rendered {len(files)} file(s) in {time.monotonic() - start:.1f}s (bundle digest {digest[:12]})")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Dependency-graph task scheduler for the deploy pipeline
+
+Each Task declares the named values it consumes (inputs) and produces
+(outputs). Tasks whose inputs are available run concurrently on a thread
+pool; output from each task is prefixed with its label so interleaved
+progress stays readable. With a DeployJournal, completed tasks are recorded
+and, on resume, skipped when their recorded outputs still validate.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .common import print_info, print_success, print_error, set_output_label
+from .profiler import profile_span
+
+
+class Task:
+    """A unit of deploy work with declared inputs and outputs"""
+    def __init__(self, name: str, func: Callable, inputs: Iterable[str] = (),
+                 outputs: Iterable[str] = (), after: Iterable[str] = (),
+                 validate: Optional[Callable[..., bool]] = None, ttl: Optional[float] = None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        # Ordering-only dependencies (task names) with no data flowing between them
+        self.after = tuple(after)
+        # Cheap check (called with inputs and recorded outputs) that lets a resumed
+        # deploy skip the task; tasks without one always run
+        self.validate = validate
+        # Seconds the outputs stay usable (e.g. a join token's TTL)
+        self.ttl = ttl
+
+    def run(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Call the task function with its inputs and map the result onto its outputs"""
+        result = self.func(**{name: values[name] for name in self.inputs})
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        if not isinstance(result, tuple) or len(result) != len(self.outputs):
+            raise ValueError(f"Task '{self.name}' must return {len(self.outputs)} values: {', '.join(self.outputs)}")
+        return dict(zip(self.outputs, result))
+
+
+def _resolve_dependencies(tasks: List[Task], initial: Dict[str, Any]) -> Dict[str, set]:
+    """Map each task name to the set of task names it depends on"""
+    names = {task.name for task in tasks}
+    if len(names) != len(tasks):
+        raise ValueError("Duplicate task names in deploy graph")
+
+    producers = {}
+    for task in tasks:
+        for output in task.outputs:
+            if output in producers:
+                raise ValueError(f"Output '{output}' is produced by both '{producers[output]}' and '{task.name}'")
+            producers[output] = task.name
+
+    deps = {}
+    for task in tasks:
+        task_deps = set()
+        for name in task.inputs:
+            if name in producers:
+                task_deps.add(producers[name])
+            elif name not in initial:
+                raise ValueError(f"Task '{task.name}' needs '{name}' but no task produces it")
+        for name in task.after:
+            if name not in names:
+                raise ValueError(f"Task '{task.name}' runs after unknown task '{name}'")
+            task_deps.add(name)
+        deps[task.name] = task_deps
+
+    # Reject cycles up front (Kahn's algorithm)
+    remaining = {name: set(d) for name, d in deps.items()}
+    while remaining:
+        ready = [name for name, d in remaining.items() if not d]
+        if not ready:
+            raise ValueError(f"Dependency cycle between tasks: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for d in remaining.values():
+            d.difference_update(ready)
+
+    return deps
+
+
+def run_tasks(tasks: List[Task], initial: Optional[Dict[str, Any]] = None, max_workers: int = 4,
+              journal=None) -> Dict[str, Any]:
+    """
+    Run tasks respecting their dependencies and return all produced values.
+
+    Independent tasks run concurrently (up to max_workers). If a task fails
+    (including sys.exit() inside it), no new tasks are started, running tasks
+    are allowed to finish and the first failure is re-raised. With a journal
+    (see deploy.journal), each completed task is recorded and tasks the
+    journal can vouch for are skipped.
+    """
+    values = dict(initial or {})
+    deps = _resolve_dependencies(tasks, values)
+    by_name = {task.name: task for task in tasks}
+    done = set()
+    running = {}
+    started = {}
+    failure = None
+    concurrent = max_workers > 1
+
+    def execute(task: Task) -> Tuple[Dict[str, Any], bool]:
+        if concurrent:
+            set_output_label(task.name)
+        try:
+            inputs = {name: values[name] for name in task.inputs}
+            if journal is not None:
+                outputs = journal.reuse(task, inputs)
+                if outputs is not None:
+                    return outputs, True
+            with profile_span(task.name, "step"):
+                outputs = task.run(values)
+            if journal is not None:
+                journal.record(task, inputs, outputs)
+            return outputs, False
+        finally:
+            set_output_label(None)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deploy") as executor:
+        while len(done) < len(tasks):
+            if failure is None:
+                for task in tasks:
+                    if task.name in done or task.name in started:
+                        continue
+                    if deps[task.name] <= done:
+                        if concurrent:
+                            print_info(f"▶️  Starting {task.name}")
+                        running[executor.submit(execute, task)] = task.name
+                        started[task.name] = time.monotonic()
+
+            if not running:
+                break
+
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    outputs, reused = future.result()
+                    values.update(outputs)
+                except BaseException as e:
+                    if failure is None:
+                        failure = e
+                        if concurrent and running:
+                            print_error(f"{name} failed; waiting for {', '.join(running.values())} to finish...")
+                    continue
+                done.add(name)
+                if concurrent and not reused:
+                    print_success(f"{name} finished ({time.monotonic() - started[name]:.1f}s)")
+
+    if failure is not None:
+        raise failure
+
+    skipped = [name for name in by_name if name not in done]
+    if skipped:
+        raise RuntimeError(f"Tasks did not run: {', '.join(skipped)}")
+
+    return values
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Batched tctl execution inside the auth pod
+
+Every `kubectl exec ... tctl` negotiates a new stream with the API server
+and starts a fresh tctl, so callers keep batches short (several resources
+go into one `tctl create -f -`). TctlSession runs a batch of operations
+one exec each, with later operations conditional on earlier ones
+(`when`/`unless`). The Teleport charts run distroless images by default,
+which have no shell; for auth images that do, shell=True sends the whole
+batch as one script through a single `kubectl exec -i ... sh`, with each
+operation's output and exit code framed by a per-session marker. If that
+exec finds no shell, the pod falls back to one exec per operation.
+"""
+
+import re
+import shlex
+import threading
+import uuid
+from typing import Dict, List, Optional
+from .common import print_info, print_warning, run_cmd
+
+# (namespace, pod) pairs whose image has no shell; they go straight to per-operation execs
+_no_shell = set()
+_no_shell_lock = threading.Lock()
+
+
+class TctlOp:
+    """
+    One tctl invocation. input is fed to tctl's stdin. when/unless name an
+    earlier operation of the batch: the op only runs if that one succeeded
+    (when) or did not succeed (unless).
+    """
+    def __init__(self, name: str, args: List[str], input: Optional[str] = None,
+                 when: Optional[str] = None, unless: Optional[str] = None):
+        self.name = name
+        self.args = args
+        self.input = input
+        self.when = when
+        self.unless = unless
+
+
+class TctlResult:
+    """Outcome of one TctlOp (exit_code is None when its condition skipped it)"""
+    def __init__(self, name: str, exit_code: Optional[int], output: str = ""):
+        self.name = name
+        self.exit_code = exit_code
+        self.output = output
+
+    @property
+    def ran(self) -> bool:
+        return self.exit_code is not None
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+def _should_run(op: TctlOp, results: Dict[str, TctlResult]) -> bool:
+    """Evaluate an op's when/unless against the results so far"""
+    if op.when and not (op.when in results and results[op.when].ok):
+        return False
+    if op.unless and op.unless in results and results[op.unless].ok:
+        return False
+    return True
+
+
+class TctlSession:
+    """Runs batches of tctl operations in one auth pod (retries: see deploy.executor; shell: see module doc)"""
+    def __init__(self, namespace: str, pod: str, retries: Optional[int] = None, shell: bool = False):
+        self.namespace = namespace
+        self.pod = pod
+        self.retries = retries
+        self.shell = shell
+
+    def _exec(self, command: List[str], input: Optional[str] = None):
+        interactive = ["-i"] if input is not None else []
+        return run_cmd(["kubectl", "exec", "-n", self.namespace, self.pod, *interactive, "--", *command],
+                       input=input, check=False, retries=self.retries)
+
+    def _script(self, ops: List[TctlOp], marker: str) -> str:
+        """The sh script for a batch; rc_<i> holds each op's exit code (or "skip")"""
+        index = {op.name: i for i, op in enumerate(ops)}
+        lines = [f"echo '{marker} session'"]
+        for i, op in enumerate(ops):
+            command = " ".join(shlex.quote(arg) for arg in ["tctl", *op.args])
+            if op.input is not None:
+                # Quoted delimiter: the input is passed through without expansion
+                invoke = [f"{command} 2>&1 <<'{marker}_INPUT'", op.input.rstrip("\n"), f"{marker}_INPUT"]
+            else:
+                # tctl must not read the rest of the script from the session's stdin
+                invoke = [f"{command} 2>&1 </dev/null"]
+            body = [f"echo '{marker} start {i}'", *invoke, f"rc_{i}=$?", f"echo \"{marker} end {i} $rc_{i}\""]
+
+            conditions = []
+            if op.when:
+                conditions.append(f'[ "$rc_{index[op.when]}" = 0 ]')
+            if op.unless:
+                conditions.append(f'[ "$rc_{index[op.unless]}" != 0 ]')
+            if conditions:
+                lines += [f"if {' && '.join(conditions)}; then", *body,
+                          f"else rc_{i}=skip; echo '{marker} skip {i}'; fi"]
+            else:
+                lines += body
+        return "\n".join(lines) + "\n"
+
+    def _run_session(self, ops: List[TctlOp]) -> Optional[Dict[str, TctlResult]]:
+        """Run the batch through one shell; None if the pod has no usable shell"""
+        marker = f"__tctl_{uuid.uuid4().hex}__"
+        exit_code, output, stderr = self._exec(["sh", "-s"], input=self._script(ops, marker))
+        if f"{marker} session" not in output:
+            print_info(f"🐚 No shell in {self.pod} ({stderr.strip() or f'exit {exit_code}'}), "
+                       "running tctl once per operation")
+            return None
+
+        results = {}
+        starts = {int(m.group(1)): m.end() for m in re.finditer(rf"{marker} start (\d+)\n?", output)}
+        for m in re.finditer(rf"{marker} end (\d+) (\d+)$", output, re.M):
+            i = int(m.group(1))
+            text = output[starts.get(i, m.start()):m.start()]
+            results[ops[i].name] = TctlResult(ops[i].name, int(m.group(2)), text.rstrip("\n"))
+        for m in re.finditer(rf"{marker} skip (\d+)$", output, re.M):
+            results[ops[int(m.group(1))].name] = TctlResult(ops[int(m.group(1))].name, None)
+        return results
+
+    def run(self, ops: List[TctlOp]) -> Dict[str, TctlResult]:
+        """Run ops in order and return their results by name"""
+        key = (self.namespace, self.pod)
+        results: Dict[str, TctlResult] = {}
+        # A single op gains nothing from the shell
+        if self.shell and len(ops) > 1 and key not in _no_shell:
+            session = self._run_session(ops)
+            if session is None:
+                with _no_shell_lock:
+                    _no_shell.add(key)
+            else:
+                results = session
+                missing = [op.name for op in ops if op.name not in results]
+                if missing:
+                    print_warning(f"tctl session in {self.pod} ended early, running {', '.join(missing)} separately")
+
+        # One exec per operation: no shell session, or ops the session didn't get to
+        for op in ops:
+            if op.name in results:
+                continue
+            if not _should_run(op, results):
+                results[op.name] = TctlResult(op.name, None)
+                continue
+            exit_code, output, stderr = self._exec(["tctl", *op.args], input=op.input)
+            results[op.name] = TctlResult(op.name, exit_code, output if exit_code == 0 else output + stderr)
+        return results
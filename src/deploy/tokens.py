@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Join-token reuse
+
+Instead of minting a token on every deploy, acquire_join_token lists the
+cluster's tokens (`tctl tokens ls --format=json`) and reuses one whose
+roles match and which has at least JOIN_TOKEN_MIN_TTL_HOURS left, preferring
+the one this checkout used last. Only when none qualifies does it run
+`tctl tokens add --format=json`. Tokens minted here are recorded with their
+expiry in .state/tokens/<target>.json; `tokens prune` revokes the ones that
+were superseded and forgets the expired ones.
+"""
+
+import calendar
+import fcntl
+import json
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from .common import (
+    get_config_value, get_state_dir, print_error, print_info, print_success, print_warning, read_config,
+    run_cmd, wait_for_pod, JOIN_TOKEN_MIN_TTL_HOURS, JOIN_TOKEN_TTL_HOURS
+)
+from .tctl import TctlOp, TctlSession
+
+TOKENS_DIR = "tokens"
+
+# Join-token roles deploy asks for in each mode
+LOCAL_ROLES = ("kube", "app", "discovery")
+ENTERPRISE_ROLES = ("kube", "app")
+
+# Retries of transient tctl failures (auth server still starting, proxy unreachable)
+TCTL_RETRIES = 3
+
+# Runs `tctl <args>` against the target cluster and returns (exit_code, output)
+Tctl = Callable[[List[str]], Tuple[int, str]]
+
+
+def _parse_expiry(value: Optional[str]) -> Optional[int]:
+    """Epoch seconds of an RFC 3339 timestamp from tctl; None for tokens that don't expire"""
+    if not value or value.startswith("0001-01-01"):
+        return None
+    # tctl prints nanoseconds, which strptime can't take
+    try:
+        return calendar.timegm(time.strptime(re.sub(r"\.\d+", "", value)[:19], "%Y-%m-%dT%H:%M:%S"))
+    except ValueError:
+        return None
+
+
+def list_tokens(tctl: Tctl) -> Optional[List[Dict]]:
+    """The cluster's join tokens as {token, roles, expires_at}, or None if they can't be listed"""
+    exit_code, output = tctl(["tokens", "ls", "--format=json"])
+    if exit_code != 0:
+        return None
+    try:
+        resources = json.loads(output or "[]") or []
+    except ValueError:
+        return None
+    tokens = []
+    for resource in resources:
+        metadata = resource.get("metadata") or {}
+        if not metadata.get("name"):
+            continue
+        tokens.append({
+            "token": metadata["name"],
+            "roles": sorted(role.lower() for role in (resource.get("spec") or {}).get("roles") or []),
+            "expires_at": _parse_expiry(metadata.get("expires")),
+        })
+    return tokens
+
+
+def _mint(tctl: Tctl, roles: Tuple[str, ...]) -> Tuple[Optional[Dict], str]:
+    """Create a join token; returns ({token, roles, expires_at} or None, tctl output)"""
+    exit_code, output = tctl(["tokens", "add", f"--type={','.join(roles)}",
+                              f"--ttl={JOIN_TOKEN_TTL_HOURS}h", "--format=json"])
+    if exit_code != 0:
+        return None, output
+    try:
+        created = json.loads(output)
+        token, expires_at = created["token"], _parse_expiry(created.get("expires"))
+    except (ValueError, KeyError, TypeError):
+        # Older tctl prints text only
+        match = re.search(r"[a-f0-9]{32}", output)
+        if not match:
+            return None, output
+        token, expires_at = match.group(0), None
+    if expires_at is None:
+        expires_at = int(time.time()) + JOIN_TOKEN_TTL_HOURS * 3600
+    return {"token": token, "roles": sorted(roles), "expires_at": expires_at}, output
+
+
+def _cache_path(target: str):
+    return get_state_dir() / TOKENS_DIR / (re.sub(r"[^A-Za-z0-9_.-]", "_", target) + ".json")
+
+
+def _load_cache(path) -> Dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, cache: Dict):
+    tmp = path.with_suffix(".tmp")
+    # The cache holds live join tokens
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def acquire_join_token(target: str, roles: Tuple[str, ...], tctl: Tctl) -> Tuple[Optional[str], str]:
+    """
+    A join token for target (a kube context or proxy) with exactly roles,
+    reused when possible. Returns (token or None, tctl output on failure).
+    """
+    path = _cache_path(target)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Fleet processes deploying to the same cluster share one token instead of racing to mint two
+    with open(path.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        cache = _load_cache(path)
+        minted = cache.get("minted") or []
+        wanted = sorted(roles)
+        cutoff = time.time() + JOIN_TOKEN_MIN_TTL_HOURS * 3600
+
+        existing = list_tokens(tctl)
+        if existing is None:
+            print_warning("Could not list existing join tokens, creating a new one")
+            existing = []
+        candidates = [t for t in existing if t["roles"] == wanted and (t["expires_at"] is None or t["expires_at"] > cutoff)]
+        if candidates:
+            # The token used last keeps the agent values (and so its Helm release) unchanged
+            current = [t for t in candidates if t["token"] == cache.get("current")]
+            chosen = (current or sorted(candidates, key=lambda t: t["expires_at"] or float("inf"), reverse=True))[0]
+            hours = f"{(chosen['expires_at'] - time.time()) / 3600:.1f}h left" if chosen["expires_at"] else "no expiry"
+            print_info(f"♻️  Reusing join token {chosen['token'][:8]}... ({','.join(wanted)}, {hours})")
+            token = chosen["token"]
+        else:
+            print_info(f"🔑 No join token with roles {','.join(wanted)} and {JOIN_TOKEN_MIN_TTL_HOURS}h+ left, creating one")
+            created, output = _mint(tctl, roles)
+            if created is None:
+                return None, output
+            minted.append(created)
+            token = created["token"]
+
+        cache.update({"target": target, "current": token, "minted": minted})
+        _save_cache(path, cache)
+    return token, ""
+
+
+def prune_join_tokens(target: str, tctl: Tctl) -> bool:
+    """Revoke tokens minted here that were superseded and forget expired ones; False if tokens can't be listed"""
+    path = _cache_path(target)
+    if not path.exists():
+        print_info(f"No join tokens recorded for {target}")
+        return True
+    with open(path.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        cache = _load_cache(path)
+        existing = list_tokens(tctl)
+        if existing is None:
+            return False
+        live = {t["token"] for t in existing}
+
+        kept, expired, revoked = [], 0, 0
+        for entry in cache.get("minted") or []:
+            if entry["token"] not in live:
+                # Expired (the auth server drops those itself) or deleted by hand
+                expired += 1
+            elif entry["token"] == cache.get("current"):
+                kept.append(entry)
+            else:
+                exit_code, output = tctl(["tokens", "rm", entry["token"]])
+                if exit_code == 0:
+                    revoked += 1
+                else:
+                    print_warning(f"Could not revoke join token {entry['token'][:8]}...: {output.strip()}")
+                    kept.append(entry)
+        if cache.get("current") not in live:
+            cache.pop("current", None)
+        cache["minted"] = kept
+        _save_cache(path, cache)
+
+    print_success(f"Join tokens for {target}: revoked {revoked} superseded, forgot {expired} expired, kept {len(kept)}")
+    return True
+
+
+def local_tctl(cluster_ns: str, pod: str) -> Tctl:
+    """tctl inside the in-cluster auth pod"""
+    session = TctlSession(cluster_ns, pod, retries=TCTL_RETRIES)
+
+    def tctl(args: List[str]) -> Tuple[int, str]:
+        result = session.run([TctlOp("tctl", args)])["tctl"]
+        return result.exit_code, result.output
+    return tctl
+
+
+def enterprise_tctl(args: List[str]) -> Tuple[int, str]:
+    """tctl on this machine, logged in to the Enterprise proxy"""
+    exit_code, output, stderr = run_cmd(["tctl", *args], check=False, retries=TCTL_RETRIES)
+    return exit_code, output if exit_code == 0 else output + stderr
+
+
+def local_target(cluster_ns: str) -> str:
+    """Token cache key for the in-cluster Teleport of the current kube context"""
+    from .kubeapi import current_context
+    return f"{current_context() or 'default'}-{cluster_ns}"
+
+
+def prune_tokens():
+    """`tokens prune` for the configured mode"""
+    from .enterprise import clean_proxy_addr, tctl_authenticated
+
+    config = read_config()
+    proxy = get_config_value(config, "teleport.proxy_addr", "")
+    if proxy:
+        proxy_clean = clean_proxy_addr(proxy)
+        if not tctl_authenticated(proxy_clean):
+            print_error(f"tctl is not logged in to {proxy_clean} (tsh login --proxy={proxy_clean})")
+            sys.exit(1)
+        ok = prune_join_tokens(proxy_clean, enterprise_tctl)
+    else:
+        cluster_ns = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
+        pod = wait_for_pod(cluster_ns, "app.kubernetes.io/name=teleport-cluster,app.kubernetes.io/component=auth", timeout=10)
+        if not pod:
+            print_error(f"No Teleport auth pod in {cluster_ns}")
+            sys.exit(1)
+        ok = prune_join_tokens(local_target(cluster_ns), local_tctl(cluster_ns, pod))
+    if not ok:
+        print_error("Could not list the cluster's join tokens")
+        sys.exit(1)
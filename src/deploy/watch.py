@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Event-driven pod waiting built on streaming watches
+
+One watch stream is opened per target (namespace + selector or pod name),
+over the native API client when available and `kubectl get -w` otherwise.
+Pod lifecycle changes - created, scheduled, containers started, ready - are
+reported as they arrive and the wait returns as soon as every target has
+reached its desired state.
+"""
+
+import json
+import queue
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+from .common import print_error, print_info, print_warning
+from .kube import kube_watch
+from .profiler import profile_span
+
+
+class JsonStreamDecoder:
+    """Split a stream of concatenated (pretty-printed) JSON objects into documents"""
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str) -> List[Dict]:
+        """Consume text and return every JSON object completed by it"""
+        documents = []
+        for ch in text:
+            if self._depth == 0 and ch != "{":
+                continue  # whitespace between documents
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._buffer)
+                    self._buffer = []
+                    try:
+                        documents.append(json.loads(raw))
+                    except ValueError:
+                        pass
+        return documents
+
+
+class PodTarget:
+    """A pod (by label selector or name) and the state to wait for: 'exists' or 'ready'"""
+    def __init__(self, namespace: str, label_selector: Optional[str] = None,
+                 name: Optional[str] = None, state: str = "exists"):
+        if not label_selector and not name:
+            raise ValueError("PodTarget needs a label selector or a pod name")
+        if state not in ("exists", "ready"):
+            raise ValueError(f"Unknown pod state: {state}")
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.name = name
+        self.state = state
+
+    def describe(self) -> str:
+        what = f"pod/{self.name}" if self.name else f"pods -l {self.label_selector}"
+        return f"{self.namespace} {what} ({self.state})"
+
+    def field_selector(self) -> Optional[str]:
+        return f"metadata.name={self.name}" if self.name else None
+
+
+def pod_milestones(pod: Dict) -> Dict[str, object]:
+    """Summarize where a pod is in its lifecycle"""
+    spec = pod.get("spec") or {}
+    status = pod.get("status") or {}
+    conditions = {c.get("type"): c.get("status") for c in status.get("conditions") or []}
+    containers = status.get("containerStatuses") or []
+    return {
+        "created": True,
+        "terminating": bool((pod.get("metadata") or {}).get("deletionTimestamp")),
+        "scheduled": conditions.get("PodScheduled") == "True" or bool(spec.get("nodeName")),
+        "node": spec.get("nodeName"),
+        "started": bool(containers) and all("running" in (c.get("state") or {}) for c in containers),
+        "ready": conditions.get("Ready") == "True",
+    }
+
+
+class EventWatch:
+    """A running watch stream (native or `kubectl get -w`) feeding (key, event) into a queue"""
+    def __init__(self, stream=None, process: Optional[subprocess.Popen] = None):
+        self.stream = stream
+        self.process = process
+
+    @property
+    def failed(self) -> bool:
+        return self.stream is None and self.process is None
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def watch_cmd(kind: str, namespace: str, label_selector: Optional[str] = None,
+              field_selector: Optional[str] = None) -> list:
+    """kubectl command streaming watch events for a kind as JSON"""
+    cmd = ["kubectl", "-n", namespace, "get", kind]
+    if field_selector:
+        cmd += ["--field-selector", field_selector]
+    if label_selector:
+        cmd += ["-l", label_selector]
+    return cmd + ["--watch", "--output-watch-events", "-o", "json"]
+
+
+def start_watch(key, events: queue.Queue, kind: str, namespace: str, label_selector: Optional[str] = None,
+                field_selector: Optional[str] = None) -> EventWatch:
+    """
+    Start watching a kind in a namespace on a background thread.
+
+    Events arrive on the queue as (key, event); (key, None) means the stream
+    closed and should be restarted by the caller if still needed. A watch that
+    could not be started at all is returned with failed set and sends nothing.
+    """
+    stream = kube_watch(kind, namespace, label_selector, field_selector)
+    if stream is not None:
+        threading.Thread(target=_pump_native, args=(key, stream, events), daemon=True).start()
+        return EventWatch(stream=stream)
+    try:
+        process = subprocess.Popen(
+            watch_cmd(kind, namespace, label_selector, field_selector),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+    except OSError as e:
+        # No kubectl to fall back to: report it once and return a watch that never delivers events
+        print_error(f"Could not watch {kind} in {namespace}: {e}")
+        return EventWatch()
+    threading.Thread(target=_pump, args=(key, process, events), daemon=True).start()
+    return EventWatch(process=process)
+
+
+def _pump(index, process: subprocess.Popen, events: queue.Queue):
+    """Read one watch stream and forward decoded events to the queue"""
+    decoder = JsonStreamDecoder()
+    for line in process.stdout:
+        for event in decoder.feed(line):
+            events.put((index, event))
+    events.put((index, None))  # stream closed
+
+
+def _pump_native(index, stream, events: queue.Queue):
+    """Forward events from a native API watch stream to the queue"""
+    try:
+        for event in stream:
+            events.put((index, event))
+    except Exception:
+        pass
+    events.put((index, None))  # stream closed
+
+
+def watch_pods(targets: List[PodTarget], timeout: float = 120) -> Dict[int, Optional[str]]:
+    """
+    Watch several namespaces/selectors at once until each target reaches its state.
+
+    Returns {target index: pod name} - the name is None for targets that did
+    not reach their state before the timeout.
+    """
+    results: Dict[int, Optional[str]] = {i: None for i in range(len(targets))}
+    seen: Dict[tuple, Dict] = {}
+    events: queue.Queue = queue.Queue()
+    watches: List[EventWatch] = []
+    restarts: Dict[int, int] = {}
+    failed = set()
+    deadline = time.monotonic() + timeout
+
+    def start(index: int):
+        target = targets[index]
+        watch = start_watch(index, events, "pods", target.namespace, target.label_selector,
+                            target.field_selector())
+        if watch.failed:
+            failed.add(index)
+        watches.append(watch)
+
+    for target in targets:
+        print_info(f"⏳ Watching {target.describe()}...")
+
+    with profile_span(f"watch {len(targets)} pod target(s)", "cmd", group="pod watch",
+                      argv=[t.describe() for t in targets]):
+        try:
+            for index in range(len(targets)):
+                start(index)
+
+            while any(name is None and index not in failed for index, name in results.items()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    index, event = events.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+                if event is None:
+                    # Stream ended early (API server timeout, connection drop): re-open it
+                    if results[index] is None and deadline - time.monotonic() > 1:
+                        restarts[index] = restarts.get(index, 0) + 1
+                        time.sleep(min(0.5 * 2 ** (restarts[index] - 1), 5.0))
+                        start(index)
+                    continue
+
+                if event.get("type") == "ERROR":
+                    continue
+                pod = event.get("object") or {}
+                name = (pod.get("metadata") or {}).get("name")
+                if not name:
+                    continue
+                target = targets[index]
+                key = (target.namespace, name)
+
+                if event.get("type") == "DELETED":
+                    seen.pop(key, None)
+                    print_info(f"📦 {target.namespace}/{name}: deleted")
+                    continue
+
+                milestones = pod_milestones(pod)
+                _report(target.namespace, name, seen.get(key), milestones)
+                seen[key] = milestones
+
+                if results[index] is None and not milestones["terminating"]:
+                    if target.state == "exists" or milestones["ready"]:
+                        results[index] = name
+        finally:
+            for watch in watches:
+                watch.close()
+
+    for index, name in results.items():
+        if name is None and index not in failed:
+            print_warning(f"Timed out after {timeout:g}s watching {targets[index].describe()}")
+    return results
+
+
+def _report(namespace: str, name: str, before: Optional[Dict], after: Dict):
+    """Print lifecycle transitions for one pod"""
+    before = before or {}
+    if not before.get("created"):
+        print_info(f"📦 {namespace}/{name}: created")
+    if after["scheduled"] and not before.get("scheduled"):
+        node = f" on {after['node']}" if after["node"] else ""
+        print_info(f"📦 {namespace}/{name}: scheduled{node}")
+    if after["started"] and not before.get("started"):
+        print_info(f"📦 {namespace}/{name}: containers started")
+    if after["ready"] and not before.get("ready"):
+        print_info(f"📦 {namespace}/{name}: ready")
+    if after["terminating"] and not before.get("terminating"):
+        print_info(f"📦 {namespace}/{name}: terminating")
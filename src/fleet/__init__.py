@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Run deploy/clean/status against many clusters in parallel
+
+When config.yaml has a `clusters:` list, each entry (a kube context plus
+cluster_name/namespace overrides) gets its own worker process with an
+isolated environment: a minified KUBECONFIG pinned to its context, its own
+config file and TELEPORT_PROXY. Output is captured per cluster, printed as
+one block when that cluster finishes, and summarized in a table at the end.
+"""
+
+import copy
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from deploy.common import (
+    CONFIG_PATH_ENV, Colors, get_config_value, get_state_dir, load_yaml, read_config, run_cmd,
+    print_error, print_step, print_success, print_warning
+)
+
+DEFAULT_PARALLELISM = 4
+
+# clusters[] entry key -> config path it overrides
+OVERRIDES = {
+    "cluster_name": "teleport.cluster_name",
+    "proxy_addr": "teleport.proxy_addr",
+    "cluster_namespace": "teleport.cluster_namespace",
+    "agent_namespace": "teleport.agent_namespace",
+    "namespace": "kubernetes.namespace",
+}
+
+
+def fleet_clusters(config: Dict) -> List[Dict]:
+    """The `clusters:` entries of a config (empty when running against a single cluster)"""
+    clusters = config.get("clusters") or []
+    if not isinstance(clusters, list):
+        print_error("clusters in config.yaml must be a list")
+        sys.exit(1)
+    for entry in clusters:
+        if not isinstance(entry, dict) or not entry.get("context"):
+            print_error(f"Every clusters entry needs a kube context: {entry}")
+            sys.exit(1)
+    return clusters
+
+
+def cluster_label(entry: Dict) -> str:
+    return str(entry.get("name") or entry.get("cluster_name") or entry["context"])
+
+
+def cluster_config(config: Dict, entry: Dict) -> Dict:
+    """The base config with one cluster's overrides applied (and no clusters list)"""
+    merged = copy.deepcopy(config)
+    merged.pop("clusters", None)
+    for key, path in OVERRIDES.items():
+        if key in entry:
+            section, name = path.split(".")
+            merged.setdefault(section, {})[name] = entry[key]
+    return merged
+
+
+def prepare_cluster(config: Dict, entry: Dict) -> Optional[Dict]:
+    """Write the cluster's config file and minified kubeconfig; return its worker environment"""
+    label = cluster_label(entry)
+    workdir = get_state_dir() / "fleet" / label
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    exit_code, kubeconfig, stderr = run_cmd([
+        "kubectl", "config", "view", "--minify", "--flatten", "--context", entry["context"]
+    ], check=False)
+    if exit_code != 0 or not kubeconfig:
+        print_error(f"{label}: could not export kube context {entry['context']}: {stderr}")
+        return None
+    kubeconfig_path = workdir / "kubeconfig"
+    fd = os.open(kubeconfig_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(kubeconfig + "\n")
+
+    merged = cluster_config(config, entry)
+    config_path = workdir / "config.yaml"
+    with open(config_path, "w") as f:
+        load_yaml().safe_dump(merged, f, default_flow_style=False)
+
+    env = {
+        "KUBECONFIG": str(kubeconfig_path),
+        CONFIG_PATH_ENV: str(config_path),
+    }
+    proxy = get_config_value(merged, "teleport.proxy_addr", "").strip()
+    if proxy:
+        env["TELEPORT_PROXY"] = proxy.replace("https://", "").replace("http://", "")
+    return env
+
+
+def _run_command(command: str, options: Dict):
+    """Dispatch one command inside a worker process"""
+    if command == "deploy":
+        from deploy import main as deploy_main
+        deploy_main(profile=options.get("profile", False), sequential=options.get("sequential", False),
+                    force_upgrade=options.get("force_upgrade", False), resume=options.get("resume", False),
+                    render=options.get("render"))
+    elif command == "clean":
+        from clean import main as clean_main
+        clean_main()
+    elif command == "status":
+        from utils.status import show_status
+        show_status(json_output=options.get("json_output", False))
+
+
+def _cluster_options(options: Dict, label: str) -> Dict:
+    """Per-cluster command options (each cluster renders into its own subdirectory)"""
+    if options.get("render"):
+        return dict(options, render=str(Path(options["render"]) / label))
+    return options
+
+
+def _run_cluster(label: str, command: str, options: Dict, env: Dict[str, str], log_path: str) -> Dict:
+    """Worker process entry point: run a command for one cluster with its output captured to a log"""
+    os.environ.update(env)
+    start = time.monotonic()
+    exit_code = 0
+    with open(log_path, "w") as log:
+        # Redirect at the fd level so kubectl/helm output is captured too
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            _run_command(command, options)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException as e:
+            print(f"❌ Fatal error: {e}")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+    return {"label": label, "exit_code": exit_code, "duration": time.monotonic() - start, "log": log_path}
+
+
+def _run_job(job: tuple) -> Dict:
+    return _run_cluster(*job)
+
+
+def run_fleet(command: str, options: Dict, only: Optional[List[str]] = None,
+              parallelism: int = DEFAULT_PARALLELISM) -> bool:
+    """Run a command against every configured cluster; returns True if all succeeded"""
+    config = read_config()
+    clusters = fleet_clusters(config)
+    if only:
+        clusters = [c for c in clusters if cluster_label(c) in only or c["context"] in only]
+        if not clusters:
+            print_error(f"No configured cluster matches: {', '.join(only)}")
+            sys.exit(1)
+
+    print_step(f"🌐 Running {command} on {len(clusters)} cluster(s), {parallelism} at a time...")
+    results: List[Dict] = []
+    jobs = []
+    for entry in clusters:
+        label = cluster_label(entry)
+        env = prepare_cluster(config, entry)
+        if env is None:
+            results.append({"label": label, "exit_code": 1, "duration": 0.0, "log": None})
+            continue
+        log_path = str(get_state_dir() / "fleet" / label / f"{command}.log")
+        jobs.append((label, env, log_path))
+
+    # One fresh process per cluster: no module-level caches (API client, pod index) leak between them.
+    # Spawned rather than forked, so no executor threads or open connections are inherited
+    jobs = [(label, command, _cluster_options(options, label), env, log_path) for label, env, log_path in jobs]
+    with multiprocessing.get_context("spawn").Pool(processes=parallelism, maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(_run_job, jobs):
+            results.append(result)
+            _print_cluster_output(result)
+
+    _print_summary(command, clusters, results)
+    return all(r["exit_code"] == 0 for r in results)
+
+
+def _print_cluster_output(result: Dict):
+    """Print one cluster's captured output as a single block"""
+    marker = "✅" if result["exit_code"] == 0 else "❌"
+    print()
+    print(f"{Colors.BOLD}{marker} ===== {result['label']} ({result['duration']:.1f}s) ====={Colors.ENDC}")
+    if result["log"] and Path(result["log"]).exists():
+        with open(result["log"], "r", errors="replace") as f:
+            for line in f:
+                sys.stdout.write(f"{Colors.HEADER}[{result['label']}]{Colors.ENDC} {line}")
+    sys.stdout.flush()
+
+
+def _print_summary(command: str, clusters: List[Dict], results: List[Dict]):
+    contexts = {cluster_label(c): c["context"] for c in clusters}
+    order = [cluster_label(c) for c in clusters]
+    results = sorted(results, key=lambda r: order.index(r["label"]))
+    width = max([len("CLUSTER")] + [len(r["label"]) for r in results])
+    ctx_width = max([len("CONTEXT")] + [len(contexts[r["label"]]) for r in results])
+
+    print()
+    print_step(f"📊 Fleet {command} summary:")
+    print(f"  {'CLUSTER':<{width}}  {'CONTEXT':<{ctx_width}}  {'RESULT':<10}  {'DURATION':>8}  LOG")
+    for r in results:
+        status = "ok" if r["exit_code"] == 0 else f"failed ({r['exit_code']})"
+        print(f"  {r['label']:<{width}}  {contexts[r['label']]:<{ctx_width}}  {status:<10}  "
+              f"{r['duration']:>7.1f}s  {r['log'] or '-'}")
+    failed = [r for r in results if r["exit_code"] != 0]
+    print()
+    if failed:
+        print_warning(f"{len(failed)} of {len(results)} cluster(s) failed")
+    else:
+        print_success(f"All {len(results)} cluster(s) succeeded")
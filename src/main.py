@@ -4,13 +4,86 @@ Main Entry Point
 
 This is the main entry point for the Kubernetes Dashboard Manager with Teleport.
 Handles deployment, cleanup, and utility commands.
+
+Commands are looked up in COMMANDS and their modules imported only when
+they run, so e.g. `get-clusterip` doesn't load the deploy pipeline.
 """
 
+import importlib
 import sys
-from deploy import main as deploy_main
-from clean import main as clean_main
-from utils import get_tokens, get_clusterip, show_status, show_helm_status, show_logs
-from deploy.common import print_error
+from deploy.common import print_error, read_config
+
+# Command -> "module:function", imported on dispatch
+COMMANDS = {
+    "deploy": "deploy:main",
+    "clean": "clean:main",
+    "get-tokens": "utils:get_tokens",
+    "get-clusterip": "utils:get_clusterip",
+    "status": "utils.status:show_status",
+    "helm-status": "utils:show_helm_status",
+    "logs": "utils:show_logs",
+    "startup-bench": "utils.startup:startup_bench",
+    "bench": "bench:run_bench",
+    "config": "utils.config:export_config",
+    "tokens": "deploy.tokens:prune_tokens",
+    "port-forward": "deploy.portforward:port_forward_command",
+}
+
+# Commands that run per cluster when `clusters:` is configured
+FLEET_COMMANDS = ("deploy", "clean", "status")
+
+
+def load_command(command):
+    """Import a command's module and return its entry point"""
+    module, function = COMMANDS[command].split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def flag_value(args, flag, default=None):
+    """Value following a flag (e.g. --tail 50), or default when the flag or its value is missing"""
+    if flag not in args:
+        return default
+    index = args.index(flag)
+    if index + 1 < len(args) and not args[index + 1].startswith("--"):
+        return args[index + 1]
+    return default
+
+
+def render_dir(args):
+    """DIR of deploy --render DIR, or None without --render; exits if DIR is missing rather than deploying"""
+    if "--render" not in args:
+        return None
+    directory = flag_value(args, "--render")
+    if not directory:
+        print("❌ --render takes an output directory")
+        sys.exit(1)
+    return directory
+
+
+def run_fleet_command(command, args):
+    """Run deploy/clean/status on every cluster in config.yaml's clusters list; False if none are configured"""
+    if command not in FLEET_COMMANDS:
+        return False
+    from fleet import DEFAULT_PARALLELISM, fleet_clusters, run_fleet
+    if not fleet_clusters(read_config()):
+        return False
+    parallel = flag_value(args, "--parallel", str(DEFAULT_PARALLELISM))
+    if not parallel.isdigit() or int(parallel) < 1:
+        print("❌ --parallel takes a number of clusters")
+        sys.exit(1)
+    only = flag_value(args, "--cluster")
+    options = {
+        "profile": "--profile" in args,
+        "sequential": "--sequential" in args,
+        "force_upgrade": "--force-upgrade" in args,
+        "resume": "--resume" in args,
+        "render": render_dir(args),
+        "json_output": "--json" in args,
+    }
+    ok = run_fleet(command, options, only=only.split(",") if only else None, parallelism=int(parallel))
+    if not ok:
+        sys.exit(1)
+    return True
 
 
 def main():
@@ -18,7 +91,9 @@ def main():
     # If no arguments, default to deployment
     if len(sys.argv) == 1:
         try:
-            deploy_main()
+            if run_fleet_command("deploy", []):
+                return
+            load_command("deploy")()
         except KeyboardInterrupt:
             print("\n⚠️  Deployment interrupted by user")
             sys.exit(130)
@@ -29,33 +104,128 @@ def main():
     
     # Get command from first argument
     command = sys.argv[1]
+    args = sys.argv[2:]
     
     try:
+        if run_fleet_command(command, args):
+            return
         if command == "deploy":
-            deploy_main()
+            load_command("deploy")(profile="--profile" in args, sequential="--sequential" in args,
+                                   force_upgrade="--force-upgrade" in args, resume="--resume" in args,
+                                   render=render_dir(args))
         elif command == "clean":
-            clean_main()
+            load_command("clean")()
         elif command == "get-tokens":
-            get_tokens()
+            load_command("get-tokens")()
         elif command == "get-clusterip":
-            get_clusterip()
+            load_command("get-clusterip")()
         elif command == "status":
-            show_status()
+            load_command("status")(json_output="--json" in args, watch="--watch" in args)
         elif command == "helm-status":
-            show_helm_status()
+            load_command("helm-status")()
         elif command == "logs":
-            show_logs()
+            tail = flag_value(args, "--tail")
+            context = flag_value(args, "--context", "0")
+            segment_mb = flag_value(args, "--segment-size")
+            if (tail is not None and not tail.isdigit()) or not context.isdigit():
+                print("❌ --tail and --context take a number of lines")
+                sys.exit(1)
+            try:
+                segment_mb = float(segment_mb) if segment_mb is not None else None
+            except ValueError:
+                print("❌ --segment-size takes a size in MiB")
+                sys.exit(1)
+            load_command("logs")(
+                follow=flag_value(args, "--follow", "all") if "--follow" in args else None,
+                component=flag_value(args, "--component"),
+                grep=flag_value(args, "--grep"),
+                level=flag_value(args, "--level"),
+                since=flag_value(args, "--since"),
+                tail=int(tail) if tail is not None else None,
+                context=int(context),
+                no_follow="--no-follow" in args,
+                archive=flag_value(args, "--archive"),
+                search=flag_value(args, "--search"),
+                compress=flag_value(args, "--compress", "gzip"),
+                segment_mb=segment_mb,
+            )
+        elif command == "config":
+            if not args or args[0] != "export":
+                print("❌ Usage: python3 src/main.py config export [--output FILE] [--force]")
+                sys.exit(1)
+            load_command("config")(output=flag_value(args, "--output"), force="--force" in args)
+        elif command == "port-forward":
+            action = args[0] if args else "status"
+            if action not in ("start", "status", "stop", "serve"):
+                print("❌ Usage: python3 src/main.py port-forward [start|status|stop]")
+                sys.exit(1)
+            load_command("port-forward")(action)
+        elif command == "tokens":
+            if not args or args[0] != "prune":
+                print("❌ Usage: python3 src/main.py tokens prune")
+                sys.exit(1)
+            load_command("tokens")()
+        elif command == "startup-bench":
+            runs = flag_value(args, "--runs", "5")
+            if not runs.isdigit() or int(runs) < 1:
+                print("❌ --runs takes a number of runs")
+                sys.exit(1)
+            load_command("startup-bench")(list(COMMANDS), runs=int(runs))
+        elif command == "bench":
+            runs = flag_value(args, "--runs", "3")
+            seed = flag_value(args, "--seed", "0")
+            if not runs.isdigit() or int(runs) < 1 or not seed.isdigit():
+                print("❌ --runs takes a number of runs and --seed a number")
+                sys.exit(1)
+            try:
+                pod_ready = float(flag_value(args, "--pod-ready", "1"))
+                max_regression = flag_value(args, "--max-regression")
+                max_regression = float(max_regression) if max_regression is not None else None
+            except ValueError:
+                print("❌ --pod-ready takes seconds and --max-regression a percentage")
+                sys.exit(1)
+            backend = flag_value(args, "--backend", "native")
+            if backend not in ("native", "kubectl"):
+                print("❌ --backend takes native or kubectl")
+                sys.exit(1)
+            load_command("bench")(runs=int(runs), latency=flag_value(args, "--latency"),
+                                  failures=flag_value(args, "--failures"), pod_ready=pod_ready, seed=int(seed),
+                                  max_regression=max_regression, keep="--keep" in args, backend=backend)
         else:
             print(f"❌ Unknown command: {command}")
             print()
             print("Available commands:")
             print("  deploy        - Deploy Teleport, Dashboard, and Agent (default)")
+            print("                  --profile: print step/command timings and write a Chrome trace")
+            print("                  --sequential: run deploy steps one at a time")
+            print("                  --force-upgrade: run helm upgrade even if values and chart are unchanged")
+            print("                  --resume: skip steps the deploy journal shows completed and still valid")
+            print("                  --render DIR: write all manifests (helm template + k8s/) without a cluster")
             print("  clean         - Clean up all deployed resources")
             print("  get-tokens    - Get dashboard access tokens")
             print("  get-clusterip - Get dashboard ClusterIP")
             print("  status        - Show overall status")
+            print("                  --json: print the status snapshot as JSON")
+            print("                  --watch: keep the status current from watch streams")
             print("  helm-status   - Show Helm deployment status")
             print("  logs          - Interactive menu to view logs")
+            print("                  --follow [all|auth|proxy|agent|dashboard]: stream every matching pod")
+            print("                  --component C, --since 10m, --tail N, --grep REGEX, --level warn,")
+            print("                  --context N, --no-follow: filter streamed logs")
+            print("                  --archive DIR [--compress gzip|zstd] [--segment-size MB]: capture all logs")
+            print("                  --search DIR [--grep REGEX] [--level L] [--since 1h]: search an archive")
+            print("  config export - Write config.yaml's resolved values as make variables (.state/config.mk)")
+            print("                  --output FILE, --force: rewrite even if config.yaml is unchanged")
+            print("  port-forward  - Supervised Teleport port-forward (reconnects when the pods restart)")
+            print("                  start | status (default; connections, reconnects) | stop")
+            print("  tokens prune  - Revoke join tokens deploy minted and no longer uses, forget expired ones")
+            print("  startup-bench - Measure CLI import time per command")
+            print("                  --runs N: fresh interpreters per command (default 5)")
+            print("  bench         - Run deploy/status/get-tokens/clean end to end against simulated kubectl/helm/tctl")
+            print("                  --runs N (default 3), --latency 'kubectl=0.05,helm upgrade=1',")
+            print("                  --failures 'kubectl get=0.1', --pod-ready SECONDS, --seed N,")
+            print("                  --max-regression PCT: fail if slower than the last run, --keep: keep logs,")
+            print("                  --backend native|kubectl: read via the fake API server (default) or kubectl")
             print()
             print("Usage:")
             print("  python3 src/main.py [command]")
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Utility functions for various operations
+
+Submodules (status, logs, archive) and the kube client are imported inside
+the commands that use them to keep CLI startup fast.
 """
 
 import sys
@@ -12,6 +15,13 @@ from deploy.common import (
 )
 
 
+def _secret_token(namespace, name):
+    """Return the base64 .data.token of a secret, or None"""
+    from deploy.kube import kube_get
+    secret = kube_get("secrets", name, namespace) or {}
+    return (secret.get("data") or {}).get("token")
+
+
 def get_tokens():
     """Get dashboard access tokens"""
     print("🔑 Dashboard Access Tokens:")
@@ -25,13 +35,9 @@ def get_tokens():
     
     # Get admin token
     print("Admin Token (for dashboard login):")
-    exit_code, token_output, _ = run_cmd([
-        "kubectl", "get", "secret", "dashboard-token",
-        "-n", k8s_ns,
-        "-o", "jsonpath={.data.token}"
-    ], check=False)
+    token_output = _secret_token(k8s_ns, "dashboard-token")
     
-    if exit_code == 0 and token_output:
+    if token_output:
         try:
             token = base64.b64decode(token_output).decode('utf-8')
             print(token)
@@ -47,13 +53,9 @@ def get_tokens():
     
     # Get readonly token
     print("Read-only Token:")
-    exit_code, readonly_output, _ = run_cmd([
-        "kubectl", "get", "secret", "dashboard-readonly-token",
-        "-n", k8s_ns,
-        "-o", "jsonpath={.data.token}"
-    ], check=False)
+    readonly_output = _secret_token(k8s_ns, "dashboard-readonly-token")
     
-    if exit_code == 0 and readonly_output:
+    if readonly_output:
         try:
             readonly_token = base64.b64decode(readonly_output).decode('utf-8')
             print(readonly_token)
@@ -72,13 +74,11 @@ def get_clusterip():
     config = read_config()
     k8s_ns = get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard")
     
-    exit_code, clusterip, _ = run_cmd([
-        "kubectl", "-n", k8s_ns,
-        "get", "svc", "kubernetes-dashboard",
-        "-o", "jsonpath={.spec.clusterIP}"
-    ], check=False)
+    from deploy.kube import kube_get
+    service = kube_get("services", "kubernetes-dashboard", k8s_ns) or {}
+    clusterip = (service.get("spec") or {}).get("clusterIP")
     
-    if exit_code == 0 and clusterip:
+    if clusterip:
         print(clusterip)
     else:
         print_warning("Service not found")
@@ -86,64 +86,6 @@ def get_clusterip():
     print()
 
 
-def show_status():
-    """Show overall status"""
-    print("📊 Overall Status:")
-    print()
-    
-    config = read_config()
-    k8s_ns = get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard")
-    agent_ns = get_config_value(config, "teleport.agent_namespace", "teleport-agent")
-    
-    print("Namespaces:")
-    exit_code, _, _ = run_cmd([
-        "kubectl", "get", "namespaces"
-    ], check=False)
-    
-    if exit_code == 0:
-        # Filter output
-        exit_code, output, _ = run_cmd([
-            "kubectl", "get", "namespaces", "-o", "name"
-        ], check=False)
-        if output:
-            for ns in output.strip().split('\n'):
-                if k8s_ns in ns or agent_ns in ns:
-                    print(f"  {ns}")
-    else:
-        print_warning("  No namespaces found")
-    
-    print()
-    print(f"Pods in {k8s_ns}:")
-    exit_code, _, _ = run_cmd([
-        "kubectl", "get", "pods", "-n", k8s_ns
-    ], check=False)
-    
-    if exit_code != 0:
-        print_warning("  No pods found")
-    
-    print()
-    print(f"Pods in {agent_ns}:")
-    exit_code, _, _ = run_cmd([
-        "kubectl", "get", "pods", "-n", agent_ns
-    ], check=False)
-    
-    if exit_code != 0:
-        print_warning("  No pods found")
-    
-    print()
-    print("Services:")
-    exit_code, output, _ = run_cmd([
-        "kubectl", "get", "svc", "-n", k8s_ns
-    ], check=False)
-    
-    if exit_code == 0 and "kubernetes-dashboard" in output:
-        for line in output.split('\n'):
-            if "kubernetes-dashboard" in line:
-                print(f"  {line}")
-    else:
-        print_warning("  No services found")
-
-
 def show_helm_status():
     """Show Helm deployment status"""
     print("📊 Helm Deployment Status:")
@@ -175,36 +117,6 @@ def show_helm_status():
         print(output)
 
 
-def _find_pod_by_labels(namespace, labels_list):
-    """Try multiple label selectors to find a pod"""
-    for labels in labels_list:
-        exit_code, pod, _ = run_cmd([
-            "kubectl", "-n", namespace,
-            "get", "pods",
-            "-l", labels,
-            "-o", "jsonpath={.items[0].metadata.name}"
-        ], check=False)
-        if exit_code == 0 and pod:
-            return pod
-    return None
-
-
-def _find_pod_by_name_pattern(namespace, pattern):
-    """Fallback: find pod by name pattern"""
-    exit_code, output, _ = run_cmd([
-        "kubectl", "-n", namespace,
-        "get", "pods",
-        "-o", "jsonpath={.items[*].metadata.name}"
-    ], check=False)
-    
-    if exit_code == 0 and output:
-        pods = output.split()
-        for pod in pods:
-            if pattern in pod:
-                return pod
-    return None
-
-
 def _stream_logs(namespace, pod):
     """Stream kubectl logs directly to terminal (doesn't capture output)"""
     process = None
@@ -237,10 +149,36 @@ def _stream_logs(namespace, pod):
         return 1
 
 
-def show_logs():
-    """Interactive menu to view logs"""
+def show_logs(follow=None, component=None, grep=None, level=None, since=None, tail=None, context=0,
+              no_follow=False, archive=None, search=None, compress="gzip", segment_mb=None):
+    """
+    Interactive menu to view logs.
+
+    Any of follow/component/grep/level/since/tail skips the menu and streams
+    the selected components ("all" or a comma-separated list) directly.
+    archive captures every component's logs into DIR; search scans such an archive.
+    """
+    from deploy.podindex import get_pod_index
+    from .archive import capture_archive, search_archive
+    from .logs import build_filter, follow_logs, find_component_pods, parse_components
+    
+    if search:
+        search_archive(search, build_filter(grep, level, context), parse_components(component), since)
+        return
+    
     config = read_config()
     
+    if archive:
+        capture_archive(config, archive, parse_components(component or follow), since=since, tail=tail,
+                        compression=compress, segment_bytes=int(segment_mb * 1024 * 1024) if segment_mb else None)
+        return
+    
+    if follow or component or grep or level or since or tail is not None or no_follow:
+        components = parse_components(component or follow)
+        follow_logs(config, components, build_filter(grep, level, context), since=since, tail=tail,
+                    follow=not no_follow)
+        return
+    
     # Determine if we're in local or enterprise mode
     proxy_addr = get_config_value(config, "teleport.proxy_addr", "")
     is_local_mode = not proxy_addr or proxy_addr.strip() == ""
@@ -254,7 +192,7 @@ def show_logs():
         print("  2) Teleport Proxy")
         print("  3) Teleport Agent")
         print("  4) Kubernetes Dashboard")
-        print("  5) All (show status of all components)")
+        print("  5) All (follow logs of every pod of every component)")
         print()
         try:
             choice = input("Select an option (1-5): ").strip()
@@ -266,7 +204,7 @@ def show_logs():
         # Enterprise mode: show Agent, Dashboard, All only
         print("  1) Teleport Agent")
         print("  2) Kubernetes Dashboard")
-        print("  3) All (show status of all components)")
+        print("  3) All (follow logs of every pod of every component)")
         print()
         try:
             choice = input("Select an option (1-3): ").strip()
@@ -296,21 +234,12 @@ def show_logs():
         print("📋 Following Teleport Auth Server Logs (Press Ctrl-C to exit):")
         print()
         
-        # Try multiple label selectors
-        pod = _find_pod_by_labels(cluster_ns, [
-            "app.kubernetes.io/name=teleport-cluster,app.kubernetes.io/component=auth",
-            "app.kubernetes.io/component=auth"
-        ])
-        
-        # Fallback to name pattern
-        if not pod:
-            pod = _find_pod_by_name_pattern(cluster_ns, "auth")
+        # Label selectors first, then the pod name pattern
+        pod = next(iter(find_component_pods(config, "auth")), None)
         
         # Try legacy namespace
         if not pod:
-            pod = _find_pod_by_labels("teleport", [
-                "app=teleport,component=server"
-            ])
+            pod = get_pod_index().first("teleport", ["app=teleport,component=server"])
         
         if pod:
             print_info(f"📦 Auth Pod: {pod}")
@@ -337,15 +266,8 @@ def show_logs():
         print("📋 Following Teleport Proxy Logs (Press Ctrl-C to exit):")
         print()
         
-        # Try multiple label selectors
-        pod = _find_pod_by_labels(cluster_ns, [
-            "app.kubernetes.io/name=teleport-cluster,app.kubernetes.io/component=proxy",
-            "app.kubernetes.io/component=proxy"
-        ])
-        
-        # Fallback to name pattern
-        if not pod:
-            pod = _find_pod_by_name_pattern(cluster_ns, "proxy")
+        # Label selectors first, then the pod name pattern
+        pod = next(iter(find_component_pods(config, "proxy")), None)
         
         if pod:
             print_info(f"📦 Proxy Pod: {pod}")
@@ -366,15 +288,8 @@ def show_logs():
         print("📋 Following Teleport Kube Agent Logs (Press Ctrl-C to exit):")
         print()
         
-        # Try multiple label selectors
-        pod = _find_pod_by_labels(agent_ns, [
-            "app.kubernetes.io/name=teleport-kube-agent",
-            "app=teleport-kube-agent"
-        ])
-        
-        # Fallback to name pattern
-        if not pod:
-            pod = _find_pod_by_name_pattern(agent_ns, "teleport-agent")
+        # Label selectors first, then the pod name pattern
+        pod = next(iter(find_component_pods(config, "agent")), None)
         
         if pod:
             print_info(f"📦 Pod: {pod}")
@@ -395,15 +310,8 @@ def show_logs():
         print("📋 Following Kubernetes Dashboard Logs (Press Ctrl-C to exit):")
         print()
         
-        # Try multiple label selectors
-        pod = _find_pod_by_labels(k8s_ns, [
-            "app.kubernetes.io/name=kubernetes-dashboard",
-            "app=kubernetes-dashboard"
-        ])
-        
-        # Fallback to name pattern
-        if not pod:
-            pod = _find_pod_by_name_pattern(k8s_ns, "kubernetes-dashboard")
+        # Label selectors first, then the pod name pattern
+        pod = next(iter(find_component_pods(config, "dashboard")), None)
         
         if pod:
             print_info(f"📦 Pod: {pod}")
@@ -421,54 +329,9 @@ def show_logs():
     
     elif choice == "5":
         print()
-        print("📊 All Components Status:")
-        print()
-        
-        if is_local_mode:
-            # Local mode: show Auth, Proxy, Agent, Dashboard
-            print("=== Teleport Auth Server ===")
-            exit_code, output, _ = run_cmd([
-                "kubectl", "get", "pods", "-n", cluster_ns,
-                "-l", "app.kubernetes.io/component=auth"
-            ], check=False)
-            if output:
-                print(output)
-            else:
-                print("  (no pods found)")
-            
-            print()
-            print("=== Teleport Proxy ===")
-            exit_code, output, _ = run_cmd([
-                "kubectl", "get", "pods", "-n", cluster_ns,
-                "-l", "app.kubernetes.io/component=proxy"
-            ], check=False)
-            if output:
-                print(output)
-            else:
-                print("  (no pods found)")
-        else:
-            # Enterprise mode: skip Auth and Proxy (not deployed locally)
+        if not is_local_mode:
             print_info("ℹ️  Teleport Auth Server and Proxy are managed by Teleport Enterprise/Cloud")
-            print()
-        
-        print("=== Teleport Agent ===")
-        exit_code, output, _ = run_cmd([
-            "kubectl", "get", "pods", "-n", agent_ns
-        ], check=False)
-        if output:
-            print(output)
-        else:
-            print("  (no pods found)")
-        
-        print()
-        print("=== Kubernetes Dashboard ===")
-        exit_code, output, _ = run_cmd([
-            "kubectl", "get", "pods", "-n", k8s_ns
-        ], check=False)
-        if output:
-            print(output)
-        else:
-            print("  (no pods found)")
+        follow_logs(config)
     
     else:
         print()
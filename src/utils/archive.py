@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Log archives for incident reviews
+
+`logs --archive DIR` captures the logs of every pod of every component -
+current and previous containers - in parallel into compressed, size-capped
+segments. Each segment is a sequence of independently compressed blocks
+(gzip members or zstd frames, so `zcat`/`zstdcat` still read the whole file)
+with a small JSON index recording each block's offset, line count, time
+range and log levels.
+
+`logs --search DIR` memory-maps the segments and uses the index to
+decompress only the blocks that can match (time range, level), one block
+at a time.
+"""
+
+import gzip
+import json
+import mmap
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from deploy.common import Colors, print_error, print_info, print_success, print_warning
+from .logs import COMPONENTS, LEVELS, LogFilter, available_components, component_namespace, component_pods, parse_level
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Uncompressed bytes per independently compressed block
+BLOCK_BYTES = 256 * 1024
+# Compressed bytes per segment file before rotating to the next one
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+# Concurrent kubectl logs captures
+CAPTURE_WORKERS = 8
+
+EXTENSIONS = {"gzip": ".log.gz", "zstd": ".log.zst"}
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)([smhd])")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds in a kubectl-style duration such as 30s, 10m or 1h30m"""
+    parts = _DURATION.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        raise ValueError(f"Invalid duration: {text}")
+    return sum(float(n) * _UNITS[u] for n, u in parts)
+
+
+def _compress(compression: str, data: bytes) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(compression: str, data: bytes) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class SegmentWriter:
+    """Writes one log stream as rotating segments of compressed blocks plus an index per segment"""
+    def __init__(self, base: Path, compression: str, segment_bytes: int, meta: Dict):
+        self.base = base
+        self.compression = compression
+        self.segment_bytes = segment_bytes
+        self.meta = meta
+        self.segments: List[str] = []
+        self.lines = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self._file = None
+        self._blocks: List[Dict] = []
+        self._offset = 0
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._block_meta = None
+
+    def _open_segment(self):
+        path = self.base.with_name(f"{self.base.name}.{len(self.segments):03d}{EXTENSIONS[self.compression]}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "wb")
+        self._blocks = []
+        self._offset = 0
+        self.segments.append(str(path))
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        index = dict(self.meta, compression=self.compression, blocks=self._blocks)
+        with open(self.segments[-1] + ".idx.json", "w") as f:
+            json.dump(index, f)
+
+    def write_line(self, line: bytes):
+        text = line.decode("utf-8", "replace")
+        timestamp = text.split(" ", 1)[0]
+        if self._block_meta is None:
+            self._block_meta = {"first_line": self.lines, "first_ts": timestamp, "levels": set()}
+        self._block_meta["last_ts"] = timestamp
+        level = parse_level(text)
+        if level:
+            self._block_meta["levels"].add(level)
+        self._buffer.append(line if line.endswith(b"\n") else line + b"\n")
+        self._buffered += len(line)
+        self.lines += 1
+        if self._buffered >= BLOCK_BYTES:
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._buffer:
+            return
+        raw = b"".join(self._buffer)
+        data = _compress(self.compression, raw)
+        if self._file is None or (self._offset and self._offset + len(data) > self.segment_bytes):
+            self._close_segment()
+            self._open_segment()
+        self._file.write(data)
+        meta = self._block_meta
+        self._blocks.append({
+            "offset": self._offset,
+            "length": len(data),
+            "first_line": meta["first_line"],
+            "lines": self.lines - meta["first_line"],
+            "first_ts": meta["first_ts"],
+            "last_ts": meta["last_ts"],
+            "levels": sorted(meta["levels"], key=LEVELS.get),
+        })
+        self._offset += len(data)
+        self.raw_bytes += len(raw)
+        self.compressed_bytes += len(data)
+        self._buffer = []
+        self._buffered = 0
+        self._block_meta = None
+
+    def close(self):
+        self._flush_block()
+        self._close_segment()
+
+
+def _capture_stream(directory: Path, job: Dict, since: Optional[str], tail: Optional[int],
+                    compression: str, segment_bytes: int) -> Dict:
+    """Run kubectl logs for one container (current or previous) and archive its output"""
+    cmd = ["kubectl", "logs", "-n", job["namespace"], job["pod"], "-c", job["container"], "--timestamps"]
+    if job["previous"]:
+        cmd.append("--previous")
+    if since:
+        cmd.append(f"--since={since}")
+    if tail is not None:
+        cmd.append(f"--tail={tail}")
+
+    name = job["container"] + (".previous" if job["previous"] else "")
+    writer = SegmentWriter(directory / job["component"] / job["pod"] / name, compression, segment_bytes, dict(job))
+    # stderr goes to a temporary file: a full stderr pipe would block kubectl while we read stdout
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+        for line in process.stdout:
+            writer.write_line(line)
+        process.wait()
+        errors.seek(0)
+        stderr = errors.read().decode("utf-8", "replace").strip()
+    writer.close()
+    return dict(job, segments=writer.segments, lines=writer.lines, raw_bytes=writer.raw_bytes,
+                compressed_bytes=writer.compressed_bytes, exit_code=process.returncode, error=stderr)
+
+
+def capture_archive(config: Dict, directory: str, components: Optional[List[str]] = None,
+                    since: Optional[str] = None, tail: Optional[int] = None, compression: str = "gzip",
+                    segment_bytes: Optional[int] = None):
+    """Capture logs of all pods (current and previous containers) of the components into directory"""
+    if compression not in EXTENSIONS:
+        print_error(f"Unknown compression: {compression} (use gzip or zstd)")
+        sys.exit(1)
+    if compression == "zstd" and zstandard is None:
+        print_error("zstd compression needs the zstandard package (pip install zstandard)")
+        sys.exit(1)
+    components = components or available_components(config)
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    for component in components:
+        namespace = component_namespace(config, component)
+        for pod in component_pods(config, component):
+            for status in (pod.get("status") or {}).get("containerStatuses") or []:
+                job = {"component": component, "namespace": namespace, "pod": pod["metadata"]["name"],
+                       "container": status["name"], "previous": False}
+                if "waiting" not in (status.get("state") or {}):
+                    jobs.append(job)
+                if status.get("restartCount") or "terminated" in (status.get("lastState") or {}):
+                    jobs.append(dict(job, previous=True))
+    if not jobs:
+        print_warning("No pods with logs found")
+        return
+
+    print_info(f"📦 Capturing {len(jobs)} log stream(s) into {root}...")
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=CAPTURE_WORKERS) as pool:
+        streams = list(pool.map(
+            lambda job: _capture_stream(root, job, since, tail, compression,
+                                        segment_bytes or DEFAULT_SEGMENT_BYTES), jobs))
+
+    for stream in streams:
+        stream["segments"] = [str(Path(s).relative_to(root)) for s in stream["segments"]]
+        if stream["exit_code"] != 0:
+            label = f"{stream['component']}/{stream['pod']}/{stream['container']}"
+            print_warning(f"{label}{' (previous)' if stream['previous'] else ''}: {stream['error'] or 'kubectl logs failed'}")
+    manifest = {
+        "captured_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "compression": compression,
+        "since": since,
+        "tail": tail,
+        "streams": streams,
+    }
+    with open(root / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    lines = sum(s["lines"] for s in streams)
+    raw = sum(s["raw_bytes"] for s in streams)
+    compressed = sum(s["compressed_bytes"] for s in streams)
+    ratio = f", {raw / compressed:.1f}x" if compressed else ""
+    print_success(f"Archived {lines} lines from {len(streams)} stream(s) in {time.monotonic() - start:.1f}s "
+                  f"({raw / 1024:.0f} KiB -> {compressed / 1024:.0f} KiB{ratio})")
+
+
+def search_archive(directory: str, log_filter: LogFilter, components: Optional[List[str]] = None,
+                   since: Optional[str] = None):
+    """Search an archive block by block, skipping blocks the index rules out"""
+    root = Path(directory)
+    manifest_path = root / "manifest.json"
+    if not manifest_path.exists():
+        print_error(f"No log archive found in {root} (missing manifest.json)")
+        sys.exit(1)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    cutoff = None
+    if since:
+        try:
+            cutoff = (datetime.now(timezone.utc) - timedelta(seconds=parse_duration(since))).strftime(
+                "%Y-%m-%dT%H:%M:%S")
+        except ValueError as e:
+            print_error(str(e))
+            sys.exit(1)
+
+    scanned = skipped = matches = 0
+    for stream in manifest["streams"]:
+        if components and stream["component"] not in components:
+            continue
+        color = COMPONENTS.get(stream["component"], {}).get("color", "")
+        prefix = (f"{color}{stream['component']}/{stream['pod']}/{stream['container']}"
+                  f"{' (previous)' if stream['previous'] else ''}{Colors.ENDC} | ")
+        stream_filter = log_filter.stream()
+        for segment in stream["segments"]:
+            path = root / segment
+            with open(str(path) + ".idx.json") as f:
+                index = json.load(f)
+            if not index["blocks"]:
+                continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for block in index["blocks"]:
+                    if cutoff and block["last_ts"][:19] < cutoff:
+                        skipped += 1
+                        continue
+                    if log_filter.min_level is not None and block["levels"] and \
+                            max(LEVELS[l] for l in block["levels"]) < log_filter.min_level:
+                        skipped += 1
+                        continue
+                    scanned += 1
+                    raw = _decompress(index["compression"], data[block["offset"]:block["offset"] + block["length"]])
+                    for line in raw.decode("utf-8", "replace").splitlines():
+                        if cutoff and line[:19] < cutoff:
+                            continue
+                        for out in stream_filter.feed(line):
+                            matches += 1
+                            sys.stdout.write(prefix + out + "\n")
+    sys.stdout.flush()
+    print()
+    print_info(f"🔎 {matches} line(s) from {scanned} block(s) scanned, {skipped} skipped via the index")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Config export for the Makefile
+
+`config export` resolves config.yaml with the same loader and defaults as
+the Python commands and writes the values as make variables to
+.state/config.mk, which the Makefile includes. The file records the
+config's mtime and is only rewritten when that changes.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from deploy.common import get_config_path, get_config_value, get_state_dir, read_config, print_info, print_success
+
+CONFIG_MK = "config.mk"
+
+# Bump when the exported variables change so stale files are rewritten
+EXPORT_VERSION = "1"
+
+# Make variable -> (config path, default)
+EXPORTS: List[Tuple[str, str, str]] = [
+    ("TELEPORT_PROXY_ADDR", "teleport.proxy_addr", ""),
+    ("TELEPORT_CLUSTER_NAME", "teleport.cluster_name", "minikube"),
+    ("TELEPORT_CLUSTER_NAMESPACE", "teleport.cluster_namespace", "teleport-cluster"),
+    ("TELEPORT_AGENT_NAMESPACE", "teleport.agent_namespace", "teleport-agent"),
+    ("K8S_NAMESPACE", "kubernetes.namespace", "kubernetes-dashboard"),
+]
+
+
+def _make_escape(value: str) -> str:
+    """Quote a value for a make variable assignment"""
+    return value.replace("\\", "\\\\").replace("$", "$$").replace("#", "\\#")
+
+
+def _recorded_stamp(path: Path) -> Optional[str]:
+    """The CONFIG_STAMP recorded in an existing export, or None"""
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith("CONFIG_STAMP ?= "):
+                    return line.split("?=", 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+
+def resolve_exports(config: Dict) -> Dict[str, str]:
+    """The make variables for a parsed config"""
+    values = {name: get_config_value(config, path, default) for name, path, default in EXPORTS}
+    values["DEPLOY_MODE"] = "enterprise" if values["TELEPORT_PROXY_ADDR"] else "local"
+    return values
+
+
+def export_config(output: Optional[str] = None, force: bool = False):
+    """Write the resolved config as make variables, unless config.yaml is unchanged since the last export"""
+    config_path = get_config_path()
+    path = Path(output) if output else get_state_dir() / CONFIG_MK
+
+    # Missing config.yaml exports the defaults (the Makefile's `config` target hasn't run yet)
+    exists = config_path.exists()
+    mtime = str(os.stat(config_path).st_mtime_ns) if exists else "missing"
+    stamp = _make_escape(f"{EXPORT_VERSION}:{config_path.resolve()}:{mtime}")
+    if not force and _recorded_stamp(path) == stamp:
+        print_info(f"⏭️  {path} is up to date")
+        return
+
+    values = resolve_exports((read_config() or {}) if exists else {})
+    lines = [
+        f"# Generated by `python src/main.py config export` from {config_path} - do not edit",
+        f"CONFIG_STAMP ?= {stamp}",
+    ]
+    lines += [f"{name} ?= {_make_escape(value)}" for name, value in values.items()]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+    print_success(f"Exported config to {path}")
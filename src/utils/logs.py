@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Concurrent log following across components and replicas
+
+Every pod of the selected components (auth, proxy, agent, dashboard) gets its
+own `kubectl logs -f` over an asyncio subprocess pipe, so one slow or quiet
+stream never holds up the others. Lines are printed with a colored
+`component/pod` prefix, and pods that appear later (rollouts, restarts,
+scale-ups) are picked up by periodic discovery.
+
+Filtering (--grep, --level) happens as lines stream: Teleport's text and JSON
+log lines are parsed for their level, patterns are compiled once, and context
+lines live in a fixed-size ring buffer per stream so memory stays flat no
+matter how much is streamed. --since/--tail are passed to kubectl so less is
+transferred in the first place.
+"""
+
+import asyncio
+import json
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from deploy.common import Colors, get_config_value, print_info, print_warning, print_error
+from deploy.podindex import get_pod_index
+
+# How often to look for new pods while following (seconds)
+DISCOVERY_INTERVAL = 5.0
+
+# component -> namespace config key, default namespace, label selectors (tried in order),
+# pod name fallback pattern, and whether it only exists in local mode
+COMPONENTS = {
+    "auth": {
+        "namespace_key": "teleport.cluster_namespace",
+        "namespace_default": "teleport-cluster",
+        "selectors": ["app.kubernetes.io/name=teleport-cluster,app.kubernetes.io/component=auth",
+                      "app.kubernetes.io/component=auth"],
+        "pattern": "auth",
+        "local_only": True,
+        "title": "Teleport Auth Server",
+        "color": Colors.HEADER,
+    },
+    "proxy": {
+        "namespace_key": "teleport.cluster_namespace",
+        "namespace_default": "teleport-cluster",
+        "selectors": ["app.kubernetes.io/name=teleport-cluster,app.kubernetes.io/component=proxy",
+                      "app.kubernetes.io/component=proxy"],
+        "pattern": "proxy",
+        "local_only": True,
+        "title": "Teleport Proxy",
+        "color": Colors.OKBLUE,
+    },
+    "agent": {
+        "namespace_key": "teleport.agent_namespace",
+        "namespace_default": "teleport-agent",
+        "selectors": ["app.kubernetes.io/name=teleport-kube-agent", "app=teleport-kube-agent"],
+        "pattern": "teleport-agent",
+        "local_only": False,
+        "title": "Teleport Kube Agent",
+        "color": Colors.OKGREEN,
+    },
+    "dashboard": {
+        "namespace_key": "kubernetes.namespace",
+        "namespace_default": "kubernetes-dashboard",
+        "selectors": ["app.kubernetes.io/name=kubernetes-dashboard", "app=kubernetes-dashboard"],
+        "pattern": "kubernetes-dashboard",
+        "local_only": False,
+        "title": "Kubernetes Dashboard",
+        "color": Colors.OKCYAN,
+    },
+}
+
+
+# Teleport log levels (text logs abbreviate some of them, e.g. DEBU/ERRO)
+LEVELS = {"trace": 0, "debug": 1, "info": 2, "warn": 3, "error": 4, "fatal": 5}
+_LEVEL_ALIASES = {"debu": "debug", "warning": "warn", "erro": "error", "fata": "fatal", "panic": "fatal",
+                  "panc": "fatal", "trac": "trace"}
+_KUBECTL_TIMESTAMP = re.compile(r"^\d{4}-\d\d-\d\dT\S+ (?=\S+ |\{)")
+_TEXT_LEVEL = re.compile(r"^\S*\s*\[?(TRACE|TRAC|DEBUG|DEBU|INFO|WARNING|WARN|ERROR|ERRO|FATAL|FATA|PANIC|PANC)\b\]?")
+
+
+def normalize_level(level: str) -> Optional[str]:
+    level = level.strip().lower()
+    level = _LEVEL_ALIASES.get(level, level)
+    return level if level in LEVELS else None
+
+
+def parse_level(line: str) -> Optional[str]:
+    """Level of a Teleport log line (text or JSON format), or None for continuation lines"""
+    # Lines captured with `kubectl logs --timestamps` carry an extra RFC 3339 prefix
+    line = _KUBECTL_TIMESTAMP.sub("", line, count=1)
+    if line.startswith("{"):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(entry, dict):
+            return normalize_level(str(entry.get("level") or entry.get("severity") or ""))
+        return None
+    match = _TEXT_LEVEL.match(line)
+    return normalize_level(match.group(1)) if match else None
+
+
+class LogFilter:
+    """Shared filter settings: a compiled --grep pattern, a minimum --level and context size"""
+    def __init__(self, grep: Optional[str] = None, level: Optional[str] = None, context: int = 0):
+        self.pattern = re.compile(grep) if grep else None
+        self.min_level = LEVELS[level] if level else None
+        self.context = context
+
+    @property
+    def active(self) -> bool:
+        return self.pattern is not None or self.min_level is not None
+
+    def stream(self) -> "StreamFilter":
+        return StreamFilter(self)
+
+
+class StreamFilter:
+    """Filter state for one log stream (level carry-over and context ring buffer)"""
+    def __init__(self, log_filter: LogFilter):
+        self.filter = log_filter
+        self.before: deque = deque(maxlen=log_filter.context)
+        self.after = 0
+        self.level: Optional[str] = None
+
+    def feed(self, line: str) -> List[str]:
+        """Return the lines to print for this input line (with any buffered context)"""
+        if not self.filter.active:
+            return [line]
+        # Continuation lines (stack traces, wrapped JSON) inherit the previous line's level
+        self.level = parse_level(line) or self.level
+        level_ok = (self.filter.min_level is None or
+                    (self.level is not None and LEVELS[self.level] >= self.filter.min_level))
+        matched = level_ok and (self.filter.pattern is None or self.filter.pattern.search(line) is not None)
+        if matched:
+            lines = list(self.before) + [line]
+            self.before.clear()
+            self.after = self.filter.context
+            return lines
+        if self.after > 0:
+            self.after -= 1
+            return [line]
+        self.before.append(line)
+        return []
+
+
+def is_local_mode(config: Dict) -> bool:
+    return not get_config_value(config, "teleport.proxy_addr", "").strip()
+
+
+def available_components(config: Dict) -> List[str]:
+    """Components deployed in-cluster for the configured mode"""
+    local = is_local_mode(config)
+    return [name for name, spec in COMPONENTS.items() if local or not spec["local_only"]]
+
+
+def component_namespace(config: Dict, component: str) -> str:
+    spec = COMPONENTS[component]
+    return get_config_value(config, spec["namespace_key"], spec["namespace_default"])
+
+
+def component_pods(config: Dict, component: str) -> List[Dict]:
+    """Pod objects of a component: the first label selector with matches, else the name pattern"""
+    spec = COMPONENTS[component]
+    return get_pod_index().find(component_namespace(config, component), spec["selectors"], spec["pattern"])
+
+
+def find_component_pods(config: Dict, component: str, started_only: bool = False) -> List[str]:
+    """
+    Names of all pods of a component.
+
+    With started_only, only Running pods are returned (pending pods have no logs yet).
+    """
+    pods = component_pods(config, component)
+    if started_only:
+        pods = [pod for pod in pods if (pod.get("status") or {}).get("phase") == "Running"]
+    return [pod["metadata"]["name"] for pod in pods]
+
+
+def parse_components(selection: Optional[str]) -> Optional[List[str]]:
+    """Turn "all" / "agent,dashboard" into a component list (None means all); exits on unknown names"""
+    if not selection or selection == "all":
+        return None
+    components = [c.strip() for c in selection.split(",") if c.strip()]
+    unknown = [c for c in components if c not in COMPONENTS]
+    if unknown:
+        print_error(f"Unknown component(s): {', '.join(unknown)}")
+        print_info(f"  Available: all, {', '.join(COMPONENTS)}")
+        sys.exit(1)
+    return components
+
+
+def build_filter(grep: Optional[str] = None, level: Optional[str] = None, context: int = 0) -> LogFilter:
+    """Validate --grep/--level and build a LogFilter; exits on bad input"""
+    if level and normalize_level(level) is None:
+        print_error(f"Unknown log level: {level}")
+        print_info(f"  Available: {', '.join(LEVELS)}")
+        sys.exit(1)
+    try:
+        return LogFilter(grep, normalize_level(level) if level else None, context)
+    except re.error as e:
+        print_error(f"Invalid --grep pattern: {e}")
+        sys.exit(1)
+
+
+class LogMultiplexer:
+    """Follows the logs of every pod of a set of components concurrently"""
+    def __init__(self, config: Dict, components: List[str], log_filter: Optional[LogFilter] = None,
+                 since: Optional[str] = None, tail: Optional[int] = None, follow: bool = True):
+        self.config = config
+        self.components = components
+        self.filter = log_filter or LogFilter()
+        self.since = since
+        self.tail = tail
+        self.follow_streams = follow
+        self.active: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.ended: Dict[Tuple[str, str], str] = {}   # (component, pod) -> RFC 3339 time its stream ended
+
+    def prefix(self, component: str, pod: str) -> str:
+        return f"{COMPONENTS[component]['color']}{component}/{pod}{Colors.ENDC} | "
+
+    def emit(self, component: str, pod: str, line: str):
+        sys.stdout.write(self.prefix(component, pod) + line + "\n")
+        sys.stdout.flush()
+
+    async def follow(self, component: str, pod: str):
+        """Stream one pod's logs until the pod goes away or the stream ends"""
+        key = (component, pod)
+        namespace = component_namespace(self.config, component)
+        cmd = ["kubectl", "logs", "-n", namespace, pod, "--all-containers=true"]
+        if self.follow_streams:
+            cmd.append("-f")
+        if key in self.ended:
+            # Re-attaching after a restart: don't replay what was already shown
+            cmd.append(f"--since-time={self.ended.pop(key)}")
+        else:
+            if self.since:
+                cmd.append(f"--since={self.since}")
+            if self.tail is not None:
+                cmd.append(f"--tail={self.tail}")
+        stream_filter = self.filter.stream()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        except OSError as e:
+            self.emit(component, pod, f"failed to start kubectl logs: {e}")
+            return
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                for out in stream_filter.feed(line.decode("utf-8", "replace").rstrip("\n")):
+                    self.emit(component, pod, out)
+            await process.wait()
+        finally:
+            if process.returncode is None:
+                process.terminate()
+                try:
+                    await asyncio.wait_for(process.wait(), timeout=2)
+                except asyncio.TimeoutError:
+                    process.kill()
+            self.ended[key] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    async def discover(self) -> int:
+        """Start followers for pods that don't have a live stream yet; returns how many were started"""
+        loop = asyncio.get_running_loop()
+        started = 0
+        # One fresh listing per namespace per round, shared by every component in it
+        get_pod_index().invalidate()
+        for component in self.components:
+            # Without -f there's nothing to wait for, so finished pods' logs are fine too
+            pods = await loop.run_in_executor(None, find_component_pods, self.config, component,
+                                              self.follow_streams)
+            for pod in pods:
+                key = (component, pod)
+                task = self.active.get(key)
+                if task is not None and not task.done():
+                    continue
+                print_info(f"📦 Following {component}/{pod}")
+                self.active[key] = asyncio.create_task(self.follow(component, pod))
+                started += 1
+        return started
+
+    async def run(self, interval: float = DISCOVERY_INTERVAL):
+        try:
+            if not await self.discover():
+                if not self.follow_streams:
+                    print_warning("No pods found")
+                    return
+                print_warning("No pods found yet, waiting for some to appear...")
+            if not self.follow_streams:
+                await asyncio.gather(*self.active.values())
+                return
+            while True:
+                await asyncio.sleep(interval)
+                await self.discover()
+        finally:
+            for task in self.active.values():
+                task.cancel()
+            await asyncio.gather(*self.active.values(), return_exceptions=True)
+
+
+def follow_logs(config: Dict, components: Optional[List[str]] = None, log_filter: Optional[LogFilter] = None,
+                since: Optional[str] = None, tail: Optional[int] = None, follow: bool = True):
+    """Stream logs of all pods of the given components (default: every available component)"""
+    components = components or available_components(config)
+    verb = "Following" if follow else "Fetching"
+    print(f"📋 {verb} logs for {', '.join(components)}" + (" (Press Ctrl-C to exit):" if follow else ":"))
+    print()
+    started = time.monotonic()
+    multiplexer = LogMultiplexer(config, components, log_filter, since, tail, follow)
+    try:
+        asyncio.run(multiplexer.run())
+    except KeyboardInterrupt:
+        print()
+        print_warning(f"Log streaming interrupted after {time.monotonic() - started:.0f}s")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+CLI startup benchmark
+
+Runs each command's import path (main.py plus the command's module, as
+dispatched through main.COMMANDS) in fresh interpreters and reports the
+median import time, the number of modules loaded and the whole process
+time. Results are kept in .state/startup-bench.json so each run shows the
+change since the previous one. Use `python -X importtime` to dig into a
+slow command.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from deploy.common import get_state_dir, print_info, print_step, print_success, print_warning
+
+RESULTS_FILE = "startup-bench.json"
+
+PROJECT_PACKAGES = ("deploy", "utils", "clean", "fleet", "bench")
+
+# Executed in a fresh interpreter with src/ on sys.path; times the imports only
+_PROBE = """
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import main
+main.load_command(sys.argv[1])
+elapsed = time.perf_counter() - start
+loaded = set(sys.modules) - before
+project = [m for m in loaded if m == "main" or m.split(".")[0] in {packages!r}]
+print(json.dumps({{"seconds": elapsed, "modules": len(loaded), "project": len(project)}}))
+"""
+
+
+def _probe(src_dir: Path, command: str) -> Optional[Dict]:
+    """Import one command in a fresh interpreter; None if the import failed"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(packages=PROJECT_PACKAGES), command],
+        cwd=src_dir, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        print_warning(f"{command}: import failed: {result.stderr.strip().splitlines()[-1:] or result.returncode}")
+        return None
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["wall"] = wall
+    return sample
+
+
+def startup_bench(commands: List[str], runs: int = 5):
+    """Measure per-command import time and compare with the previous run"""
+    src_dir = Path(__file__).resolve().parent.parent
+
+    path = get_state_dir() / RESULTS_FILE
+    try:
+        with open(path, "r") as f:
+            previous = json.load(f).get("commands", {})
+    except (OSError, ValueError):
+        previous = {}
+
+    print_step(f"⏱️  Measuring CLI startup ({runs} fresh interpreter(s) per command)...")
+    results = {}
+    for command in commands:
+        samples = [s for s in (_probe(src_dir, command) for _ in range(runs)) if s]
+        if not samples:
+            continue
+        results[command] = {
+            "import_ms": statistics.median(s["seconds"] for s in samples) * 1000,
+            "process_ms": statistics.median(s["wall"] for s in samples) * 1000,
+            "modules": samples[0]["modules"],
+            "project_modules": samples[0]["project"],
+        }
+
+    width = max(len("COMMAND"), *(len(c) for c in results)) if results else len("COMMAND")
+    print()
+    print(f"  {'COMMAND':<{width}}  {'IMPORT':>9}  {'CHANGE':>9}  {'PROCESS':>9}  {'MODULES':>7}  {'PROJECT':>7}")
+    for command, r in results.items():
+        before = previous.get(command, {}).get("import_ms")
+        change = f"{r['import_ms'] - before:+.1f}ms" if before is not None else "-"
+        print(f"  {command:<{width}}  {r['import_ms']:>7.1f}ms  {change:>9}  {r['process_ms']:>7.1f}ms  "
+              f"{r['modules']:>7}  {r['project_modules']:>7}")
+    print()
+
+    with open(path, "w") as f:
+        json.dump({"python": sys.version.split()[0], "runs": runs, "commands": results}, f, indent=2)
+    print_info(f"📈 Results written to {path} (IMPORT is the median time to import main.py and the command)")
+    print_success("Startup benchmark complete")
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Cluster status snapshot for the managed namespaces
+
+Takes one bulk snapshot (namespaces, then pods/services/secrets per managed
+namespace), indexes it in memory and derives Helm release state from Helm's
+release secrets, so `status` never lists every namespace in the cluster.
+
+`status --watch` renders that snapshot once and then keeps it current from
+watch streams, redrawing only the rows whose pod/service state changed.
+"""
+
+import json
+import queue
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional
+from deploy.common import get_config_value, read_config, print_info, print_success, print_warning
+from deploy.helm import releases_from_secrets
+from deploy.kube import kube_get_many, kube_list, kube_list_many
+from deploy.podindex import get_pod_index
+from deploy.watch import start_watch
+
+# Helm release expected in each managed namespace role
+EXPECTED_RELEASES = {
+    "dashboard": "kubernetes-dashboard",
+    "agent": "teleport-agent",
+    "cluster": "teleport-cluster",
+}
+
+TOKEN_SECRETS = ("dashboard-token", "dashboard-readonly-token")
+
+
+def managed_namespaces(config: Dict) -> Dict[str, str]:
+    """Return {role: namespace} for the namespaces this tool manages"""
+    namespaces = {
+        "dashboard": get_config_value(config, "kubernetes.namespace", "kubernetes-dashboard"),
+        "agent": get_config_value(config, "teleport.agent_namespace", "teleport-agent"),
+    }
+    # The Teleport cluster only runs in-cluster in local mode
+    if not get_config_value(config, "teleport.proxy_addr", "").strip():
+        namespaces["cluster"] = get_config_value(config, "teleport.cluster_namespace", "teleport-cluster")
+    return namespaces
+
+
+def pod_summary(pod: Dict) -> Dict:
+    """Reduce a pod object to the fields status cares about"""
+    status = pod.get("status") or {}
+    containers = status.get("containerStatuses") or []
+    conditions = {c.get("type"): c.get("status") for c in status.get("conditions") or []}
+    return {
+        "name": pod["metadata"]["name"],
+        "phase": status.get("phase", "Unknown"),
+        "ready": conditions.get("Ready") == "True",
+        "containers_ready": sum(1 for c in containers if c.get("ready")),
+        "containers": len(containers),
+        "restarts": sum(c.get("restartCount", 0) for c in containers),
+        "terminating": bool(pod["metadata"].get("deletionTimestamp")),
+        "labels": pod["metadata"].get("labels") or {},
+    }
+
+
+def service_summary(svc: Dict) -> Dict:
+    """Reduce a service object to its type, ClusterIP and ports"""
+    spec = svc.get("spec") or {}
+    return {
+        "name": svc["metadata"]["name"],
+        "type": spec.get("type", ""),
+        "cluster_ip": spec.get("clusterIP", ""),
+        "ports": [p.get("port") for p in spec.get("ports") or []],
+    }
+
+
+class StatusSnapshot:
+    """In-memory index of pods, services, releases and secrets per managed namespace"""
+    def __init__(self, namespaces: Dict[str, str]):
+        self.namespaces = namespaces
+        self.existing: Dict[str, str] = {}          # namespace -> phase
+        self.pods: Dict[str, List[Dict]] = {}
+        self.services: Dict[str, List[Dict]] = {}
+        self.releases: Dict[str, Dict[str, Dict]] = {}
+        self.token_secrets: set = set()             # TOKEN_SECRETS present in the dashboard namespace
+
+    @classmethod
+    def capture(cls, config: Dict) -> "StatusSnapshot":
+        """Take the snapshot: one namespace lookup, a listing and Helm release lookup per namespace, the token secrets"""
+        snapshot = cls(managed_namespaces(config))
+        unique = list(dict.fromkeys(snapshot.namespaces.values()))
+        for name, ns in kube_get_many("namespaces", unique).items():
+            snapshot.existing[name] = (ns.get("status") or {}).get("phase", "Active")
+
+        for namespace in unique:
+            if namespace not in snapshot.existing:
+                continue
+            listing = kube_list_many(["pods", "services"], namespace) or {}
+            get_pod_index().seed(namespace, listing.get("pods", []))
+            snapshot.pods[namespace] = [pod_summary(p) for p in listing.get("pods", [])]
+            snapshot.services[namespace] = [service_summary(s) for s in listing.get("services", [])]
+            # Release state is in the labels; the release payloads themselves are not downloaded
+            release_secrets = kube_list("secrets", namespace, label_selector="owner=helm", metadata_only=True) or []
+            snapshot.releases[namespace] = releases_from_secrets(release_secrets)
+
+        dashboard_ns = snapshot.namespaces["dashboard"]
+        if dashboard_ns in snapshot.existing:
+            # Keep names only - secret data never leaves this function
+            snapshot.token_secrets = set(kube_get_many("secrets", list(TOKEN_SECRETS), dashboard_ns))
+        return snapshot
+
+    def release(self, role: str) -> Optional[Dict]:
+        namespace = self.namespaces.get(role)
+        return self.releases.get(namespace, {}).get(EXPECTED_RELEASES[role])
+
+    def problems(self) -> List[str]:
+        """Everything that keeps the deployment from being healthy"""
+        problems = []
+        for role, namespace in self.namespaces.items():
+            if namespace not in self.existing:
+                problems.append(f"namespace {namespace} does not exist")
+                continue
+            release = self.release(role)
+            if release is None:
+                problems.append(f"release {EXPECTED_RELEASES[role]} not installed in {namespace}")
+            elif release["status"] != "deployed":
+                problems.append(f"release {release['name']} is {release['status']}")
+            for pod in self.pods.get(namespace, []):
+                if not pod["ready"] and pod["phase"] != "Succeeded" and not pod["terminating"]:
+                    problems.append(f"pod {namespace}/{pod['name']} not ready ({pod['phase']})")
+        dashboard_ns = self.namespaces["dashboard"]
+        for name in TOKEN_SECRETS:
+            if name not in self.token_secrets:
+                problems.append(f"secret {dashboard_ns}/{name} missing")
+        return problems
+
+    def to_dict(self) -> Dict:
+        problems = self.problems()
+        return {
+            "healthy": not problems,
+            "problems": problems,
+            "namespaces": {
+                role: {
+                    "name": namespace,
+                    "phase": self.existing.get(namespace),
+                    "release": self.release(role),
+                    "pods": [{k: v for k, v in pod.items() if k != "labels"} for pod in self.pods.get(namespace, [])],
+                    "services": self.services.get(namespace, []),
+                }
+                for role, namespace in self.namespaces.items()
+            },
+            "tokens": {name: name in self.token_secrets for name in TOKEN_SECRETS},
+        }
+
+
+def pod_row(namespace: str, pod: Dict) -> str:
+    marker = "✅" if pod["ready"] else ("🗑️ " if pod["terminating"] else "⏳")
+    return (f"  {marker} {namespace} pod/{pod['name']}  {pod['phase']}  "
+            f"{pod['containers_ready']}/{pod['containers']} ready  restarts={pod['restarts']}")
+
+
+def service_row(namespace: str, svc: Dict) -> str:
+    ports = ",".join(str(p) for p in svc["ports"])
+    return f"  🌐 {namespace} svc/{svc['name']}  {svc['type']}  {svc['cluster_ip']}  {ports}"
+
+
+class LiveTable:
+    """
+    Rows keyed by object; on a terminal only changed rows are rewritten in place
+    (ANSI cursor movement), otherwise each change is printed as a log line.
+    """
+    def __init__(self, interactive: bool):
+        self.interactive = interactive
+        self.keys: List[tuple] = []
+        self.rows: Dict[tuple, str] = {}
+        self.footer = ""
+        self.width = shutil.get_terminal_size().columns
+
+    def _fit(self, text: str) -> str:
+        return text[:self.width - 1]
+
+    def _rewrite(self, line: int, text: str):
+        """Rewrite line `line` (0-based, counting the footer as the last line)"""
+        up = len(self.keys) - line
+        if up:
+            sys.stdout.write(f"\x1b[{up}A\r\x1b[2K{self._fit(text)}\x1b[{up}B\r")
+        else:
+            sys.stdout.write(f"\r\x1b[2K{self._fit(text)}")
+
+    def start(self, rows: Dict[tuple, str], footer: str):
+        self.keys = list(rows)
+        self.rows = dict(rows)
+        self.footer = footer
+        for key in self.keys:
+            print(self._fit(self.rows[key]) if self.interactive else self.rows[key])
+        sys.stdout.write(self.footer if self.interactive else self.footer + "\n")
+        sys.stdout.flush()
+
+    def update(self, key: tuple, text: str):
+        if self.rows.get(key) == text:
+            return
+        if not self.interactive:
+            print(f"[{time.strftime('%H:%M:%S')}] {text.strip()}")
+        elif key in self.rows:
+            self._rewrite(self.keys.index(key), text)
+        else:
+            # New row takes the footer's line and the footer moves down one
+            self._rewrite(len(self.keys), text)
+            sys.stdout.write("\n" + self._fit(self.footer))
+        if key not in self.rows:
+            self.keys.append(key)
+        self.rows[key] = text
+        sys.stdout.flush()
+
+    def set_footer(self, footer: str):
+        if footer == self.footer:
+            return
+        self.footer = footer
+        if self.interactive:
+            self._rewrite(len(self.keys), footer)
+        else:
+            print(f"[{time.strftime('%H:%M:%S')}] {footer}")
+        sys.stdout.flush()
+
+
+def _health_line(snapshot: StatusSnapshot) -> str:
+    problems = snapshot.problems()
+    if problems:
+        return f"⚠️  {len(problems)} issue(s): {problems[0]}" + (" ..." if len(problems) > 1 else "")
+    return "✅ All components healthy"
+
+
+def watch_status(config: Dict):
+    """Keep the status table current from one pod and one service watch per managed namespace"""
+    snapshot = StatusSnapshot.capture(config)
+    namespaces = [ns for ns in dict.fromkeys(snapshot.namespaces.values()) if ns in snapshot.existing]
+    for namespace in dict.fromkeys(snapshot.namespaces.values()):
+        if namespace not in snapshot.existing:
+            print_warning(f"Namespace {namespace} not found, not watching it")
+    if not namespaces:
+        return
+
+    rows = {}
+    for namespace in namespaces:
+        for pod in snapshot.pods.get(namespace, []):
+            rows[(namespace, "pods", pod["name"])] = pod_row(namespace, pod)
+        for svc in snapshot.services.get(namespace, []):
+            rows[(namespace, "services", svc["name"])] = service_row(namespace, svc)
+
+    print(f"📊 Watching {', '.join(namespaces)} (Ctrl+C to stop)")
+    print()
+    table = LiveTable(sys.stdout.isatty())
+    table.start(rows, _health_line(snapshot))
+
+    events: queue.Queue = queue.Queue()
+    watches = {}
+    restarts: Dict[tuple, int] = {}
+    for namespace in namespaces:
+        for kind in ("pods", "services"):
+            watches[(namespace, kind)] = start_watch((namespace, kind), events, kind, namespace)
+
+    try:
+        while True:
+            key, event = events.get()
+            namespace, kind = key
+            if event is None:
+                # Stream dropped (server timeout, connection reset): re-open it with backoff
+                restarts[key] = restarts.get(key, 0) + 1
+                time.sleep(min(0.5 * 2 ** (restarts[key] - 1), 10.0))
+                watches[key] = start_watch(key, events, kind, namespace)
+                continue
+            obj = event.get("object") or {}
+            name = (obj.get("metadata") or {}).get("name")
+            if event.get("type") == "ERROR" or not name:
+                continue
+            restarts.pop(key, None)
+
+            if kind == "pods":
+                pods = [p for p in snapshot.pods.get(namespace, []) if p["name"] != name]
+                if event.get("type") == "DELETED":
+                    table.update((namespace, kind, name), f"  ❌ {namespace} pod/{name}  deleted")
+                else:
+                    pod = pod_summary(obj)
+                    pods.append(pod)
+                    table.update((namespace, kind, name), pod_row(namespace, pod))
+                snapshot.pods[namespace] = pods
+            else:
+                services = [s for s in snapshot.services.get(namespace, []) if s["name"] != name]
+                if event.get("type") == "DELETED":
+                    table.update((namespace, kind, name), f"  ❌ {namespace} svc/{name}  deleted")
+                else:
+                    svc = service_summary(obj)
+                    services.append(svc)
+                    table.update((namespace, kind, name), service_row(namespace, svc))
+                snapshot.services[namespace] = services
+            table.set_footer(_health_line(snapshot))
+    except KeyboardInterrupt:
+        print()
+    finally:
+        for watch in watches.values():
+            watch.close()
+
+
+def show_status(json_output: bool = False, watch: bool = False):
+    """Show overall status"""
+    config = read_config()
+    if watch:
+        watch_status(config)
+        return
+    snapshot = StatusSnapshot.capture(config)
+
+    if json_output:
+        print(json.dumps(snapshot.to_dict(), indent=2))
+        return
+
+    print("📊 Overall Status:")
+    for role, namespace in snapshot.namespaces.items():
+        print()
+        phase = snapshot.existing.get(namespace)
+        if phase is None:
+            print(f"{namespace} ({role}):")
+            print_warning("  Namespace not found")
+            continue
+
+        release = snapshot.release(role)
+        release_text = f"{release['name']} rev {release['revision']} {release['status']}" if release else "no release"
+        print(f"{namespace} ({role}) - {phase}, {release_text}")
+
+        pods = snapshot.pods.get(namespace, [])
+        if pods:
+            for pod in pods:
+                print(pod_row(namespace, pod))
+        else:
+            print_warning("  No pods found")
+        for svc in snapshot.services.get(namespace, []):
+            print(service_row(namespace, svc))
+
+    print()
+    problems = snapshot.problems()
+    if problems:
+        print_warning(f"{len(problems)} issue(s):")
+        for problem in problems:
+            print_info(f"   • {problem}")
+    else:
+        print_success("All components healthy")